@@ -0,0 +1,153 @@
+"""
+Logging latency microbenchmark.
+
+Measures how long a `logger.info(...)` call blocks the calling thread, with several worker
+threads logging at once (as the swarm, scheduler and orchestrator do), for:
+
+    sync   - the previous pipeline: file, console and dashboard-queue handlers all run
+             (and each formats the record) on the calling thread
+    async  - utils/logger.py: the caller only enqueues; one listener thread formats once
+             and writes to every handler
+
+    python benchmarks/logging_bench.py
+    python benchmarks/logging_bench.py --threads 16 --calls 5000 --console-delay-ms 0.2
+
+The console is redirected to a file in the temporary directory; --console-delay-ms adds a
+per-write delay to approximate a slow terminal or a piped supervisor.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import tempfile
+import threading
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.orchestrator_bench import summarize, git_commit
+
+LEGACY_FORMAT = '%(asctime)s - %(levelname)s - %(module)s - %(message)s'
+
+class SlowStream:
+    """File-backed stream whose writes take at least `delay` seconds."""
+
+    def __init__(self, path: str, delay: float):
+        self._file = open(path, 'a', encoding='utf-8')
+        self.delay = delay
+
+    def write(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+        return self._file.write(text)
+
+    def flush(self):
+        self._file.flush()
+
+class DashboardQueueHandler(logging.Handler):
+    """Same behaviour as core.context.QueueHandler (without importing the whole agent context)."""
+
+    def __init__(self, target_queue):
+        super().__init__()
+        self.queue = target_queue
+
+    def emit(self, record):
+        self.queue.put(self.format(record))
+
+def setup_sync(workdir: str, console) -> None:
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.setLevel(logging.INFO)
+    handlers = [
+        logging.FileHandler(os.path.join(workdir, "sync.log"), encoding='utf-8'),
+        logging.StreamHandler(console),
+        DashboardQueueHandler(queue.Queue()),
+    ]
+    for handler in handlers:
+        handler.setFormatter(logging.Formatter(LEGACY_FORMAT))
+        root.addHandler(handler)
+
+def setup_async(workdir: str, console):
+    from utils import logger as logger_module
+    logger_module.setup_logger(os.path.join(workdir, "async"))
+    for handler in logger_module._listener.handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setStream(console)
+    logger_module.attach_handler(DashboardQueueHandler(queue.Queue()))
+    return logger_module
+
+def run_threads(threads: int, calls: int) -> tuple:
+    log = logging.getLogger("bench")
+    samples = []
+    samples_lock = threading.Lock()
+    start_barrier = threading.Barrier(threads)
+
+    def worker(index):
+        local = []
+        start_barrier.wait()
+        for i in range(calls):
+            started = time.perf_counter()
+            log.info("worker %d processed step %d of goal %s", index, i, "bench-goal")
+            local.append((time.perf_counter() - started) * 1000.0)
+        with samples_lock:
+            samples.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in pool: thread.start()
+    for thread in pool: thread.join()
+    return samples, time.perf_counter() - started
+
+def run_mode(mode: str, args, workdir: str) -> dict:
+    console = SlowStream(os.path.join(workdir, f"{mode}_console.log"), args.console_delay_ms / 1000.0)
+    logger_module = None
+    if mode == "sync":
+        setup_sync(workdir, console)
+    else:
+        logger_module = setup_async(workdir, console)
+
+    samples, elapsed = run_threads(args.threads, args.calls)
+    drain_started = time.perf_counter()
+    if logger_module is not None:
+        logger_module.stop_logging()  # Waits until every queued record is written
+    drain = time.perf_counter() - drain_started
+    logging.getLogger().handlers.clear()
+
+    return {
+        "call_latency_ms": summarize(samples),
+        "workers_elapsed_seconds": elapsed,
+        "drain_seconds": drain,
+        "records_per_second": len(samples) / (elapsed + drain),
+    }
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Log call latency on worker threads: sync vs. queued pipeline.")
+    parser.add_argument("-m", "--mode", action="append", choices=["sync", "async"], help="Pipeline(s) to run (default: both).")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=2000, help="Log calls per thread.")
+    parser.add_argument("--console-delay-ms", type=float, default=0.0, help="Simulated per-write console cost.")
+    parser.add_argument("--output", default=None, help="Also write the results JSON here.")
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+    with tempfile.TemporaryDirectory(prefix="cognito_logbench_") as workdir:
+        os.chdir(workdir)  # utils.logger sets up ./logs on import
+        results = {mode: run_mode(mode, args, workdir) for mode in (args.mode or ["sync", "async"])}
+
+    report = {
+        "commit": git_commit(),
+        "config": {"threads": args.threads, "calls": args.calls, "console_delay_ms": args.console_delay_ms},
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
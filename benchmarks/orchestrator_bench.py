@@ -0,0 +1,292 @@
+"""
+End-to-end orchestrator benchmark.
+
+Drives the real `main.main()` loop, database layer, ContextCurator, Executor and monitor
+against the offline fake Gemini backend (utils/gemini_backends.py), so the numbers are
+our own overhead plus the simulated model latency.
+
+Each scenario runs in a fresh subprocess with its own temporary working directory
+(and therefore its own data/tasks.sqlite), then results are merged into one JSON file:
+
+    python benchmarks/orchestrator_bench.py                       # all scenarios
+    python benchmarks/orchestrator_bench.py -s fanout -s chain --llm-latency 0.2
+    python benchmarks/orchestrator_bench.py --error-rate 0.02 --output results.json
+    python benchmarks/orchestrator_bench.py -s critical --goals 1 --rpm 30   # dispatch order under a tight budget
+
+Note: the orchestrator waits up to ORCHESTRATOR_TICK_SECONDS between ticks; the benchmark
+lowers it (--tick-seconds) so scheduling overhead is not hidden behind the idle wait.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import platform
+import threading
+import subprocess
+from datetime import datetime
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.plans import SCENARIOS
+
+POLL_INTERVAL_SECONDS = 0.02
+LONG_OUTPUT = ("Benchmark output sentence with enough detail to pass the monitor and summarizer thresholds. " * 6).strip()
+
+def percentile(samples: list, pct: float) -> float | None:
+    """Nearest-rank percentile."""
+    if not samples: return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarize(samples: list) -> dict:
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples) if samples else None,
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "max": max(samples) if samples else None,
+    }
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except Exception:
+        return None
+
+# --- Fake Model Behaviour ---
+
+def install_fake_rules(fake, args):
+    """Scripted answers for every caller the orchestrator uses while executing a plan."""
+    rng = random.Random(args.seed)
+
+    def curator(request):
+        return {"json": {"selected_step_ids": [int(i) for i in re.findall(r"Step ID (\d+)", request.text)]}}
+
+    def react(request):
+        tool_turns = request.text.count("function_call:")
+        if tool_turns < 2 and rng.random() < args.react_tool_rate:
+            return {"function_call": {"name": "google_search", "args": {"prompt": "follow-up query"}}}
+        return {"text": f"Final answer. {LONG_OUTPUT}"}
+
+    tool_latency = {"dist": "lognormal", "median": args.llm_latency * args.tool_latency_factor, "sigma": args.latency_sigma}
+    fake.add_rule(match={"caller": "curator"}, handler=curator)
+    fake.add_rule(match={"caller": "executor", "schema": "ExecutorTaskSpec"}, response={"json": {
+        "primary_tool": "google_search", "initial_inputs": ["benchmark query"], "task_description": "Analyze the search results.",
+    }})
+    fake.add_rule(match={"caller": "executor"}, response={"text": "optimized benchmark query"})
+    fake.add_rule(match={"caller": "monitor"}, response={"text": "CONTINUE"})
+    fake.add_rule(match={"caller": "summarizer"}, response={"text": "One sentence summary of the step."})
+    fake.add_rule(match={"caller": "react"}, handler=react)
+    fake.add_rule(match={"caller": "tool"}, latency=tool_latency, response={
+        "text": LONG_OUTPUT, "grounding": {"chunks": [{"uri": "https://example.com/a"}], "supports": [{"end_index": 40}]},
+    })
+    fake.add_rule(match={"caller": "step"}, response={"text": LONG_OUTPUT})
+
+# --- Single Scenario (runs inside the subprocess) ---
+
+def run_scenario(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"cognito_bench_{args.scenario}_")
+    os.chdir(workdir)
+    os.makedirs("data", exist_ok=True)
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ["COGNITO_GEMINI_BACKEND"] = "fake"
+    os.environ["COGNITO_FAKE_SEED"] = str(args.seed)
+    os.environ["ANONYMIZED_TELEMETRY"] = "False"
+
+    import logging
+    from utils import logger as logger_module
+    # Keep the console quiet: the root logger only holds the queue handler; the console
+    # handler is one of the logging listener's handlers.
+    logger_module._listener.handlers = tuple(
+        handler for handler in logger_module._listener.handlers if type(handler) is not logging.StreamHandler
+    )
+
+    from utils import database
+    database.initialize_database()
+    from core.context import gemini_client, rate_limiter, request_scheduler, orchestrator_wake_event
+    import main
+
+    fake = gemini_client.client
+    fake.default_latency = {"dist": "lognormal", "median": args.llm_latency, "sigma": args.latency_sigma}
+    if args.error_rate:
+        fake.default_errors = {"429": args.error_rate / 2, "503": args.error_rate / 2}
+    install_fake_rules(fake, args)
+
+    if args.rpm:
+        for tier in rate_limiter.limits:
+            rate_limiter.limits[tier] = {"rpm": args.rpm, "rpd": 100_000_000}
+    elif not args.real_limits:
+        for tier in rate_limiter.limits:
+            rate_limiter.limits[tier] = {"rpm": 1_000_000, "rpd": 100_000_000}
+    main.ORCHESTRATOR_TICK_SECONDS = args.tick_seconds
+    main.SPECULATIVE_EXECUTION = args.speculative
+
+    # Time every step execution (the same function the swarm and heavyweight paths call).
+    step_latencies = []
+    original_execute_step = main._execute_step
+    def timed_execute_step(step, goal, context_map, cancel_token=None, sub_priority=None):
+        start = time.perf_counter()
+        try:
+            return original_execute_step(step, goal, context_map, cancel_token, sub_priority)
+        finally:
+            if step.get("step_id"):  # step_id 0 = inner ReAct tool call
+                step_latencies.append(time.perf_counter() - start)
+    main._execute_step = timed_execute_step
+
+    plan_factory, default_goals = SCENARIOS[args.scenario]
+    goal_count = args.goals or default_goals
+    goal_ids = [f"bench_{args.scenario}_{i:04d}" for i in range(goal_count)]
+    steps_total = 0
+    for goal_id in goal_ids:
+        plan = plan_factory(args.size)
+        steps_total += len(plan)
+        database.add_goal({
+            "goal_id": goal_id, "goal": f"Benchmark goal {goal_id}", "plan": plan,
+            "audit_critique": None, "status": "pending", "strategy_blueprint": {},
+            "preferred_tier": args.tier, "replan_count": 0,
+        })
+
+    database.reset_db_op_stats()
+    start = time.perf_counter()
+    orchestrator_wake_event.set()
+    threading.Thread(target=main.main, daemon=True, name="orchestrator").start()
+
+    # Poll the archive with a plain connection so the harness does not show up in the DB stats.
+    finished = {}
+    con = sqlite3.connect(database.DB_PATH)
+    placeholders = ",".join("?" * len(goal_ids))
+    while len(finished) < goal_count and time.perf_counter() - start < args.timeout:
+        rows = con.execute(f"SELECT goal_id, status FROM archive WHERE goal_id IN ({placeholders})", goal_ids).fetchall()
+        now = time.perf_counter() - start
+        for goal_id, status in rows:
+            finished.setdefault(goal_id, (status, now))
+        time.sleep(POLL_INTERVAL_SECONDS)
+    wall = time.perf_counter() - start
+    con.close()
+
+    db_stats = database.get_db_op_stats()
+    db_seconds = sum(s["seconds"] for s in db_stats.values())
+    completed = [t for status, t in finished.values() if status == "complete"]
+    llm_calls = fake.stats["calls"]
+
+    return {
+        "scenario": args.scenario,
+        "params": {
+            "goals": goal_count, "size": args.size, "tier": args.tier, "llm_latency": args.llm_latency,
+            "latency_sigma": args.latency_sigma, "error_rate": args.error_rate, "tick_seconds": args.tick_seconds,
+            "speculative": args.speculative, "real_limits": args.real_limits, "rpm": args.rpm, "seed": args.seed,
+        },
+        "wall_seconds": wall,
+        "goals_completed": len(completed),
+        "goals_failed": sum(1 for status, _ in finished.values() if status != "complete"),
+        "goals_unfinished": goal_count - len(finished),
+        "goals_per_hour": len(completed) / wall * 3600 if wall else None,
+        "steps_total": steps_total,
+        "step_latency_seconds": summarize(step_latencies),
+        "goal_completion_seconds": summarize(completed),
+        "llm_calls": llm_calls,
+        "llm_calls_per_goal": llm_calls / goal_count,
+        "llm_calls_by_caller": fake.stats["by_caller"],
+        "llm_injected_errors": fake.stats["errors"],
+        "sqlite": {
+            "seconds": db_seconds,
+            "share_of_wall": db_seconds / wall if wall else None,
+            "calls": sum(s["calls"] for s in db_stats.values()),
+            "lock_retries": sum(s["lock_retries"] for s in db_stats.values()),
+            "by_op": dict(sorted(db_stats.items(), key=lambda kv: kv[1]["seconds"], reverse=True)),
+        },
+        "scheduler": request_scheduler.get_status(),
+    }
+
+# --- Driver ---
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="End-to-end orchestrator benchmark (offline).")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario(s) to run (default: all).")
+    parser.add_argument("--goals", type=int, default=None, help="Goals to enqueue (default: per scenario).")
+    parser.add_argument("--size", type=int, default=None, help="Fan-out width / chain depth (default: per scenario).")
+    parser.add_argument("--tier", default="tier1", choices=["tier1", "tier2"])
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Median simulated model latency in seconds.")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal sigma of the simulated latency.")
+    parser.add_argument("--tool-latency-factor", type=float, default=3.0, help="Grounded tool calls are this much slower.")
+    parser.add_argument("--react-tool-rate", type=float, default=0.5, help="Chance the ReAct model asks for another tool.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Injected 429+503 rate per call.")
+    parser.add_argument("--tick-seconds", type=float, default=0.05, help="Orchestrator tick timeout during the run.")
+    parser.add_argument("--speculative", action="store_true", help="Enable speculative execution.")
+    parser.add_argument("--real-limits", action="store_true", help="Keep the production RPM/RPD limits.")
+    parser.add_argument("--rpm", type=int, default=None, help="Cap every tier at this many requests per minute (RPD stays unlimited).")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--timeout", type=float, default=600.0, help="Per-scenario time limit in seconds.")
+    parser.add_argument("--output", default=None, help="Results JSON path (default: benchmarks/results/orchestrator_<commit>.json).")
+    parser.add_argument("--run-one", metavar="RESULT_FILE", default=None, help=argparse.SUPPRESS)
+    return parser
+
+def child_args(args) -> list:
+    """Re-serializes the shared options for a scenario subprocess."""
+    argv = []
+    for action in build_parser()._actions:
+        if action.dest in ("help", "scenario", "output", "run_one"): continue
+        value = getattr(args, action.dest)
+        if value is None or value is False: continue
+        argv.append(action.option_strings[-1])
+        if value is not True: argv.append(str(value))
+    return argv
+
+def main():
+    args = build_parser().parse_args()
+
+    if args.run_one:
+        args.scenario = args.scenario[0]
+        result = run_scenario(args)
+        with open(args.run_one, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        # The orchestrator thread never returns; skip interpreter shutdown.
+        os._exit(0)
+
+    results = []
+    for scenario in args.scenario or sorted(SCENARIOS):
+        result_file = tempfile.mktemp(suffix=".json")
+        print(f"Running scenario '{scenario}'...", flush=True)
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "-s", scenario, "--run-one", result_file, *child_args(args)])
+        if proc.returncode != 0 or not os.path.exists(result_file):
+            results.append({"scenario": scenario, "error": f"exit code {proc.returncode}"})
+            continue
+        with open(result_file, "r", encoding="utf-8") as f:
+            result = json.load(f)
+        os.remove(result_file)
+        results.append(result)
+        steps = result["step_latency_seconds"]
+        print(
+            f"  {result['goals_completed']}/{result['params']['goals']} goals in {result['wall_seconds']:.2f}s "
+            f"({result['goals_per_hour']:.0f} goals/h) | step p50/p95/p99 "
+            f"{steps['p50'] or 0:.3f}/{steps['p95'] or 0:.3f}/{steps['p99'] or 0:.3f}s | "
+            f"{result['llm_calls_per_goal']:.1f} LLM calls/goal | SQLite {result['sqlite']['seconds']:.2f}s "
+            f"({result['sqlite']['calls']} ops, {result['sqlite']['lock_retries']} lock retries)"
+        )
+
+    commit = git_commit()
+    report = {
+        "benchmark": "orchestrator",
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "scenarios": results,
+    }
+    output = args.output or os.path.join(REPO_ROOT, "benchmarks", "results", f"orchestrator_{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Synthetic plan shapes for the orchestrator benchmarks (same step format the Planner emits)."""
+
+def _tool_step(step_id: int, tool_name: str, parameters: dict, dependencies: list = None) -> dict:
+    return {
+        "step_id": step_id, "dependencies": dependencies or [],
+        "tool_call": {"tool_name": tool_name, "parameters": parameters},
+        "status": "pending", "output": None,
+    }
+
+def _prompt_step(step_id: int, prompt: str, dependencies: list) -> dict:
+    return {"step_id": step_id, "dependencies": dependencies, "prompt": prompt, "status": "pending", "output": None}
+
+def fanout_plan(width: int = 8) -> list:
+    """Map/reduce: `width` independent searches, then one synthesis step over all of them."""
+    plan = [_tool_step(i, "google_search", {"prompt": f"Research topic {i}"}) for i in range(1, width + 1)]
+    placeholders = ", ".join(f"[output_of_step_{i}]" for i in range(1, width + 1))
+    plan.append(_prompt_step(width + 1, f"Synthesize a report from {placeholders}", list(range(1, width + 1))))
+    return plan
+
+def chain_plan(depth: int = 6) -> list:
+    """A deep chain: every step needs the previous step's output."""
+    plan = [_tool_step(1, "google_search", {"prompt": "Find the starting facts"})]
+    for i in range(2, depth + 1):
+        plan.append(_prompt_step(i, f"Build on [output_of_step_{i - 1}] and go one level deeper", [i - 1]))
+    return plan
+
+def mixed_plan(width: int = 4) -> list:
+    """Alternating reactive_solve and search steps (reactive_solve runs alone, as a heavyweight step), then a reduce."""
+    plan = []
+    for i in range(1, width + 1):
+        if i % 2:
+            plan.append(_tool_step(i, "reactive_solve", {"sub_goal": f"Investigate aspect {i} in depth"}))
+        else:
+            plan.append(_tool_step(i, "google_search", {"prompt": f"Look up aspect {i}"}))
+    placeholders = ", ".join(f"[output_of_step_{i}]" for i in range(1, width + 1))
+    plan.append(_prompt_step(width + 1, f"Combine {placeholders}", list(range(1, width + 1))))
+    return plan
+
+def critical_plan(width: int = 4) -> list:
+    """
+    Independent leaf steps listed ahead of a list-producing search whose output feeds a map
+    phase, a reduce and a short review chain: in plan order the critical path is dispatched last.
+    """
+    plan = [_prompt_step(i, f"Draft side note {i}", []) for i in range(1, width + 1)]
+    plan.append(_tool_step(width + 1, "write_to_file", {"filename": "notes.txt", "content": "Side notes pending."}))
+    list_step = width + 2
+    plan.append(_tool_step(list_step, "google_search", {"prompt": "List the items to cover"}))
+    map_steps = list(range(list_step + 1, list_step + width + 1))
+    for i in map_steps:
+        plan.append(_prompt_step(i, f"Expand item {i - list_step} of [output_of_step_{list_step}]", [list_step]))
+    placeholders = ", ".join(f"[output_of_step_{i}]" for i in map_steps)
+    reduce_step = map_steps[-1] + 1
+    plan.append(_prompt_step(reduce_step, f"Combine {placeholders}", map_steps))
+    plan.append(_prompt_step(reduce_step + 1, f"Review [output_of_step_{reduce_step}] for gaps", [reduce_step]))
+    plan.append(_prompt_step(reduce_step + 2, f"Finalize [output_of_step_{reduce_step + 1}]", [reduce_step + 1]))
+    return plan
+
+# name -> (plan factory, goals to enqueue at once)
+SCENARIOS = {
+    "fanout": (lambda size: fanout_plan(size or 8), 3),
+    "chain": (lambda size: chain_plan(size or 6), 3),
+    "mixed": (lambda size: mixed_plan(size or 4), 3),
+    "concurrent": (lambda size: fanout_plan(size or 4), 10),
+    "critical": (lambda size: critical_plan(size or 4), 3),
+}
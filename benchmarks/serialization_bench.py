@@ -0,0 +1,109 @@
+"""
+JSON serialization microbenchmark.
+
+Times encoding and decoding of realistic goal payloads (the plan column written by
+update_goal on every step, and the dashboard's status snapshot) with:
+
+    stdlib  - json.dumps / json.loads, as the code used before
+    module  - utils/serialization.py (orjson when installed, otherwise the stdlib fallback)
+
+Plans come from benchmarks/plans.py with every step completed and given an output of
+--output-chars characters (search results and model answers are typically a few KB).
+
+    python benchmarks/serialization_bench.py
+    python benchmarks/serialization_bench.py --width 32 --output-chars 8000 --rounds 2000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.orchestrator_bench import summarize, git_commit
+from benchmarks.plans import SCENARIOS
+from utils import serialization
+
+SAMPLE_TEXT = ("Résumé of findings — the search returned several sources; "
+               "key figures: 42%, 3.14, \"quoted\" text and a newline.\n")
+
+def completed_plan(scenario: str, width: int, output_chars: int) -> list:
+    factory, _ = SCENARIOS[scenario]
+    plan = factory(width)
+    text = (SAMPLE_TEXT * (output_chars // len(SAMPLE_TEXT) + 1))[:output_chars]
+    for step in plan:
+        step["status"] = "complete"
+        step["output"] = text
+    return plan
+
+def status_payload(plans: list) -> dict:
+    """Shape of the dashboard's status snapshot for a handful of active goals."""
+    return {
+        "version": 1,
+        "goals": [
+            {"goal_id": f"goal_20250101_12000{i}", "goal": f"Benchmark goal {i}", "status": "active",
+             "plan": plan, "preferred_tier": "tier2", "steps_total": len(plan), "steps_complete": len(plan)}
+            for i, plan in enumerate(plans)
+        ],
+    }
+
+def time_calls(func, arg, rounds: int) -> list:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func(arg)
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return samples
+
+def run_payload(payload, rounds: int) -> dict:
+    encoded_stdlib = json.dumps(payload)
+    encoded_module = serialization.dumps(payload)
+    assert json.loads(encoded_module) == json.loads(encoded_stdlib)
+    return {
+        "stdlib": {
+            "bytes": len(encoded_stdlib.encode('utf-8')),
+            "dumps_ms": summarize(time_calls(json.dumps, payload, rounds)),
+            "loads_ms": summarize(time_calls(json.loads, encoded_stdlib, rounds)),
+        },
+        "module": {
+            "bytes": len(encoded_module.encode('utf-8')),
+            "dumps_ms": summarize(time_calls(serialization.dumps, payload, rounds)),
+            "dumps_bytes_ms": summarize(time_calls(serialization.dumps_bytes, payload, rounds)),
+            "loads_ms": summarize(time_calls(serialization.loads, encoded_module, rounds)),
+        },
+    }
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="JSON encode/decode latency: stdlib vs. utils/serialization.")
+    parser.add_argument("-s", "--scenario", default="fanout", choices=sorted(SCENARIOS))
+    parser.add_argument("--width", type=int, default=8, help="Plan size passed to the scenario's factory.")
+    parser.add_argument("--output-chars", type=int, default=4000, help="Characters of output per step.")
+    parser.add_argument("--goals", type=int, default=5, help="Goals in the status snapshot payload.")
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--output", default=None, help="Also write the results JSON here.")
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+    plan = completed_plan(args.scenario, args.width, args.output_chars)
+    payloads = {
+        "plan": plan,
+        "status_snapshot": status_payload([completed_plan(args.scenario, args.width, args.output_chars) for _ in range(args.goals)]),
+    }
+    report = {
+        "commit": git_commit(),
+        "orjson": serialization.ORJSON_AVAILABLE,
+        "config": {"scenario": args.scenario, "width": args.width, "output_chars": args.output_chars,
+                   "goals": args.goals, "rounds": args.rounds},
+        "results": {name: run_payload(payload, args.rounds) for name, payload in payloads.items()},
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import click
 import uuid
-import datetime
+from datetime import datetime
 from core.context import logger
-from utils.database import add_goal, get_active_goals, initialize_database
+from utils.database import add_goal, get_active_goal_summaries, initialize_database, search_archive
 from core.planner import orchestrate_planning
+from utils.call_context import call_context
 
 @click.group()
 def cli():
@@ -17,7 +18,8 @@ def add(goal_text: str):
     click.echo(f"CLI: Received new goal: '{goal_text}'")
 
     # MODIFIED: All old planning logic is replaced with this single call
-    new_goal_obj = orchestrate_planning(goal_text)
+    with call_context(priority='interactive'):
+        new_goal_obj = orchestrate_planning(goal_text)
 
     if new_goal_obj:
         # Add the final unique ID and source before saving
@@ -35,7 +37,7 @@ def add(goal_text: str):
 @click.command()
 def status():
     """Displays the status of all active goals from the database."""
-    goals = get_active_goals()
+    goals = get_active_goal_summaries()
     
     if not goals:
         click.echo("No active goals in the queue.")
@@ -43,20 +45,49 @@ def status():
 
     click.echo("\n--- Cognito Agent Status ---")
     for goal in goals:
-        status_text = goal['status'].upper()
+        status_text = goal.status.upper()
         
-        if goal['status'] == 'complete': color = 'green'
-        elif goal['status'] == 'in-progress': color = 'yellow'
-        elif goal['status'] == 'failed': color = 'red'
+        if goal.status == 'complete': color = 'green'
+        elif goal.status == 'in-progress': color = 'yellow'
+        elif goal.status == 'failed': color = 'red'
         else: color = 'white'
         
-        click.echo(click.style(f"\n[{status_text}] Goal: {goal['goal']}", fg=color, bold=True))
-        if 'plan' in goal and goal['plan']:
-            completed_steps = sum(1 for step in goal['plan'] if step['status'] == 'complete')
-            total_steps = len(goal['plan'])
-            click.echo(f"Progress: {completed_steps}/{total_steps} steps complete.")
+        click.echo(click.style(f"\n[{status_text}] Goal: {goal.goal}", fg=color, bold=True))
+        if goal.steps_total:
+            click.echo(f"Progress: {goal.steps_complete}/{goal.steps_total} steps complete.")
     click.echo("\n--------------------------")
 
+@click.command()
+@click.argument('query', nargs=-1, required=True)
+@click.option('--limit', default=10, show_default=True, help="Maximum number of results.")
+@click.option('--raw', is_flag=True, help="Treat QUERY as FTS5 syntax (phrases, OR, NEAR, prefix*).")
+def search(query: tuple, limit: int, raw: bool):
+    """Full-text search over archived goals, step outputs and execution logs."""
+    text = " ".join(query)
+    marker = ('\x02', '\x03')
+    hits = search_archive(text, limit=limit, highlight=marker, raw=raw)
+    if not hits:
+        click.echo(f"No archived goals match '{text}'.")
+        return
+
+    for hit in hits:
+        archived = datetime.fromtimestamp(hit.archived_at).strftime('%Y-%m-%d %H:%M') if hit.archived_at else "unknown date"
+        click.echo(click.style(f"\n[{(hit.status or 'unknown').upper()}] {hit.goal}", bold=True))
+        click.echo(f"  {hit.goal_id} · archived {archived} · score {-hit.score:.2f}")
+        snippet = " ".join((hit.snippet or "").split())
+        click.echo("  ", nl=False)
+        for part in snippet.split(marker[0]):
+            matched, _, rest = part.partition(marker[1])
+            if _:
+                click.echo(click.style(matched, fg='yellow', bold=True) + rest, nl=False)
+            else:
+                click.echo(part, nl=False)
+        click.echo()
+
+cli.add_command(add)
+cli.add_command(status)
+cli.add_command(search)
+
 if __name__ == '__main__':
     initialize_database()
     cli()
\ No newline at end of file
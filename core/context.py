@@ -1,9 +1,14 @@
+import os
+import time
 import queue
 import logging
 import threading
+import multiprocessing
 
 # First, import the independent logger
-from utils.logger import logger
+from utils.logger import logger, attach_handler
+from utils import metrics
+from utils.supervisor import MAX_PROCESSES, process_index
 
 # --- Queue Handler for Dashboard Streaming ---
 class QueueHandler(logging.Handler):
@@ -21,24 +26,134 @@ logger.info("Initializing shared context...")
 # 1. Create the Status Queue (Threading)
 status_update_queue = queue.Queue()
 
-# 2. Attach Handler
+# 2. Attach Handler (runs on the logging thread and reuses the line it formatted for the log file)
 queue_handler = QueueHandler(status_update_queue)
-queue_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(module)s - %(message)s'))
-logger.addHandler(queue_handler)
+attach_handler(queue_handler)
 logger.info("Live dashboard logging handler attached.")
 
 # 3. NEW: Global Wake Event
 # This event replaces time.sleep(). It allows the Orchestrator to sleep efficiently
 # but wake up INSTANTLY when a new goal is added from anywhere in the system.
-orchestrator_wake_event = threading.Event()
+# Orchestrator worker processes started by run_agent.py see it too: set() also bumps this
+# process's counter in a shared-memory table, which each worker process polls (see
+# follow_shared_wakeups). Shared memory rather than multiprocessing.Event: its set() blocks
+# forever once a process has been killed while waiting on it, and the supervisor does kill
+# hung workers. For the same reason no lock is shared between processes: every process only
+# writes its own row (supervisor.process_index()) and the pollers watch the sum.
+WAKE_POLL_SECONDS = 0.2
+
+class WakeEvent(threading.Event):
+    def __init__(self):
+        super().__init__()
+        self._generations = multiprocessing.RawArray('Q', MAX_PROCESSES)
+        self._bump_lock = threading.Lock()  # Threads of this process take turns on its row
+
+    def set(self):
+        with self._bump_lock:
+            self._generations[process_index()] += 1
+        super().set()
+
+    def follow_shared_wakeups(self):
+        """For a worker process: wake up whenever any process sets the event."""
+        threading.Event.__init__(self)  # An inherited condition's lock may be held by a parent thread
+        self._bump_lock = threading.Lock()
+        generations = self._generations
+
+        def _poll():
+            seen = sum(generations)
+            while True:
+                time.sleep(WAKE_POLL_SECONDS)
+                total = sum(generations)
+                if total != seen:
+                    seen = total
+                    threading.Event.set(self)
+
+        threading.Thread(target=_poll, name="WakePoller", daemon=True).start()
+
+class SharedFlag:
+    """A set-once flag in shared memory, readable by worker processes without taking a lock."""
+
+    def __init__(self):
+        self._value = multiprocessing.Value('b', 0, lock=False)
+
+    def set(self):
+        self._value.value = 1
+
+    def is_set(self) -> bool:
+        return bool(self._value.value)
+
+orchestrator_wake_event = WakeEvent()
+# Set by run_agent.py on shutdown: orchestrator workers finish their current tick and exit.
+shutdown_event = SharedFlag()
+
+def forward_status_events(target_queue):
+    """
+    For a worker process: everything put on status_update_queue here (log lines,
+    "goal_updated") is forwarded to `target_queue`, a multiprocessing queue the dashboard
+    process drains. The queue is re-initialized first, since a thread of the process it was
+    forked from may have held its lock at fork time.
+    """
+    status_update_queue.__init__()
+
+    def _forward():
+        while True:
+            target_queue.put(status_update_queue.get())
+
+    threading.Thread(target=_forward, name="StatusForwarder", daemon=True).start()
+
+def flush_status_events(target_queue):
+    """Forwards whatever is still queued, and the final metrics (called by a worker process right before it exits)."""
+    while True:
+        try:
+            target_queue.put(status_update_queue.get_nowait())
+        except queue.Empty:
+            break
+    target_queue.put(("metrics", os.getpid(), metrics.export()))
+
+# The dashboard process serves /metrics, so a worker process sends it its metric values
+# every few seconds ("metrics", pid, export()) over the same queue.
+METRICS_FORWARD_SECONDS = 5.0
+
+def forward_metrics(target_queue):
+    """For a worker process: periodically sends this process's metrics to the dashboard process."""
+    def _forward():
+        while True:
+            time.sleep(METRICS_FORWARD_SECONDS)
+            target_queue.put(("metrics", os.getpid(), metrics.export()))
+
+    threading.Thread(target=_forward, name="MetricsForwarder", daemon=True).start()
 
 # 4. Initialize Components
 from utils.rate_limiter import RateLimitTracker
+from utils.request_scheduler import RequestScheduler
 from utils.gemini_api import GeminiClient
 from core.memory_manager import MemoryManager
 
 rate_limiter = RateLimitTracker()
-gemini_client = GeminiClient(rate_limiter)
+request_scheduler = RequestScheduler(rate_limiter)
+gemini_client = GeminiClient(rate_limiter, request_scheduler)
 memory_manager = MemoryManager()
 
+# Worker processes are started with forkserver (a forked ChromaDB client hangs), so they build
+# this module afresh instead of inheriting it: the parent hands its shared memory over as an
+# argument and the worker adopts it before it starts.
+def shared_state() -> dict:
+    """The shared memory of this process's context, to pass to a worker process."""
+    return {
+        'wake_generations': orchestrator_wake_event._generations,
+        'shutdown': shutdown_event._value,
+        'scheduler': request_scheduler.shared_memory(),
+    }
+
+def adopt_shared_state(state: dict):
+    """In a worker process: use the parent's shared memory (from shared_state()) instead of its own."""
+    orchestrator_wake_event._generations = state['wake_generations']
+    shutdown_event._value = state['shutdown']
+    request_scheduler.adopt_shared_memory(state['scheduler'])
+
+# 5. Queue depth metrics (read at scrape time)
+metrics.QUEUE_DEPTH.set_function(status_update_queue.qsize, queue='status_update')
+for _tier in rate_limiter.limits:
+    metrics.QUEUE_DEPTH.set_function(lambda tier=_tier: request_scheduler.queue_depths().get(tier, 0), queue=f'scheduler_{_tier}')
+
 logger.info("Shared context initialized successfully.")
\ No newline at end of file
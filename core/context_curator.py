@@ -1,6 +1,7 @@
 import json
 from typing import List, Dict, Any
 from core.context import gemini_client, logger
+from utils.tracing import traced
 from pydantic import BaseModel
 
 class ContextCurator:
@@ -10,6 +11,7 @@ class ContextCurator:
     """
 
     @staticmethod
+    @traced('curator.get_relevant_context')
     def get_relevant_context(current_task: str, completed_steps: List[Dict[str, Any]]) -> Dict[str, str]:
         """
         Analyzes the current task and the summaries of completed steps to determine
@@ -58,7 +60,8 @@ class ContextCurator:
             response = gemini_client.ask_gemini(
                 prompt,
                 tier='tier2',
-                generation_config={"response_mime_type": "application/json", "temperature": 0.0}
+                generation_config={"response_mime_type": "application/json", "temperature": 0.0},
+                caller='curator'
             )
 
             selected_ids = []
@@ -0,0 +1,105 @@
+import time
+import threading
+from utils.logger import logger
+from utils.database import record_tool_latency, get_tool_latencies
+
+# --- Critical-Path Step Prioritization ---
+# When more steps are ready than the rate limiter admits, the order they get slots decides
+# the goal's makespan: a search whose output feeds a whole map phase should not wait behind
+# a write_to_file nothing depends on. Every unfinished step is weighted by the longest chain
+# of pending work it gates (its own expected duration plus its slowest dependent chain),
+# with durations taken from per-tool EWMAs of completed steps; ties go to the step with
+# more pending descendants. The weight orders the swarm's dispatch and, through the call
+# context's `sub_priority`, the RequestScheduler queue within the 'goal' class. It is kept
+# out of the step dicts, which are persisted, archived and indexed with the plan.
+
+TOOL_LATENCY_ALPHA = 0.2
+TOOL_LATENCY_REFRESH_SECONDS = 30  # How stale this worker's copy of the shared EWMAs may get
+# Priors until a tool has samples (seconds per step, including Executor/Curator calls)
+DEFAULT_TOOL_SECONDS = {
+    'reactive_solve': 60.0,
+    'google_search': 10.0,
+    'get_maps_data': 10.0,
+    'execute_python_code': 10.0,
+    'prompt': 8.0,
+    'request_user_input': 0.0,
+}
+DEFAULT_LOCAL_TOOL_SECONDS = 0.5  # File, email and profile tools make no model call
+
+def step_tool(step: dict) -> str:
+    """The tool a step runs ('prompt' for plain prompt steps), as used for metrics labels."""
+    return (step.get('tool_call') or {}).get('tool_name') or 'prompt'
+
+class ToolLatency:
+    """Per-tool step duration estimates, shared by all workers through the tool_latency table."""
+
+    def __init__(self, refresh_seconds: float = TOOL_LATENCY_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._estimates = {}
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, tool: str, seconds: float):
+        try:
+            record_tool_latency(tool, seconds, TOOL_LATENCY_ALPHA)
+        except Exception as e:
+            logger.warning(f"Could not record latency for tool '{tool}': {e}")
+        with self._lock:
+            previous = self._estimates.get(tool)
+            self._estimates[tool] = seconds if previous is None else previous + TOOL_LATENCY_ALPHA * (seconds - previous)
+
+    def estimate(self, tool: str) -> float:
+        """Expected seconds for one step of `tool`."""
+        with self._lock:
+            if time.time() - self._refreshed_at >= self.refresh_seconds:
+                self._refreshed_at = time.time()
+                try:
+                    self._estimates = get_tool_latencies()
+                except Exception as e:
+                    logger.warning(f"Could not load tool latencies: {e}")
+            if tool in self._estimates:
+                return self._estimates[tool]
+        return DEFAULT_TOOL_SECONDS.get(tool, DEFAULT_LOCAL_TOOL_SECONDS)
+
+def rank_steps(plan: list, estimate) -> dict:
+    """
+    step_id -> (critical_path_seconds, pending_descendants) for every pending or running
+    step. `estimate(tool)` gives a step's expected duration. Completed steps gate nothing.
+    """
+    pending = {s['step_id']: s for s in plan if s.get('status') in ('pending', 'running')}
+    dependents = {step_id: [] for step_id in pending}
+    for step in pending.values():
+        for dep in step.get('dependencies', []):
+            if dep in dependents:
+                dependents[dep].append(step['step_id'])
+
+    ranks, descendants, visiting = {}, {}, set()
+
+    def visit(step_id):
+        if step_id in ranks:
+            return
+        visiting.add(step_id)
+        longest, below = 0.0, set()
+        for child in dependents[step_id]:
+            if child in visiting:
+                continue  # A cyclic plan never becomes executable; just don't recurse forever
+            visit(child)
+            longest = max(longest, ranks[child][0])
+            below |= descendants[child] | {child}
+        visiting.discard(step_id)
+        descendants[step_id] = below
+        ranks[step_id] = (estimate(step_tool(pending[step_id])) + longest, len(below))
+
+    for step_id in pending:
+        visit(step_id)
+    return ranks
+
+def prioritize(plan: list, steps: list, estimate) -> tuple[list, dict]:
+    """
+    (`steps` ordered most critical first, step_id -> critical_path_seconds). The seconds
+    become the scheduler sub-priority of each step's calls (see _execute_step).
+    """
+    ranks = rank_steps(plan, estimate)
+    critical_seconds = {step['step_id']: round(ranks.get(step['step_id'], (0.0, 0))[0], 1) for step in steps}
+    ordered = sorted(steps, key=lambda s: (-ranks.get(s['step_id'], (0.0, 0))[0], -ranks.get(s['step_id'], (0.0, 0))[1], s['step_id']))
+    return ordered, critical_seconds
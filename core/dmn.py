@@ -4,40 +4,43 @@ from datetime import datetime, timedelta
 import json
 from core.context import logger, gemini_client, memory_manager
 from core.planner import orchestrate_planning
-from utils.database import add_goal, get_recent_failed_goals, get_archived_goals, update_user_profile, get_active_goal
+from utils.database import add_goal, get_recent_failed_goals, get_archived_goal_summaries, update_user_profile, get_active_goal
 from utils.calendar_client import get_upcoming_events
+from utils.call_context import call_context
 
 def run_dmn_tasks(gemini_client_instance, memory_manager_instance):
     """
     The main DMN orchestrator. It runs when the agent is idle
     and decides which background task to perform, in order of priority.
     """
-    # Ensure we are truly idle and not just in a 30s-loop
-    if get_active_goal():
-        logger.info("DMN: Agent is not idle (active goal found). DMN standing by.")
-        return
+    # Every LLM call made from here (including the Strategist/Planner) is DMN traffic.
+    with call_context(priority='dmn'):
+        # Ensure we are truly idle and not just in a 30s-loop
+        if get_active_goal():
+            logger.info("DMN: Agent is not idle (active goal found). DMN standing by.")
+            return
         
-    logger.info("--- DMN (Idle) Orchestrator Waking Up ---")
+        logger.info("--- DMN (Idle) Orchestrator Waking Up ---")
     
-    # Priority 1: Learn from recent failures (Reflexion)
-    if len(get_recent_failed_goals(limit=1)) > 0:
-        logger.info("DMN: Triggering Reflexion Loop (P1)...")
-        run_reflexion_loop(gemini_client_instance, memory_manager_instance)
-        return # Only do one task per idle cycle
-
-    # Priority 2: Infer user preferences (Profile Weaving)
-    # We'll run this less often, e.g., if we haven't in a while.
-    # (For now, we just check. We can add a timestamp check later).
-    logger.info("DMN: Triggering User Profile Weaver (P2)...")
-    run_user_profile_weaver(gemini_client_instance)
+        # Priority 1: Learn from recent failures (Reflexion)
+        if len(get_recent_failed_goals(limit=1)) > 0:
+            logger.info("DMN: Triggering Reflexion Loop (P1)...")
+            run_reflexion_loop(gemini_client_instance, memory_manager_instance)
+            return # Only do one task per idle cycle
+
+        # Priority 2: Infer user preferences (Profile Weaving)
+        # We'll run this less often, e.g., if we haven't in a while.
+        # (For now, we just check. We can add a timestamp check later).
+        logger.info("DMN: Triggering User Profile Weaver (P2)...")
+        run_user_profile_weaver(gemini_client_instance)
     
-    # Priority 3: Synthesize new insights (Memory Weaving)
-    logger.info("DMN: Triggering Memory Weaving Loop (P3)...")
-    run_memory_weaving_loop(gemini_client_instance, memory_manager_instance)
+        # Priority 3: Synthesize new insights (Memory Weaving)
+        logger.info("DMN: Triggering Memory Weaving Loop (P3)...")
+        run_memory_weaving_loop(gemini_client_instance, memory_manager_instance)
     
-    # Priority 4: Brainstorm a new task (Proactive Goal)
-    logger.info("DMN: Triggering Creative Synthesis Loop (P4)...")
-    creative_synthesis_loop(gemini_client_instance, memory_manager_instance)
+        # Priority 4: Brainstorm a new task (Proactive Goal)
+        logger.info("DMN: Triggering Creative Synthesis Loop (P4)...")
+        creative_synthesis_loop(gemini_client_instance, memory_manager_instance)
 
 def creative_synthesis_loop(gemini_client_instance, memory_manager_instance):
     """
@@ -77,7 +80,7 @@ def creative_synthesis_loop(gemini_client_instance, memory_manager_instance):
     """
     
     logger.info("   -> DMN: Brainstorming a new goal idea...")
-    response = gemini_client_instance.ask_gemini(brainstorm_prompt, tier='tier1')
+    response = gemini_client_instance.ask_gemini(brainstorm_prompt, tier='tier1', caller='dmn')
     
     if not response or not hasattr(response, 'text') or not response.text:
         logger.error("   -> DMN ERROR: Brainstorming did not produce a goal.")
@@ -208,16 +211,16 @@ def run_user_profile_weaver(gemini_client_instance):
 
     try:
         # 1. Get the 10 most recent *completed* goals
-        successful_goals = get_archived_goals(page=1, per_page=10)
+        successful_goals = get_archived_goal_summaries(page=1, per_page=10)
         # Filter for only 'complete' status
-        successful_goals = [g for g in successful_goals if g.get('status') == 'complete']
+        successful_goals = [g for g in successful_goals if g.status == 'complete']
 
         if len(successful_goals) < 3:
             logger.info(f"   -> DMN: Not enough successful goals ({len(successful_goals)}) to analyze for profile.")
             return
 
         # 2. Format the goals for the prompt
-        goal_list_str = "\n".join([f"- {g['goal']}" for g in successful_goals])
+        goal_list_str = "\n".join([f"- {g.goal}" for g in successful_goals])
 
         # 3. Create the analysis prompt
         analysis_prompt = f"""
@@ -245,7 +248,8 @@ def run_user_profile_weaver(gemini_client_instance):
         response = gemini_client_instance.ask_gemini(
             analysis_prompt, 
             tier='tier1',
-            response_schema={"type": "object", "additionalProperties": {"type": "string"}}
+            response_schema={"type": "object", "additionalProperties": {"type": "string"}},
+            caller='dmn'
         )
 
         if response and hasattr(response, 'parsed'):
@@ -275,7 +279,7 @@ def run_reflexion_loop(gemini_client_instance, memory_manager_instance):
     logger.info("   -> DMN: Starting reflexion loop...")
 
     # 1. Get the last failed goal
-    failed_goals = get_recent_failed_goals(limit=1)
+    failed_goals = get_recent_failed_goals(limit=1, hydrate=True)  # The post-mortem needs full outputs
     if not failed_goals:
         logger.info("   -> DMN: No new failed goals found to analyze.")
         return
@@ -398,7 +402,7 @@ def generate_eod_summary(memory_manager_instance, gemini_client_instance):
             """
             
             logger.info("   -> EOD Summary: Generating summary with Gemini...")
-            response = gemini_client_instance.ask_gemini(prompt, tier='tier1')
+            response = gemini_client_instance.ask_gemini(prompt, tier='tier1', caller='eod_summary')
 
             if response and hasattr(response, 'text'):
                 summary = response.text
@@ -112,7 +112,8 @@ def run_executor(user_goal: str, full_plan: list, strategy_blueprint: dict, cont
         tier='tier2',
         generation_config=executor_generation_config,
         response_schema=response_schema,
-        system_instruction=persona
+        system_instruction=persona,
+        caller='executor'
     )
 
     if task_type == "refine_subgoal":
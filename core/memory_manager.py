@@ -19,15 +19,35 @@ class MemoryManager:
         if not os.getenv("GEMINI_API_KEY"):
             raise ValueError("GEMINI_API_KEY not found in .env file for MemoryManager.")
 
-        # Initialize the ChromaDB client and collection
-        self.client = chromadb.PersistentClient(path=chroma_path)
-        self.collection = self.client.get_or_create_collection(name=collection_name)
+        # The ChromaDB client and collection are opened on first use (see `collection`)
+        self.chroma_path = chroma_path
+        self.collection_name = collection_name
+        self._collection = None
+        self._opened_in = None  # pid of the process that opened it
         
         # Initialize the Gemini embedding model
         # text-embedding-004 is a powerful and efficient model for this task.
         self.embedding_model = 'models/gemini-embedding-001'
         logger.info("MemoryManager initialized successfully.")
 
+    @property
+    def collection(self):
+        """
+        The memory collection, opened on first use by the process that uses it. A ChromaDB
+        client is not fork-safe (its first call from a forked child blocks forever), so a
+        process must not be forked from one that has opened it: run_agent.py starts orchestrator
+        worker processes with forkserver, and each opens its own client here.
+        """
+        if self._collection is None:
+            self._collection = chromadb.PersistentClient(path=self.chroma_path).get_or_create_collection(name=self.collection_name)
+            self._opened_in = os.getpid()
+        elif self._opened_in != os.getpid():
+            raise RuntimeError(
+                f"The memory collection was opened by process {self._opened_in}, which this process was forked from. "
+                "Start processes that use memory with the forkserver or spawn method."
+            )
+        return self._collection
+
     def add_memory(self, document: str, doc_id: str, metadata: dict = None):
         """
         Adds a single document (memory) to the collection.
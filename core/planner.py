@@ -9,6 +9,8 @@ from .strategist import run_strategist
 from .tools import TOOL_MANIFEST
 from .agent_profile import get_agent_profile 
 from utils.database import get_user_profile
+from utils.tracing import traced
+from utils import serialization
 
 MAX_PLANNING_RETRIES = 1
 
@@ -58,6 +60,7 @@ def validate_plan(plan_data: list) -> tuple[bool, str | None]:
     except Exception as e:
         return False, f"Unexpected validation error: {e}"
 
+@traced('orchestrate_planning')
 def orchestrate_planning(user_goal: str, preferred_tier: str = 'tier1', existing_context_str: str = None) -> dict | None:
     """Orchestrates the planning process."""
     logger.info(f"PLANNING ORCHESTRATOR: Starting planning for goal: '{user_goal}'")
@@ -93,8 +96,8 @@ def orchestrate_planning(user_goal: str, preferred_tier: str = 'tier1', existing
         
         if plan_json == "RATE_LIMIT_HIT":
             rate_limit_retries += 1
-            time.sleep(30)
             if rate_limit_retries > MAX_PLANNING_RETRIES: return None
+            time.sleep(gemini_client.get_retry_delay(preferred_tier, rate_limit_retries))
             continue
 
         if not plan_json:
@@ -125,6 +128,7 @@ def orchestrate_planning(user_goal: str, preferred_tier: str = 'tier1', existing
     logger.error("PLANNING ORCHESTRATOR: Failed to generate a valid plan.")
     return None
 
+@traced('generate_plan')
 def generate_plan(user_goal: str, strategy_blueprint: dict, gemini_client, retry_context: dict = None, tier: str = 'tier1', existing_context_str: str = None) -> list | None | str:
     # Use response_mime_type="application/json" for JSON Mode.
     planner_generation_config = {
@@ -154,7 +158,7 @@ def generate_plan(user_goal: str, strategy_blueprint: dict, gemini_client, retry
     try:
         profile = get_user_profile()
         if profile:
-            profile_str = json.dumps(profile, indent=2)
+            profile_str = serialization.dumps_pretty(profile)
             user_profile_addition = f"**USER PROFILE:**\n{profile_str}"
     except Exception: pass
 
@@ -163,7 +167,7 @@ def generate_plan(user_goal: str, strategy_blueprint: dict, gemini_client, retry
     prompt = f"""
     {retry_str}
     **TASK:** Create a JSON plan for: "{user_goal}"
-    **STRATEGY:** {json.dumps(strategy_blueprint, indent=2)}
+    **STRATEGY:** {serialization.dumps_pretty(strategy_blueprint)}
     **DATE:** {current_date_str}
     
     {context_str}
@@ -178,14 +182,15 @@ def generate_plan(user_goal: str, strategy_blueprint: dict, gemini_client, retry
         response = gemini_client.ask_gemini(
             prompt, tier=tier, generation_config=planner_generation_config,
             # response_schema=None, 
-            system_instruction=system_instruction
+            system_instruction=system_instruction,
+            caller='planner'
         )
         
         if response == "RATE_LIMIT_HIT": return "RATE_LIMIT_HIT"
         
         if response and response.text:
             try:
-                parsed = json.loads(response.text)
+                parsed = serialization.loads(response.text)
                 
                 # --- CRITICAL FIX FOR 'list' object has no attribute 'get' ---
                 if isinstance(parsed, list):
@@ -0,0 +1,246 @@
+import re
+import copy
+import json
+import time
+import threading
+import concurrent.futures
+from datetime import date
+from core.context import logger, rate_limiter
+from utils import metrics
+from utils.cancellation import CancellationToken
+
+# --- Configuration ---
+# Tools whose result depends only on their own parameters and that have no side effects.
+# These can be fully pre-executed before their dependencies finish.
+SPECULATIVE_EXECUTE_TOOLS = ["google_search", "get_maps_data", "execute_python_code"]
+# Tools where only the (cheap, tier2) Executor refinement is done ahead of time.
+SPECULATIVE_REFINE_TOOLS = ["reactive_solve"]
+
+MAX_SPECULATIVE_WORKERS = 2
+SPECULATION_TTL_SECONDS = 1800
+# How long a step that became executable waits for its in-flight speculative work before
+# running normally instead (well inside the step's own timeout). The wait also ends with
+# the step's cancel token, checked every poll.
+SPECULATION_CLAIM_TIMEOUT_SECONDS = 60.0
+SPECULATION_CLAIM_POLL_SECONDS = 0.5
+# Every job runs under its own cancel token with this deadline (a real step's budget). The
+# token is also cancelled when the job's result is discarded: a running job cannot be
+# interrupted, but it stops before its next LLM call instead of spending slots on dead work.
+SPECULATION_JOB_TIMEOUT_SECONDS = 300.0
+
+# Budget caps. Speculation is wasted work if a replan discards it, so it must never
+# compete with real steps: a tier is only used while its daily usage is below the cap,
+# the minute window still has spare slots, and the speculative call count for the day is under budget.
+SPECULATION_USAGE_CAPS = {'tier1': 30.0, 'tier2': 60.0}
+SPECULATION_DAILY_CALL_CAPS = {'tier1': 0, 'tier2': 60}
+SPECULATION_MIN_FREE_RPM = 2
+
+PLACEHOLDER_PATTERN = re.compile(r"\[output_of_step_\d+\]")
+
+class SpeculativeResult:
+    """A pre-computed result for a step that was not yet executable."""
+
+    def __init__(self, kind: str, fingerprint: str, future: concurrent.futures.Future, token: CancellationToken):
+        self.kind = kind  # 'executed' (final output) or 'refined' (Executor output)
+        self.fingerprint = fingerprint
+        self.future = future
+        self.token = token
+        self.value = None
+        self.created_at = time.time()
+
+class Speculator:
+    """
+    Opt-in speculative execution for the orchestrator.
+
+    Steps whose inputs are already fully determined (no `[output_of_step_X]` placeholders)
+    are run or refined in the background while their dependencies are still executing.
+    When the step becomes executable the result is committed; if the goal is replanned,
+    cancelled or fails, it is discarded.
+    """
+
+    def __init__(self, max_workers: int = MAX_SPECULATIVE_WORKERS):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculator")
+        self._max_in_flight = max_workers
+        self._results = {}  # (goal_id, step_id) -> SpeculativeResult
+        self._lock = threading.Lock()
+        self._calls_today = {}
+        self._budget_day = date.today()
+        self.stats = {"submitted": 0, "committed": 0, "discarded": 0}
+
+    @staticmethod
+    def fingerprint(step: dict) -> str:
+        return json.dumps(step.get('tool_call') or step.get('prompt'), sort_keys=True, default=str)
+
+    @staticmethod
+    def speculation_kind(step: dict) -> str | None:
+        """Returns 'executed' or 'refined' if a step's inputs are fully determined, otherwise None."""
+        tool_call = step.get('tool_call')
+        if not tool_call:
+            # Prompt steps are synthesis steps; they implicitly need their dependencies' outputs.
+            return None
+        if PLACEHOLDER_PATTERN.search(json.dumps(tool_call.get('parameters', {}), default=str)):
+            return None
+
+        tool_name = tool_call.get('tool_name')
+        if tool_name in SPECULATIVE_EXECUTE_TOOLS: return 'executed'
+        if tool_name in SPECULATIVE_REFINE_TOOLS: return 'refined'
+        return None
+
+    def _reset_budget_if_new_day(self):
+        today = date.today()
+        if today != self._budget_day:
+            self._budget_day = today
+            self._calls_today = {}
+
+    @staticmethod
+    def _has_headroom(tier: str) -> bool:
+        """Live rate-limit headroom for a tier (two DB reads; speculate() does this once per tier)."""
+        if rate_limiter.get_daily_usage_percentage(tier) >= SPECULATION_USAGE_CAPS.get(tier, 0.0):
+            return False
+        rpm_left, _ = rate_limiter.get_remaining_capacity(tier)
+        return rpm_left >= SPECULATION_MIN_FREE_RPM
+
+    def _has_budget(self, tier: str, calls: int, headroom: dict) -> bool:
+        """Checks the speculation budget and the tick's rate-limit headroom (`headroom`: tier -> bool)."""
+        if self._calls_today.get(tier, 0) + calls > SPECULATION_DAILY_CALL_CAPS.get(tier, 0):
+            return False
+        return headroom.get(tier, False)
+
+    @staticmethod
+    def _job_costs(kind: str, goal_tier: str) -> dict:
+        """API calls per tier: the Executor refinement runs on tier2, the native tool on the goal's tier."""
+        costs = {'tier2': 1}
+        if kind == 'executed':
+            costs[goal_tier] = costs.get(goal_tier, 0) + 1
+        return costs
+
+    def _prune_expired(self):
+        now = time.time()
+        for key, result in list(self._results.items()):
+            if now - result.created_at > SPECULATION_TTL_SECONDS:
+                result.token.cancel('discarded')
+                del self._results[key]
+                self.stats["discarded"] += 1
+
+    def speculate(self, goal: dict, candidate_steps: list, job_fn):
+        """
+        Submits background work for blocked steps whose inputs are already determined.
+
+        `job_fn(step, goal, kind, cancel_token)` performs the actual work and returns the
+        result, or None if it should be discarded; it stops once `cancel_token` is cancelled.
+        Tier costs: refinement uses tier2; pre-execution also uses the goal's tier for the
+        native tool call.
+        """
+        goal_id = goal.get('goal_id')
+        goal_tier = goal.get('preferred_tier', 'tier1')
+        failed_ids = {s['step_id'] for s in goal.get('plan', []) if s.get('status') == 'failed'}
+        if not any(self.speculation_kind(step) for step in candidate_steps):
+            return
+        # Headroom is read once per tier for the whole tick, outside the lock.
+        headroom = {tier: self._has_headroom(tier) for tier in self._job_costs('executed', goal_tier)}
+        # The orchestrator keeps mutating the live goal dict; jobs get a snapshot.
+        goal_snapshot = copy.deepcopy(goal)
+
+        with self._lock:
+            self._reset_budget_if_new_day()
+            self._prune_expired()
+
+            for step in candidate_steps:
+                in_flight = sum(1 for r in self._results.values() if not r.future.done())
+                if in_flight >= self._max_in_flight:
+                    return
+
+                key = (goal_id, step.get('step_id'))
+                if key in self._results: continue
+                if failed_ids.intersection(step.get('dependencies', [])): continue
+
+                kind = self.speculation_kind(step)
+                if not kind: continue
+
+                # Pre-execution on tier1 is only allowed within its (default zero) budget;
+                # otherwise fall back to pre-refining on tier2.
+                costs = self._job_costs(kind, goal_tier)
+                if kind == 'executed' and not all(self._has_budget(t, n, headroom) for t, n in costs.items()):
+                    kind = 'refined'
+                    costs = self._job_costs(kind, goal_tier)
+                if not all(self._has_budget(t, n, headroom) for t, n in costs.items()):
+                    continue
+
+                for tier, calls in costs.items():
+                    self._calls_today[tier] = self._calls_today.get(tier, 0) + calls
+
+                token = CancellationToken(time.time() + SPECULATION_JOB_TIMEOUT_SECONDS)
+                future = self._executor.submit(job_fn, dict(step), goal_snapshot, kind, token)
+                self._results[key] = SpeculativeResult(kind, self.fingerprint(step), future, token)
+                self.stats["submitted"] += 1
+                logger.info(f"SPECULATOR: Pre-{'executing' if kind == 'executed' else 'refining'} blocked Step {step.get('step_id')} of goal '{goal_id}'.")
+
+    def has_result(self, goal_id: str, step: dict, kind: str = None) -> bool:
+        with self._lock:
+            result = self._results.get((goal_id, step.get('step_id')))
+        return bool(result) and (kind is None or result.kind == kind) and result.fingerprint == self.fingerprint(step)
+
+    def claim(self, goal_id: str, step: dict, cancel_token: CancellationToken = None,
+              timeout: float = SPECULATION_CLAIM_TIMEOUT_SECONDS) -> SpeculativeResult | None:
+        """
+        Commits a speculative result for a step that is now executable.
+        Waits up to `timeout` (never past `cancel_token`'s deadline) for in-flight work (it
+        is already paid for) and returns the resolved SpeculativeResult, or None if there is
+        nothing usable. Raises Cancelled if `cancel_token` is cancelled while it waits.
+        """
+        with self._lock:
+            result = self._results.pop((goal_id, step.get('step_id')), None)
+        metrics.record_cache('speculation', hit=bool(result))
+        if not result: return None
+
+        if result.fingerprint != self.fingerprint(step):
+            self._discard(result)
+            return None
+
+        deadline = time.time() + timeout
+        if cancel_token is not None and cancel_token.deadline is not None:
+            deadline = min(deadline, cancel_token.deadline)
+        value = None
+        while True:
+            try:
+                value = result.future.result(timeout=max(0.0, min(SPECULATION_CLAIM_POLL_SECONDS, deadline - time.time())))
+                break
+            except concurrent.futures.TimeoutError:
+                if cancel_token is not None and cancel_token.cancelled:
+                    self._discard(result)
+                    cancel_token.check()
+                if time.time() >= deadline:
+                    logger.warning(f"SPECULATOR: Speculative work for Step {step.get('step_id')} still running after {timeout:.1f}s. Running the step normally.")
+                    break
+            except Exception as e:
+                logger.warning(f"SPECULATOR: Speculative work for Step {step.get('step_id')} failed: {e}")
+                break
+
+        if value is None:
+            self._discard(result)
+            return None
+
+        result.value = value
+        with self._lock:
+            self.stats["committed"] += 1
+        logger.info(f"SPECULATOR: Committed speculative '{result.kind}' result for Step {step.get('step_id')}.")
+        return result
+
+    def _discard(self, result: SpeculativeResult):
+        """Stops a result's job if it is still running and counts it as discarded."""
+        result.token.cancel('discarded')
+        result.future.cancel()
+        with self._lock:
+            self.stats["discarded"] += 1
+
+    def discard_goal(self, goal_id: str):
+        """Drops all speculative results for a goal (replanned, cancelled or failed)."""
+        with self._lock:
+            keys = [k for k in self._results if k[0] == goal_id]
+            for key in keys:
+                self._results[key].token.cancel('discarded')
+                self._results[key].future.cancel()
+                del self._results[key]
+            self.stats["discarded"] += len(keys)
+        if keys:
+            logger.info(f"SPECULATOR: Discarded {len(keys)} speculative result(s) for goal '{goal_id}'.")
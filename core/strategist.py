@@ -5,6 +5,7 @@ from enum import Enum
 from pydantic import BaseModel, Field
 
 from core.context import logger, gemini_client
+from utils.tracing import traced
 
 # This Pydantic model IS the blueprint we will give to the API.
 class StrategyBlueprint(BaseModel):
@@ -29,6 +30,7 @@ class StrategyBlueprint(BaseModel):
         )
     )
 
+@traced('run_strategist')
 def run_strategist(user_goal: str) -> StrategyBlueprint | None:
     """
     Analyzes a user's goal and returns a structured StrategyBlueprint object
@@ -64,7 +66,8 @@ def run_strategist(user_goal: str) -> StrategyBlueprint | None:
         tier='tier2', 
         generation_config=strategist_generation_config, # <-- This is the change
         response_schema=StrategyBlueprint,
-        system_instruction=system_instruction
+        system_instruction=system_instruction,
+        caller='strategist'
     )
 
     # --- This is the block the error was about. It is now correctly indented. ---
@@ -1,7 +1,10 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify
-from flask_socketio import SocketIO
-import json
+from flask import Flask, render_template, request, redirect, url_for, jsonify, Response
+from flask_socketio import SocketIO, emit
+from markupsafe import escape
 import os
+import sqlite3
+import time
+import queue
 import uuid
 import math
 import threading
@@ -10,26 +13,33 @@ from datetime import datetime
 
 # --- Imports from your original file ---
 from core.dmn import creative_synthesis_loop  
-from core.context import logger, status_update_queue, gemini_client, memory_manager, rate_limiter # Added rate_limiter
+from core.context import logger, status_update_queue, gemini_client, memory_manager, rate_limiter, request_scheduler
 from utils.database import (
     add_goal as db_add_goal, 
     get_active_goals, 
     get_archived_goals, 
+    get_archived_goal_summaries,
     get_goal_by_id, 
     update_goal, 
     archive_goal,
     update_goal_status,
     get_archived_goal_count,
+    get_archive_page,
+    search_archive,
+    get_archived_goal,
     update_goal_tier,
     get_user_profile,
-    update_user_profile
+    update_user_profile,
+    get_goal_status_counts
 )
+from utils import metrics, log_reader, serialization, supervisor
 # Use the new orchestrator_wake_event from context
 from core.context import orchestrator_wake_event
 from core.planner import orchestrate_planning
 from utils.goal_manager import create_and_add_goal
 from core.agent_profile import get_agent_profile
 from core.tools import TOOL_MANIFEST
+from utils.call_context import call_context
 from google.genai import types
 
 # --- NOISE REDUCTION (Requested Change) ---
@@ -38,38 +48,154 @@ log = logging.getLogger('werkzeug')
 log.setLevel(logging.ERROR) 
 
 app = Flask(__name__)
+serialization.configure_flask(app)
 # Disable SocketIO logs
-socketio = SocketIO(app, async_mode='threading', logger=False, engineio_logger=False)
+socketio = SocketIO(app, async_mode='threading', logger=False, engineio_logger=False, json=serialization.JsonModule)
 ARCHIVE_PER_PAGE = 10
+# Log lines are pushed to browsers in batches: the first line opens a window, and everything
+# that arrives within it goes out as one 'new_log_lines' event (one emit per burst, not per line).
+LOG_BATCH_WINDOW_SECONDS = 0.25
+LOG_BATCH_MAX_LINES = 200
+LOG_TAIL_LINES = 50
+LOG_PAGE_LINES = 500
 
-def get_full_status_data():
-    """Helper to gather all data for a dashboard update."""
-    active = get_active_goals()
-    archived_preview = get_archived_goals(page=1, per_page=10)
-    
-    log_content = "Log file not found."
+# --- NEW: Debounced, Versioned Status Pushes ---
+# "goal_updated" events are coalesced for STATUS_DEBOUNCE_SECONDS, then one 'status_delta' goes
+# out with only the goals/steps that changed since the previous version. Full snapshots
+# ('status_update') are only sent on connect, or when a client reports a version gap.
+STATUS_DEBOUNCE_SECONDS = 0.3
+ARCHIVE_PREVIEW_SIZE = 10
+ARCHIVE_PREVIEW_TTL_SECONDS = 60
+
+_part_cache = {}
+_part_cache_lock = threading.Lock()
+
+def _cached_part(name: str, key, loader):
+    """Returns the cached value for `name` while `key` is unchanged, otherwise reloads it."""
+    with _part_cache_lock:
+        cached = _part_cache.get(name)
+        if cached is not None and cached[0] == key:
+            metrics.record_cache(f"dashboard_{name}", True)
+            return cached[1]
+    metrics.record_cache(f"dashboard_{name}", False)
+    value = loader()
+    with _part_cache_lock:
+        _part_cache[name] = (key, value)
+    return value
+
+def get_archive_preview() -> list:
+    """The archive preview, reloaded when the archive grows (or at least every TTL)."""
+    key = (get_archived_goal_count(), int(time.time() // ARCHIVE_PREVIEW_TTL_SECONDS))
+    return _cached_part('archive_preview', key, lambda: [
+        goal._asdict() for goal in get_archived_goal_summaries(page=1, per_page=ARCHIVE_PREVIEW_SIZE)
+    ])
+
+def get_summary_content() -> str:
+    """Today's summary, re-read only when the file's mtime changes."""
+    summary_filename = f"data/reports/{datetime.now().strftime('%Y-%m-%d')}_summary.md"
     try:
-        with open('logs/agent.log', 'r', encoding='utf-8') as f:
-            # Read last 50 lines for better context
-            log_lines = f.readlines()[-50:]
-            log_content = "".join(reversed(log_lines))
-    except Exception: pass
+        mtime = os.path.getmtime(summary_filename)
+    except OSError:
+        return "Today's summary has not been generated yet."
+    def load():
+        with open(summary_filename, 'r', encoding='utf-8') as f:
+            return f.read()
+    try:
+        return _cached_part('summary', (summary_filename, mtime), load)
+    except Exception:
+        return "Today's summary has not been generated yet."
 
-    summary_content = "Today's summary has not been generated yet."
+def get_log_tail() -> str:
+    log_content = "Log file not found."
     try:
-        today_str = datetime.now().strftime('%Y-%m-%d')
-        summary_filename = f"data/reports/{today_str}_summary.md"
-        if os.path.exists(summary_filename):
-            with open(summary_filename, 'r', encoding='utf-8') as f:
-                summary_content = f.read()
+        # Last 50 lines (newest first) from the in-memory tail buffer
+        log_lines = log_reader.tail(LOG_TAIL_LINES)
+        if log_lines:
+            log_content = "\n".join(reversed(log_lines)) + "\n"
     except Exception: pass
+    return log_content
+
+def _diff_goal(old: dict, new: dict) -> dict | None:
+    """Changed top-level fields, and either the changed steps or the whole plan if it was replanned."""
+    change = {}
+    fields = {key: value for key, value in new.items() if key != 'plan' and old.get(key) != value}
+    if fields:
+        change['fields'] = fields
+    old_plan, new_plan = old.get('plan') or [], new.get('plan') or []
+    if [step.get('step_id') for step in old_plan] != [step.get('step_id') for step in new_plan]:
+        change['plan'] = new_plan
+    else:
+        steps = [step for before, step in zip(old_plan, new_plan) if before != step]
+        if steps:
+            change['steps'] = steps
+    return change or None
+
+class StatusPublisher:
+    """Tracks the last published dashboard state and turns each refresh into a versioned diff."""
+
+    def __init__(self):
+        self.version = 0
+        self._goals = {}
+        self._order = []
+        self._archived = None
+        self._summary = None
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> dict | None:
+        """Reloads the state; returns the delta from the previous version (None if unchanged)."""
+        goals = get_active_goals()
+        archived = get_archive_preview()
+        summary = get_summary_content()
+
+        delta = {}
+        current = {goal['goal_id']: goal for goal in goals}
+        order = [goal['goal_id'] for goal in goals]
+        added = [goal for goal in goals if goal['goal_id'] not in self._goals]
+        removed = [goal_id for goal_id in self._order if goal_id not in current]
+        changed = {}
+        for goal_id, goal in current.items():
+            if goal_id in self._goals:
+                change = _diff_goal(self._goals[goal_id], goal)
+                if change:
+                    changed[goal_id] = change
+        if added: delta['added'] = added
+        if removed: delta['removed'] = removed
+        if changed: delta['goals'] = changed
+        if order != self._order: delta['order'] = order
+        if archived != self._archived: delta['archived_goals'] = archived
+        if summary != self._summary: delta['summary_content'] = summary
 
-    return {
-        'active_goals': active, 
-        'archived_goals': archived_preview,
-        'log_tail': log_content, 
-        'summary_content': summary_content
-    }
+        self._goals, self._order, self._archived, self._summary = current, order, archived, summary
+        if not delta:
+            return None
+        delta['base_version'] = self.version
+        self.version += 1
+        delta['version'] = self.version
+        return delta
+
+    def publish(self):
+        """Broadcasts the changes since the last version (nothing if there are none)."""
+        with self._lock:
+            self._broadcast(self._refresh())
+
+    def _broadcast(self, delta: dict | None):
+        # Nobody can hold version 0 (every snapshot refreshes first), so the initial load is not sent
+        if delta and delta['base_version'] > 0:
+            socketio.emit('status_delta', delta)
+
+    def snapshot(self) -> dict:
+        """A full snapshot tagged with the current version (pending changes are broadcast first)."""
+        with self._lock:
+            self._broadcast(self._refresh())
+            return {
+                'version': self.version,
+                'active_goals': [self._goals[goal_id] for goal_id in self._order],
+                'archived_goals': self._archived,
+                'log_tail': get_log_tail(),
+                'summary_content': self._summary,
+            }
+
+status_publisher = StatusPublisher()
 
 # --- FLASK ROUTES ---
 
@@ -114,10 +240,10 @@ def set_goal_status_route(goal_id):
         return jsonify(error="Status not provided"), 400
     
     if status == 'cancelled':
+        # Status first, so the archived row says 'cancelled'. The worker running the goal
+        # notices within seconds and stops its in-flight steps (see LeaseKeeper in main.py).
+        update_goal_status(goal_id, 'cancelled')
         archive_goal(goal_id)
-        # We update status AFTER archiving to ensure the orchestrator loop sees it
-        # update_goal_status handles the DB logic
-        update_goal_status(goal_id, 'cancelled') 
     else:
         update_goal_status(goal_id, status)
     
@@ -132,7 +258,7 @@ def trigger_dmn():
     logger.info("DASHBOARD: Manual DMN trigger received.")
     
     def dmn_task():
-        with app.app_context():
+        with app.app_context(), call_context(priority='dmn'):
             creative_synthesis_loop(gemini_client, memory_manager)
             status_update_queue.put("goal_updated")
             orchestrator_wake_event.set()
@@ -150,11 +276,80 @@ def get_rate_limits():
         
         return jsonify({
             "tier1": {"usage_pct": t1_usage, "limit": 50},
-            "tier2": {"usage_pct": t2_usage, "limit": 250}
+            "tier2": {"usage_pct": t2_usage, "limit": 250},
+            "scheduler": request_scheduler.get_status(),
+            "tier_policy": gemini_client.tier_policy.get_stats(),
+            "circuits": gemini_client.get_circuit_status()
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# --- NEW: Prometheus Metrics ---
+def _collect_goal_metrics():
+    counts = get_goal_status_counts() or {}
+    metrics.GOALS.reset()
+    for table, by_status in counts.items():
+        for status, n in by_status.items():
+            metrics.GOALS.set(n, table=table, status=status)
+
+metrics.register_collector(_collect_goal_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """In-process counters and histograms in Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/usage', methods=['GET'])
+def get_usage():
+    """Token usage rollups by day/tier/caller with estimated cost, and the heaviest goals of the last 24h."""
+    try:
+        days = max(1, min(request.args.get('days', 7, type=int), 90))
+        report = gemini_client.get_usage_report(days)
+        report['token_budgets'] = request_scheduler.get_status()['token_budgets']
+        return jsonify(report)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/archive/<goal_id>', methods=['GET'])
+def get_archived_goal_api(goal_id):
+    """A single archived goal with its full (decompressed) step outputs."""
+    goal = get_archived_goal(goal_id)
+    if not goal:
+        return jsonify({"error": "Archived goal not found."}), 404
+    return jsonify(goal)
+
+# --- NEW: Archive Search API ---
+# Highlight markers are control characters so the snippet can be HTML-escaped before <mark> is added.
+_HIGHLIGHT = ('\x02', '\x03')
+
+@app.route('/api/search', methods=['GET'])
+def search_archive_api():
+    """Ranked full-text search of archived goals: ?q=<text>&limit=&offset=&raw=1 (FTS5 syntax)."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Missing query parameter 'q'."}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    try:
+        hits = search_archive(query, limit=limit, offset=offset, highlight=_HIGHLIGHT, raw=request.args.get('raw') == '1')
+    except sqlite3.OperationalError as e:
+        return jsonify({"error": f"Invalid search query: {e}"}), 400
+    results = []
+    for hit in hits:
+        snippet = str(escape(hit.snippet or '')).replace(_HIGHLIGHT[0], '<mark>').replace(_HIGHLIGHT[1], '</mark>')
+        results.append({**hit._asdict(), 'snippet': snippet})
+    return jsonify({"query": query, "limit": limit, "offset": offset, "results": results})
+
+@app.route('/api/circuit_breakers', methods=['GET'])
+def get_circuit_breakers():
+    """Returns the per-tier circuit breaker state (closed/open/half_open)."""
+    return jsonify(gemini_client.get_circuit_status())
+
+@app.route('/api/services', methods=['GET'])
+def get_services():
+    """Returns state, uptime, restart count and last heartbeat of each supervised service."""
+    return jsonify({"services": supervisor.get_service_status()})
+
 @app.route('/provide_input', methods=['POST'])
 def provide_input():
     """Handles submission from the user input form for a specific goal."""
@@ -177,24 +372,28 @@ def provide_input():
 
 @app.route('/archive')
 def view_archive():
-    page = request.args.get('page', 1, type=int)
+    # Keyset pagination: ?older=<cursor> / ?newer=<cursor> (see get_archive_page)
+    archived_goals, newer, older = get_archive_page(
+        older_than=request.args.get('older'), newer_than=request.args.get('newer'), per_page=ARCHIVE_PER_PAGE
+    )
     total_goals = get_archived_goal_count()
-    total_pages = math.ceil(total_goals / ARCHIVE_PER_PAGE)
-    archived_goals = get_archived_goals(page=page, per_page=ARCHIVE_PER_PAGE)
-    return render_template('archive.html', goals=archived_goals, page=page, total_pages=total_pages)
+    return render_template('archive.html', goals=archived_goals, newer=newer, older=older, total_goals=total_goals)
 
 @app.route('/logs')
 def full_log_viewer():
     log_content = "Log file not found."
     search_query = request.args.get('q', '')
+    page = request.args.get('page', 1, type=int)
+    has_more = False
     try:
-        with open('logs/agent.log', 'r', encoding='utf-8') as f:
-            log_lines = f.readlines()
-            if search_query:
-                log_lines = [line for line in log_lines if search_query.lower() in line.lower()]
-            log_content = "".join(log_lines).replace('\n', '<br>')
+        # Newest lines first, one page at a time (an empty query pages through the whole log)
+        log_lines, has_more = log_reader.search_lines(search_query, page=page, per_page=LOG_PAGE_LINES)
+        if log_lines or page > 1:
+            log_content = "<br>".join(str(escape(line)) for line in log_lines)
+        elif search_query:
+            log_content = "No matching log lines."
     except Exception: pass
-    return render_template('logs.html', log_content=log_content, search_query=search_query)
+    return render_template('logs.html', log_content=log_content, search_query=search_query, page=page, has_more=has_more)
 
 @app.route('/summaries')
 def summary_archive():
@@ -220,25 +419,60 @@ def view_single_summary(filename):
 @socketio.on('connect')
 def handle_connect():
     # Removed logger.info call to reduce noise
-    socketio.emit('status_update', get_full_status_data())
+    emit('status_update', status_publisher.snapshot())
+
+@socketio.on('request_full_status')
+def handle_full_status_request():
+    """Sent by a client that missed a delta (version gap)."""
+    emit('status_update', status_publisher.snapshot())
 
 def watch_status_queue():
     """A background thread that listens for updates and emits the correct event."""
     logger.info("Background thread started to watch for status updates.")
+    pending_lines = []
+    log_deadline = None
+    status_deadline = None
     while True:
-        message = status_update_queue.get()
+        deadlines = [d for d in (log_deadline if pending_lines else None, status_deadline) if d is not None]
+        timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        try:
+            message = status_update_queue.get(timeout=timeout)
+        except queue.Empty:
+            message = None
+
+        now = time.monotonic()
+        if message == "goal_updated":
+            # The first update opens the window; the rest of a burst rides along with it
+            if status_deadline is None:
+                status_deadline = now + STATUS_DEBOUNCE_SECONDS
+        elif message is not None:
+            if not pending_lines:
+                log_deadline = now + LOG_BATCH_WINDOW_SECONDS
+            pending_lines.append(message)
+
+        flush_lines = pending_lines and (now >= log_deadline or len(pending_lines) >= LOG_BATCH_MAX_LINES)
+        publish_status = status_deadline is not None and now >= status_deadline
+        if not (flush_lines or publish_status):
+            continue
+
         with app.app_context():
-            if message == "goal_updated":
-                socketio.emit('status_update', get_full_status_data())
-            else: 
-                socketio.emit('new_log_line', {'data': message})
+            # Flush buffered lines first so they stay ordered before the status refresh
+            if pending_lines:
+                socketio.emit('new_log_lines', {'lines': pending_lines})
+                pending_lines = []
+            if publish_status:
+                status_deadline = None
+                try:
+                    status_publisher.publish()
+                except Exception as e:
+                    logger.error(f"Failed to publish dashboard status: {e}")
 
 def get_chat_context():
     """Gathers all context for the chat agent."""
     profile = get_user_profile()
-    profile_str = json.dumps(profile, indent=2) if profile else "No profile data exists yet."
-    recent_tasks = get_archived_goals(page=1, per_page=3)
-    tasks_str = "\n".join([f"- {g['goal']} (Status: {g['status']})" for g in recent_tasks]) if recent_tasks else "No recent tasks."
+    profile_str = serialization.dumps_pretty(profile) if profile else "No profile data exists yet."
+    recent_tasks = get_archived_goal_summaries(page=1, per_page=3)
+    tasks_str = "\n".join([f"- {g.goal} (Status: {g.status})" for g in recent_tasks]) if recent_tasks else "No recent tasks."
     agent_profile = get_agent_profile(for_planner=False)
     return profile_str, tasks_str, agent_profile
 
@@ -301,7 +535,8 @@ def chat():
             tier='tier1', 
             generation_config={"temperature": 0.7}, 
             tools=chat_tools, 
-            system_instruction=system_instruction
+            system_instruction=system_instruction,
+            caller='chat'
         )
         
         if not response: return jsonify(error="API call failed"), 500
@@ -315,7 +550,7 @@ def chat():
                 api_history.append(response.candidates[0].content)
                 api_history.append(types.Content(role="function", parts=[types.Part(function_response=types.FunctionResponse(name="update_user_profile", response={"status": "success"}))]))
                 
-                response = gemini_client.ask_gemini(prompt=api_history, tier='tier1', generation_config={"temperature": 0.7}, tools=chat_tools, system_instruction=system_instruction)
+                response = gemini_client.ask_gemini(prompt=api_history, tier='tier1', generation_config={"temperature": 0.7}, tools=chat_tools, system_instruction=system_instruction, caller='chat')
                 if not response: return jsonify(error="API call failed after tool use"), 500
                 return jsonify(reply=response.text)
         
@@ -1,25 +1,58 @@
 import time
 import uuid
 import os
+import threading
 import concurrent.futures
 import json
 from datetime import datetime, timedelta
-from core.context import rate_limiter, gemini_client, memory_manager, logger, status_update_queue, orchestrator_wake_event
+from core.context import rate_limiter, request_scheduler, gemini_client, memory_manager, logger, status_update_queue, orchestrator_wake_event, shutdown_event
+from utils.call_context import call_context, get_call_context
+from utils import tracing
+from utils import metrics
+from utils import supervisor
+from utils import serialization
+from utils.cancellation import CancellationToken, Cancelled
 from core.dmn import generate_eod_summary, run_dmn_tasks
 from core.planner import orchestrate_planning
 from core.tools import TOOL_EXECUTOR, TOOL_MANIFEST
 # --- IMPORT UPDATE: Use the new TaskSpec ---
 from core.executor import run_executor, ExecutorTaskSpec
 from core.context_curator import ContextCurator
+from core.speculator import Speculator
+from core.critical_path import ToolLatency, prioritize, step_tool
 from google.genai import types
-from utils.database import get_active_goal, update_goal, archive_goal, add_goal, get_recent_failed_goals, get_goal_status_by_id, get_goal_by_id
+from utils.database import (
+    update_goal, archive_goal, add_goal, get_recent_failed_goals, get_goal_status_by_id, get_goal_by_id, compact_archive, run_db_maintenance,
+    claim_next_goal, renew_goal_lease, park_goal, release_goal_leases, recover_expired_leases, GOAL_LEASE_SECONDS, is_goal_cancelled,
+    save_react_checkpoint, load_react_checkpoint, clear_react_checkpoint
+)
 from pydantic import BaseModel, Field
 from typing import Dict, Any
 
 # --- Configuration ---
 MAX_RETRIES = 2
 IDLE_THRESHOLD_SECONDS = 300 
+ORCHESTRATOR_TICK_SECONDS = 30  # Max wait between ticks unless woken by orchestrator_wake_event
 REACT_MAX_ITERATIONS = 10 
+REACT_MAX_RATE_LIMIT_RETRIES = 6
+ARCHIVE_COMPACTION_INTERVAL_SECONDS = 6 * 3600  # Archive cold-storage pass, run from Deep Sleep
+DB_MAINTENANCE_INTERVAL_SECONDS = 30 * 60  # Checkpoint / vacuum / optimize pass, run from Deep Sleep
+DB_INTEGRITY_CHECK_INTERVAL_SECONDS = 24 * 3600
+GOAL_LEASE_RENEW_SECONDS = GOAL_LEASE_SECONDS / 3  # A worker renews its goal lease this often while running it
+GOAL_CANCEL_POLL_SECONDS = 2.0  # How often a worker checks whether the goal it runs was cancelled
+# Wall-clock budget per step; a step past it is stopped and retried (a ReAct step resumes from its checkpoint)
+STEP_TIMEOUT_SECONDS = 300
+REACT_STEP_TIMEOUT_SECONDS = 900
+# Longest a loop iteration may legally take: a heavyweight tick is curation, a ReAct step of
+# up to REACT_STEP_TIMEOUT_SECONDS, then summarizer and monitor (each may queue for a slot).
+# The LeaseKeeper heartbeats for the worker until an iteration runs longer than this.
+TICK_OVERHEAD_SECONDS = 300
+MAX_TICK_SECONDS = REACT_STEP_TIMEOUT_SECONDS + TICK_OVERHEAD_SECONDS
+# Opt-in: pre-execute/pre-refine blocked steps whose inputs are already determined.
+SPECULATIVE_EXECUTION = os.getenv("COGNITO_SPECULATIVE_EXECUTION", "0") == "1"
+
+speculator = Speculator()
+tool_latency = ToolLatency()
 
 # ... (Helper functions: should_trigger_dmn, should_trigger_summary remain unchanged) ...
 
@@ -34,6 +67,10 @@ def should_trigger_dmn(rate_limiter_instance, last_active_time: float) -> bool:
         t2_surplus = time_elapsed_pct - t2_usage_pct
         DMN_TRIGGER_THRESHOLD = 25.0 
         if t1_surplus > DMN_TRIGGER_THRESHOLD or t2_surplus > DMN_TRIGGER_THRESHOLD:
+            # The surplus is only usable if the scheduler would actually admit DMN-class calls.
+            if not (request_scheduler.has_budget('tier1', 'dmn') or request_scheduler.has_budget('tier2', 'dmn')):
+                logger.info("DMN: API surplus available but DMN budget share is exhausted.")
+                return False
             logger.info(f"DMN trigger conditions met. API Surplus available.")
             return True
         return False 
@@ -84,7 +121,7 @@ def _execute_single_action(tool_call: dict, context_map: dict, active_goal: dict
     parameters = {}
     if isinstance(parameters_input, dict): parameters = parameters_input
     elif isinstance(parameters_input, str):
-        try: parameters = json.loads(parameters_input)
+        try: parameters = serialization.loads(parameters_input)
         except json.JSONDecodeError: return "Error: Failed to decode parameters string."
     for key, value in parameters.items():
         if isinstance(value, str) and value in context_map: parameters[key] = context_map[value]
@@ -111,10 +148,11 @@ def _build_native_tools_list() -> list[types.Tool]:
     return native_tools
 
 # --- NEW HELPER: Unified Native Tool Execution ---
-def execute_native_tool(tool_name: str, tool_input: str, tier: str) -> str:
+def execute_native_tool(tool_name: str, tool_input: str, tier: str, cancel_token: CancellationToken = None) -> str:
     """
     Centralized logic for executing Google Search, Code, and Maps.
     Handles API calls, error checking, and result parsing.
+    Raises Cancelled if `cancel_token` is cancelled before the call is admitted.
     """
     observation = None
     try:
@@ -126,7 +164,8 @@ def execute_native_tool(tool_name: str, tool_input: str, tier: str) -> str:
         response_obj = gemini_client.ask_gemini(
             tool_input, 
             tier=tier,
-            enable_search=enable_s, enable_code_execution=enable_c, enable_maps=enable_m
+            enable_search=enable_s, enable_code_execution=enable_c, enable_maps=enable_m,
+            caller='tool', cancel_token=cancel_token
         )
         
         # Parse Result
@@ -150,165 +189,312 @@ def execute_native_tool(tool_name: str, tool_input: str, tier: str) -> str:
     return observation
 
 # --- NEW: The "Hot Start" ReAct Loop ---
-def _run_react_loop_with_hot_start(task_spec: ExecutorTaskSpec, context_map: dict, active_goal: dict) -> str:
+def _run_react_loop_with_hot_start(task_spec: ExecutorTaskSpec, context_map: dict, active_goal: dict,
+                                   step_id: int = None, checkpoint: dict = None,
+                                   cancel_token: CancellationToken = None) -> str:
     """
     Runs the ReAct loop with a 'Hot Start' where the first tool call
     is executed programmatically BEFORE the LLM is even invoked.
+    With a `step_id`, the conversation is checkpointed after the hot start and after every
+    iteration; passing the saved `checkpoint` resumes from the last completed iteration.
+    `cancel_token` is checked before every iteration (raises Cancelled).
     """
-    logger.info(f"REACT_LOOP: Hot Start initiated for task: {task_spec.task_description[:100]}...")
-    
     goal_id = active_goal.get('goal_id')
     conversation_history = [] 
     all_tools_list = _build_native_tools_list()
     active_tier = active_goal.get('preferred_tier', 'tier1')
     react_generation_config = {"temperature": 0.1}
-    
-    # --- STEP 1: The "Hot Start" (Programmatic Execution) ---
-    
-    # A. Add the User's Goal (from Task Spec)
-    initial_prompt = f"""
-    **TASK:** {task_spec.task_description}
-    **CONTEXT:** {json.dumps(context_map, indent=2)}
-    """
-    conversation_history.append(types.Content(role="user", parts=[types.Part(text=initial_prompt)]))
-    
-    # B. If a primary tool is defined, execute it immediately
-    if task_spec.primary_tool != "none" and task_spec.initial_inputs:
-        tool_name = task_spec.primary_tool
-        tool_input = task_spec.initial_inputs[0] # Take the first input
-        
-        logger.info(f"REACT_LOOP: Hot-executing {tool_name} with input '{tool_input}'...")
-        
-        # B1. Inject "Assistant" turn (Simulating the LLM asking for the tool)
-        conversation_history.append(types.Content(role="model", parts=[
-            types.Part(function_call=types.FunctionCall(name=tool_name, args={"prompt": tool_input}))
-        ]))
-        
-        # B2. Execute the tool directly (Using new helper)
-        observation = execute_native_tool(tool_name, tool_input, active_tier)
+    iteration = 0
+    saved_turns = 0
 
-        # B3. Inject "Tool Output" turn
-        conversation_history.append(types.Content(role="function", parts=[
-            types.Part(function_response=types.FunctionResponse(name=tool_name, response={"content": observation}))
-        ]))
-        
-        logger.info("REACT_LOOP: Hot Start complete. Handing control to LLM.")
+    def _save_progress():
+        nonlocal saved_turns
+        if not step_id or len(conversation_history) == saved_turns:
+            return
+        try:
+            new_turns = [turn.model_dump_json(exclude_none=True) for turn in conversation_history[saved_turns:]]
+            save_react_checkpoint(goal_id, step_id, task_spec.model_dump(), iteration, new_turns, saved_turns)
+            saved_turns = len(conversation_history)
+        except Exception as e:
+            logger.error(f"REACT_LOOP: Failed to checkpoint step {step_id}: {e}")
+
+    if checkpoint:
+        conversation_history = [types.Content.model_validate_json(turn) for turn in checkpoint['turns']]
+        iteration, saved_turns = checkpoint['iteration'], len(conversation_history)
+        logger.info(f"REACT_LOOP: Resuming step {step_id} at iteration {iteration} ({saved_turns} turns restored).")
+    else:
+        logger.info(f"REACT_LOOP: Hot Start initiated for task: {task_spec.task_description[:100]}...")
+
+        # --- STEP 1: The "Hot Start" (Programmatic Execution) ---
+
+        # A. Add the User's Goal (from Task Spec)
+        initial_prompt = f"""
+        **TASK:** {task_spec.task_description}
+        **CONTEXT:** {serialization.dumps_pretty(context_map)}
+        """
+        conversation_history.append(types.Content(role="user", parts=[types.Part(text=initial_prompt)]))
+
+        # B. If a primary tool is defined, execute it immediately
+        if task_spec.primary_tool != "none" and task_spec.initial_inputs:
+            tool_name = task_spec.primary_tool
+            tool_input = task_spec.initial_inputs[0] # Take the first input
+
+            logger.info(f"REACT_LOOP: Hot-executing {tool_name} with input '{tool_input}'...")
+
+            # B1. Inject "Assistant" turn (Simulating the LLM asking for the tool)
+            conversation_history.append(types.Content(role="model", parts=[
+                types.Part(function_call=types.FunctionCall(name=tool_name, args={"prompt": tool_input}))
+            ]))
+
+            # B2. Execute the tool directly (Using new helper)
+            observation = execute_native_tool(tool_name, tool_input, active_tier, cancel_token=cancel_token)
+
+            # B3. Inject "Tool Output" turn
+            conversation_history.append(types.Content(role="function", parts=[
+                types.Part(function_response=types.FunctionResponse(name=tool_name, response={"content": observation}))
+            ]))
+
+            logger.info("REACT_LOOP: Hot Start complete. Handing control to LLM.")
+        _save_progress()
 
     # --- STEP 2: The Standard ReAct Loop ---
-    iteration = 0
+    rate_limit_retries = 0
     system_instruction = "You are a ReAct agent. Analyze the tool outputs provided in the history. If satisfied, output the final answer. If not, call another tool."
 
     while iteration < REACT_MAX_ITERATIONS:
-        response = gemini_client.ask_gemini(
-            conversation_history,
-            tier=active_tier, 
-            generation_config=react_generation_config,
-            tools=all_tools_list, 
-            system_instruction=system_instruction
-        )
+        if cancel_token is not None:
+            cancel_token.check()
+        with tracing.span('react.iteration', **{'react.iteration': iteration}):
+            response = gemini_client.ask_gemini(
+                conversation_history,
+                tier=active_tier, 
+                generation_config=react_generation_config,
+                tools=all_tools_list, 
+                system_instruction=system_instruction,
+                caller='react',
+                cancel_token=cancel_token
+            )
         
-        if response == "RATE_LIMIT_HIT" or response is None: time.sleep(30); continue
-        
-        try:
-            if not response.candidates:
-                iteration += 1
+            if response == "RATE_LIMIT_HIT" or response is None:
+                # Back off (longer while the tier's circuit is open) instead of hammering the API.
+                if rate_limit_retries >= REACT_MAX_RATE_LIMIT_RETRIES:
+                    logger.warning("REACT_LOOP: Giving up after repeated rate limits. Step will be retried later.")
+                    return "RATE_LIMIT_HIT"
+                retry_delay = gemini_client.get_retry_delay(active_tier, rate_limit_retries)
+                if cancel_token is not None:
+                    cancel_token.sleep(retry_delay)  # The check at the top of the loop raises if cancelled meanwhile
+                else:
+                    time.sleep(retry_delay)
+                rate_limit_retries += 1
                 continue
+            rate_limit_retries = 0
+        
+            try:
+                if not response.candidates:
+                    iteration += 1
+                    continue
 
-            response_part = response.candidates[0].content.parts[0]
+                response_part = response.candidates[0].content.parts[0]
 
-            if response_part.function_call:
-                fc = response_part.function_call
-                tool_name = fc.name
-                tool_params = dict(fc.args)
+                if response_part.function_call:
+                    fc = response_part.function_call
+                    tool_name = fc.name
+                    tool_params = dict(fc.args)
                 
-                logger.info(f"REACT_LOOP: Calling tool '{tool_name}'")
-                conversation_history.append(response.candidates[0].content)
+                    logger.info(f"REACT_LOOP: Calling tool '{tool_name}'")
+                    conversation_history.append(response.candidates[0].content)
                 
-                # Logic for inner loop execution
-                # We can use the helper again if it's a native tool
-                if tool_name in ["google_search", "get_maps_data", "execute_python_code"]:
-                     q = tool_params.get("prompt") or tool_params.get("query")
-                     obs = execute_native_tool(tool_name, q, active_tier)
-                else:
-                     # Fallback to standard execute step for non-native tools
-                     _, obs = _execute_step({"tool_call": {"tool_name": tool_name, "parameters": tool_params}, "step_id": 0}, active_goal, context_map)
+                    # Logic for inner loop execution
+                    # We can use the helper again if it's a native tool
+                    if tool_name in ["google_search", "get_maps_data", "execute_python_code"]:
+                         q = tool_params.get("prompt") or tool_params.get("query")
+                         obs = execute_native_tool(tool_name, q, active_tier, cancel_token=cancel_token)
+                    else:
+                         # Fallback to standard execute step for non-native tools
+                         _, obs = _execute_step({"tool_call": {"tool_name": tool_name, "parameters": tool_params}, "step_id": 0}, active_goal, context_map, cancel_token)
+                         if obs == "CANCELLED":
+                             if cancel_token is not None:
+                                 cancel_token.check()
+                             obs = "Error: The tool call exceeded its time limit."
                 
-                conversation_history.append(types.Content(role="function", parts=[
-                    types.Part(function_response=types.FunctionResponse(name=tool_name, response={"content": obs}))
-                ]))
+                    conversation_history.append(types.Content(role="function", parts=[
+                        types.Part(function_response=types.FunctionResponse(name=tool_name, response={"content": obs}))
+                    ]))
 
-            elif response_part.text:
-                return response_part.text
+                elif response_part.text:
+                    return response_part.text
             
-            iteration += 1
-        except Exception as e:
-            logger.error(f"REACT_LOOP: Error: {e}")
-            iteration += 1 
+                iteration += 1
+                _save_progress()
+            except Exception as e:
+                logger.error(f"REACT_LOOP: Error: {e}")
+                iteration += 1 
 
     return "Max iterations reached."
 
-def _execute_step(step: dict, goal: dict, context_map: dict) -> tuple[int, str | None]:
-    """Executes a single step."""
-    step_id = step.get('step_id')
-    active_tier = goal.get('preferred_tier', 'tier1')
-    
+def _execute_step(step: dict, goal: dict, context_map: dict, cancel_token: CancellationToken = None,
+                  sub_priority: float = None) -> tuple[int, str | None]:
+    """
+    Executes a single step and feeds the duration of a successful run into the per-tool latency
+    estimates. Time its calls spent queued in the RequestScheduler is left out of the sample.
+    """
+    queue_wait = [0.0]  # Added to by RequestScheduler.acquire for every call made under this step
+    started = time.monotonic()
     try:
-        if step.get("tool_call"):
-            tool_call = step["tool_call"]
-            tool_name = tool_call.get("tool_name")
-            parameters = tool_call.get("parameters", {})
-
-            # --- FIXED BLOCK: Use Hot Start with correct object access ---
-            if tool_name == "reactive_solve":
-                simple_sub_goal = parameters.get("sub_goal", "")
-                logger.info(f"EXECUTOR (Step {step_id}): Generating TaskSpec for: '{simple_sub_goal}'")
-                
-                # Call Executor -> returns ExecutorTaskSpec object
-                task_spec = run_executor(
-                    user_goal=goal['goal'], full_plan=goal.get('plan', []), 
-                    strategy_blueprint=goal.get('strategy_blueprint', {}),
-                    context_map=context_map, current_step_prompt=simple_sub_goal,
-                    gemini_client=gemini_client, task_type="refine_subgoal"
-                )
+        with call_context(queue_wait=queue_wait):
+            step_id, result = _run_step(step, goal, context_map, cancel_token, sub_priority)
+    finally:
+        enclosing = get_call_context().get('queue_wait')
+        if enclosing is not None: enclosing[0] += queue_wait[0]  # An inner ReAct tool call's wait is its step's too
+    if isinstance(result, str) and result not in ("AWAITING_USER_INPUT_SIGNAL", "RATE_LIMIT_HIT", "CANCELLED") and not result.startswith("Error"):
+        tool_latency.record(step_tool(step), max(time.monotonic() - started - queue_wait[0], 0.0))
+    return step_id, result
+
+def _run_step(step: dict, goal: dict, context_map: dict, cancel_token: CancellationToken, sub_priority: float = None) -> tuple[int, str | None]:
+    """
+    Runs a single step. The step runs under a child of `cancel_token` that also expires
+    after the step's timeout; if either stops it, the result is "CANCELLED".
+    """
+    tool_name = (step.get('tool_call') or {}).get('tool_name')
+    timeout = REACT_STEP_TIMEOUT_SECONDS if tool_name == "reactive_solve" else STEP_TIMEOUT_SECONDS
+    step_token = cancel_token.child(timeout) if cancel_token is not None else CancellationToken(time.time() + timeout)
+    # Tags every LLM call made for this step (token accounting, tracing). Inner ReAct
+    # tool calls use step_id 0 and keep the enclosing step's tag. The token reaches
+    # nested calls (Executor, tools) through the call context too.
+    tags = {'goal_id': goal.get('goal_id'), 'cancel_token': step_token}
+    if step.get('step_id'): tags['step_id'] = step.get('step_id')
+    # Queued calls of steps on a longer critical path are admitted first (lower sorts first)
+    if sub_priority is not None: tags['sub_priority'] = sub_priority
+    with call_context(**tags), tracing.span('execute_step', **{'step.tool': tool_name or 'prompt'}), metrics.STEP_SECONDS.time(tool=tool_name or 'prompt'):
+        step_id = step.get('step_id')
+        active_tier = goal.get('preferred_tier', 'tier1')
+    
+        try:
+            step_token.check()
+            # --- SPECULATION: Commit a pre-computed result if one exists ---
+            speculated = speculator.claim(goal.get('goal_id'), step, step_token) if SPECULATIVE_EXECUTION and step_id else None
+            if speculated and speculated.kind == 'executed':
+                return step_id, speculated.value
+
+            if step.get("tool_call"):
+                tool_call = step["tool_call"]
+                tool_name = tool_call.get("tool_name")
+                parameters = tool_call.get("parameters", {})
+
+                # --- FIXED BLOCK: Use Hot Start with correct object access ---
+                if tool_name == "reactive_solve":
+                    simple_sub_goal = parameters.get("sub_goal", "")
+                    # A step interrupted mid-loop (restart, rate limit) continues from its checkpoint
+                    checkpoint = load_react_checkpoint(goal.get('goal_id'), step_id) if step_id else None
+
+                    if checkpoint:
+                        task_spec = checkpoint['task_spec']
+                    elif speculated:
+                        task_spec = speculated.value
+                    else:
+                        logger.info(f"EXECUTOR (Step {step_id}): Generating TaskSpec for: '{simple_sub_goal}'")
+                    
+                        # Call Executor -> returns ExecutorTaskSpec object
+                        task_spec = run_executor(
+                            user_goal=goal['goal'], full_plan=goal.get('plan', []), 
+                            strategy_blueprint=goal.get('strategy_blueprint', {}),
+                            context_map=context_map, current_step_prompt=simple_sub_goal,
+                            gemini_client=gemini_client, task_type="refine_subgoal"
+                        )
                 
-                if isinstance(task_spec, dict):
-                     try:
-                        task_spec = ExecutorTaskSpec(**task_spec)
-                     except Exception as e:
-                        logger.error(f"Failed to cast TaskSpec: {e}")
-                        task_spec = ExecutorTaskSpec(primary_tool="none", initial_inputs=[], task_description=simple_sub_goal)
-
-                result = _run_react_loop_with_hot_start(task_spec, context_map, goal)
-                return step_id, result
-
-            # --- REFACTORED: Use Unified Helper ---
-            elif tool_name in ["google_search", "get_maps_data", "execute_python_code"]:
-                refined_prompt = run_executor(goal['goal'], [], {}, context_map, parameters.get("prompt") or parameters.get("query"), gemini_client, "refine_query")
+                    if isinstance(task_spec, dict):
+                         try:
+                            task_spec = ExecutorTaskSpec(**task_spec)
+                         except Exception as e:
+                            logger.error(f"Failed to cast TaskSpec: {e}")
+                            task_spec = ExecutorTaskSpec(primary_tool="none", initial_inputs=[], task_description=simple_sub_goal)
+
+                    result = _run_react_loop_with_hot_start(task_spec, context_map, goal, step_id=step_id, checkpoint=checkpoint,
+                                                            cancel_token=step_token)
+                    return step_id, result
+
+                # --- REFACTORED: Use Unified Helper ---
+                elif tool_name in ["google_search", "get_maps_data", "execute_python_code"]:
+                    if speculated:
+                        refined_prompt = speculated.value
+                    else:
+                        refined_prompt = run_executor(goal['goal'], [], {}, context_map, parameters.get("prompt") or parameters.get("query"), gemini_client, "refine_query")
                 
-                # Call unified helper
-                resp = execute_native_tool(tool_name, refined_prompt, active_tier)
+                    # Call unified helper
+                    resp = execute_native_tool(tool_name, refined_prompt, active_tier, cancel_token=step_token)
                 
-                if resp == "RATE_LIMIT_HIT": return step_id, "RATE_LIMIT_HIT"
-                return step_id, resp
+                    if resp == "RATE_LIMIT_HIT": return step_id, "RATE_LIMIT_HIT"
+                    return step_id, resp
                 
-            else:
-                return step_id, _execute_single_action(tool_call, context_map, goal)
+                else:
+                    return step_id, _execute_single_action(tool_call, context_map, goal)
 
-        elif step.get("prompt"):
-            refined_prompt = run_executor(goal['goal'], [], {}, context_map, step.get("prompt"), gemini_client, "refine_prompt")
-            resp = gemini_client.ask_gemini(refined_prompt, tier=active_tier)
+            elif step.get("prompt"):
+                refined_prompt = run_executor(goal['goal'], [], {}, context_map, step.get("prompt"), gemini_client, "refine_prompt")
+                resp = gemini_client.ask_gemini(refined_prompt, tier=active_tier, caller='step', cancel_token=step_token)
             
-            if resp == "RATE_LIMIT_HIT": return step_id, "RATE_LIMIT_HIT"
-            if isinstance(resp, str): return step_id, resp
+                if resp == "RATE_LIMIT_HIT": return step_id, "RATE_LIMIT_HIT"
+                if isinstance(resp, str): return step_id, resp
             
-            if resp and hasattr(resp, 'text') and resp.text: return step_id, resp.text
-            return step_id, None
+                if resp and hasattr(resp, 'text') and resp.text: return step_id, resp.text
+                return step_id, None
+
+        except Cancelled as e:
+            if step_id:
+                logger.warning(f"Step {step_id} stopped ({e.reason}).")
+                metrics.STEP_CANCELLATIONS.inc(reason=e.reason)
+            return step_id, "CANCELLED"
+        except Exception as e:
+            logger.error(f"Error executing step {step_id}: {e}", exc_info=True)
+            return step_id, f"Error: {e}"
 
-    except Exception as e:
-        logger.error(f"Error executing step {step_id}: {e}", exc_info=True)
-        return step_id, f"Error: {e}"
+# --- NEW: Speculative Execution ---
+def _run_speculative_job(step: dict, goal: dict, kind: str, cancel_token: CancellationToken):
+    """
+    Background work for a blocked step. Returns the committed value (final output for
+    'executed', Executor refinement for 'refined'), or None to discard.
+    Runs without curated context: only steps with no placeholders are speculated.
+    Stops (returns None) once the Speculator cancels `cancel_token`, or at its deadline.
+    """
+    with call_context(goal_id=goal.get('goal_id'), step_id=step.get('step_id'), speculative=True, cancel_token=cancel_token):
+        tool_call = step.get('tool_call') or {}
+        tool_name = tool_call.get('tool_name')
+        parameters = tool_call.get('parameters', {})
+        if isinstance(parameters, str):
+            try: parameters = serialization.loads(parameters)
+            except json.JSONDecodeError: return None
+
+        try:
+            if tool_name == "reactive_solve":
+                return run_executor(
+                    user_goal=goal['goal'], full_plan=goal.get('plan', []),
+                    strategy_blueprint=goal.get('strategy_blueprint', {}),
+                    context_map={}, current_step_prompt=parameters.get("sub_goal", ""),
+                    gemini_client=gemini_client, task_type="refine_subgoal"
+                )
+
+            query = parameters.get("prompt") or parameters.get("query")
+            refined_prompt = run_executor(goal['goal'], [], {}, {}, query, gemini_client, "refine_query")
+            if kind == 'refined':
+                return refined_prompt
+
+            resp = execute_native_tool(tool_name, refined_prompt, goal.get('preferred_tier', 'tier1'), cancel_token=cancel_token)
+        except Cancelled as e:
+            logger.info(f"SPECULATOR: Speculative work for Step {step.get('step_id')} stopped ({e.reason}).")
+            return None
+        if not resp or resp == "RATE_LIMIT_HIT" or str(resp).startswith("Error"):
+            return None
+        return resp
+
+def _dispatch_speculation(active_goal: dict, executable_steps: list):
+    """Hands pending steps that are still blocked on dependencies to the Speculator."""
+    executable_ids = {s['step_id'] for s in executable_steps}
+    blocked_steps = [s for s in active_goal['plan'] if s['status'] == 'pending' and s['step_id'] not in executable_ids]
+    if blocked_steps:
+        speculator.speculate(active_goal, blocked_steps, _run_speculative_job)
 
 # --- NEW FEATURE: Real Plan Monitoring ---
+@tracing.traced('monitor.check')
 def _run_plan_monitor(user_goal: str, remaining_plan: list, last_step_output: str) -> str:
     """
     Intelligently checks if the last step's output actually moved the needle.
@@ -332,7 +518,7 @@ def _run_plan_monitor(user_goal: str, remaining_plan: list, last_step_output: st
     Reply ONLY with "CONTINUE" or "REPLAN".
     """
     
-    response = gemini_client.ask_gemini(monitor_prompt, tier='tier2', generation_config={"temperature": 0.0})
+    response = gemini_client.ask_gemini(monitor_prompt, tier='tier2', generation_config={"temperature": 0.0}, caller='monitor')
     
     if response and hasattr(response, 'text'):
         decision = response.text.strip().upper()
@@ -343,6 +529,7 @@ def _run_plan_monitor(user_goal: str, remaining_plan: list, last_step_output: st
     return "CONTINUE"
 
 # --- NEW: Context Summary Generator ---
+@tracing.traced('summarizer.summarize')
 def _generate_step_summary(step_output: str) -> str:
     """Generates a concise 1-sentence summary of the step output for the Context Curator."""
     try:
@@ -350,7 +537,7 @@ def _generate_step_summary(step_output: str) -> str:
         if len(step_output) < 200: return step_output # Short enough already
 
         prompt = f"Summarize this output in one concise sentence: {step_output[:5000]}"
-        response = gemini_client.ask_gemini(prompt, tier='tier2')
+        response = gemini_client.ask_gemini(prompt, tier='tier2', caller='summarizer')
 
         if response and hasattr(response, 'text'):
             return response.text.strip()
@@ -359,166 +546,372 @@ def _generate_step_summary(step_output: str) -> str:
         logger.error(f"Error generating summary: {e}")
         return "Summary unavailable."
 
-def main():
-    """The main orchestrator loop."""
-    logger.info("--- ⚙️ Orchestrator v12.0 Initializing (Refactored & Monitored) ---")
+# --- NEW: Step Execution State ---
+# A dispatched step is persisted as 'running' (with its start time and worker) before any
+# work starts. Only the worker holding the goal's lease runs its steps and every tick ends
+# with its steps settled, so a 'running' step in a freshly claimed goal was interrupted
+# (crash, kill, restart): it is dispatched again, and a ReAct step resumes from its checkpoint.
+def _mark_steps_running(active_goal: dict, steps: list, worker_id: str):
+    now = time.time()
+    for step in steps:
+        if step['status'] == 'running':
+            logger.warning(f"Orchestrator: Step {step['step_id']} of goal '{active_goal['goal_id']}' was interrupted "
+                           f"(started {now - step.get('started_at', now):.0f}s ago on {step.get('worker_id')}). Resuming.")
+        step['status'] = 'running'
+        step['started_at'] = now
+        step['worker_id'] = worker_id
+    update_goal(active_goal)
+    status_update_queue.put("goal_updated")
+
+def _record_step_timeout(active_goal: dict, step: dict):
+    """A step stopped by its deadline is retried like a failed attempt; the goal pauses after MAX_RETRIES."""
+    retries = step.get('retries', 0)
+    if retries < MAX_RETRIES:
+        step['retries'] = retries + 1
+        logger.warning(f"Step {step['step_id']} exceeded its time limit. Retrying...")
+    else:
+        logger.error(f"Step {step['step_id']} exceeded its time limit {retries + 1} times. Pausing goal '{active_goal['goal_id']}'.")
+        active_goal['status'] = 'paused'
+
+def _settle_running_steps(steps: list):
+    """Puts dispatched steps that did not complete (rate limited, retried, cut short) back to pending."""
+    for step in steps:
+        if step['status'] == 'running':
+            step['status'] = 'pending'
+            step.pop('started_at', None)
+            step.pop('worker_id', None)
+
+class LeaseKeeper:
+    """
+    Renews a worker's goal lease from a background thread, so a long tick (a ReAct loop,
+    a large swarm) does not let the lease expire and hand the goal to another worker.
+    It also watches the goal: once it is cancelled (e.g. from the dashboard, possibly in
+    another process) or the lease is lost, the tick's CancellationToken is cancelled, so
+    in-flight steps stop within GOAL_CANCEL_POLL_SECONDS instead of running to the end.
+    Every poll it also heartbeats for the worker's service, as long as the current loop
+    iteration is younger than MAX_TICK_SECONDS: a long but legal tick keeps the worker
+    alive, and one that overruns stops the beats so the supervisor restarts it.
+    """
+
+    def __init__(self, owner: str, interval: float = GOAL_LEASE_RENEW_SECONDS, poll_interval: float = GOAL_CANCEL_POLL_SECONDS):
+        self.owner = owner
+        self.interval = interval
+        self.poll_interval = poll_interval
+        self._goal_id = None
+        self._token = None
+        self._renewed_at = 0.0
+        self._tick_started = time.time()
+        self._beat = supervisor.heartbeat_handle()  # Bound to the calling (worker) service
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def hold(self, goal_id: str | None, token: CancellationToken = None):
+        """Sets the goal whose lease is kept alive (None while the worker is idle) and the token cancelled with it."""
+        with self._lock:
+            self._goal_id = goal_id
+            self._token = token
+            self._renewed_at = time.time()  # claim_next_goal has just leased it
+            self._tick_started = time.time()  # Called once per loop iteration
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"LeaseKeeper-{self.owner}", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                goal_id, token = self._goal_id, self._token
+                renew_due = time.time() - self._renewed_at >= self.interval
+                if renew_due:
+                    self._renewed_at = time.time()
+                progressing = time.time() - self._tick_started <= MAX_TICK_SECONDS
+            if self._beat is not None and progressing:
+                self._beat()
+            if not goal_id:
+                continue
+            try:
+                if token is not None and not token.cancelled and is_goal_cancelled(goal_id):
+                    token.cancel('goal_cancelled')
+                if renew_due and not renew_goal_lease(goal_id, self.owner):
+                    logger.warning(f"Orchestrator [{self.owner}]: Lost the lease on goal '{goal_id}'.")
+                    if token is not None:
+                        token.cancel('lease_lost')
+            except Exception as e:
+                logger.error(f"Orchestrator [{self.owner}]: Lease check failed: {e}")
+
+def main(worker_id: str = None, housekeeping: bool = True):
+    """
+    The main orchestrator loop. Several can run at once (threads or processes, see run_agent.py),
+    each pulling goals from the shared queue under its own `worker_id`; only the one with
+    `housekeeping` set runs the idle-time jobs (EOD summary, DMN, archive compaction, DB maintenance).
+    """
+    worker_id = worker_id or f"orchestrator-{os.getpid()}"
+    logger.info(f"--- ⚙️ Orchestrator v12.0 Initializing (Refactored & Monitored) [{worker_id}] ---")
+    lease_keeper = LeaseKeeper(worker_id)
+    for goal_id, owner in recover_expired_leases() or []:
+        logger.warning(f"Orchestrator: Recovered expired lease on goal '{goal_id}' (held by {owner}).")
     last_active_time = time.time()
+    last_archive_compaction = 0.0
+    last_db_maintenance = 0.0
+    last_integrity_check = 0.0
     
-    while True:
-        orchestrator_wake_event.wait(timeout=30)
+    while not shutdown_event.is_set():
+        supervisor.heartbeat()
+        orchestrator_wake_event.wait(timeout=ORCHESTRATOR_TICK_SECONDS)
+        if shutdown_event.is_set():
+            break
         if orchestrator_wake_event.is_set():
             logger.info(">>> WAKE SIGNAL RECEIVED! Resuming immediately.")
             orchestrator_wake_event.clear()
 
-        active_goal = get_active_goal()
+        with tracing.span('orchestrator.tick'):
+            active_goal = claim_next_goal(worker_id)
+            goal_token = CancellationToken()  # Cancelled by the LeaseKeeper if the goal is cancelled or its lease lost
+            lease_keeper.hold(active_goal['goal_id'] if active_goal else None, goal_token)
         
-        if active_goal:
-            last_active_time = time.time()
-            current_db_status = get_goal_status_by_id(active_goal['goal_id'])
+            if active_goal:
+                last_active_time = time.time()
+                tracing.set_attributes(goal_id=active_goal['goal_id'])
+                current_db_status = get_goal_status_by_id(active_goal['goal_id'])
             
-            if current_db_status == 'cancelled':
-                logger.warning(f"Orchestrator: Goal '{active_goal['goal_id']}' was cancelled externally. Dropping.")
-                active_goal = None 
-                continue 
+                if current_db_status == 'cancelled':
+                    logger.warning(f"Orchestrator: Goal '{active_goal['goal_id']}' was cancelled externally. Dropping.")
+                    speculator.discard_goal(active_goal['goal_id'])
+                    active_goal = None 
+                    continue 
             
-            if current_db_status and current_db_status != active_goal['status']:
-                 active_goal['status'] = current_db_status
-
-            if active_goal.get('status') == 'awaiting_replan':
-                logger.info(f"RE-PLANNER: Goal '{active_goal['goal_id']}' requires re-planning.")
-                context_parts = []
-                for step in active_goal.get('plan', []):
-                    if step.get('status') == 'complete' and step.get('output'):
-                        context_parts.append(f"Data from previous attempt (Step {step['step_id']}):\n{step['output']}\n---")
-                existing_context_str = "\n".join(context_parts)
-                archive_goal(active_goal['goal_id'])
+                if current_db_status and current_db_status != active_goal['status']:
+                     active_goal['status'] = current_db_status
+
+                if active_goal.get('status') == 'awaiting_replan':
+                    logger.info(f"RE-PLANNER: Goal '{active_goal['goal_id']}' requires re-planning.")
+                    context_parts = []
+                    for step in active_goal.get('plan', []):
+                        if step.get('status') == 'complete' and step.get('output'):
+                            context_parts.append(f"Data from previous attempt (Step {step['step_id']}):\n{step['output']}\n---")
+                    existing_context_str = "\n".join(context_parts)
+                    speculator.discard_goal(active_goal['goal_id'])
+                    archive_goal(active_goal['goal_id'])
                 
-                new_goal_obj = orchestrate_planning(
-                    user_goal=active_goal['goal'],
-                    preferred_tier=active_goal.get('preferred_tier', 'tier1'),
-                    existing_context_str=existing_context_str
-                )
+                    new_goal_obj = orchestrate_planning(
+                        user_goal=active_goal['goal'],
+                        preferred_tier=active_goal.get('preferred_tier', 'tier1'),
+                        existing_context_str=existing_context_str
+                    )
                 
-                if new_goal_obj:
-                    new_goal_obj['replan_count'] = active_goal.get('replan_count', 0) + 1
-                    timestamp_str = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-                    new_goal_obj['goal_id'] = f"replan_{new_goal_obj['replan_count']}_{timestamp_str}"
+                    if new_goal_obj:
+                        new_goal_obj['replan_count'] = active_goal.get('replan_count', 0) + 1
+                        timestamp_str = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+                        new_goal_obj['goal_id'] = f"replan_{new_goal_obj['replan_count']}_{timestamp_str}"
                     
-                    add_goal(new_goal_obj)
-                    logger.info(f"RE-PLANNER: Created fresh plan: {new_goal_obj['goal_id']}")
-                    status_update_queue.put("goal_updated")
+                        add_goal(new_goal_obj)
+                        logger.info(f"RE-PLANNER: Created fresh plan: {new_goal_obj['goal_id']}")
+                        status_update_queue.put("goal_updated")
                 
-                continue
-
-            if active_goal.get('status') == 'pending' and active_goal.get('plan'):
-                active_goal['status'] = 'in-progress'
+                    continue
+
+                # --- CIRCUIT BREAKER: Park the goal instead of spinning during an upstream brown-out ---
+                # Every step needs tier2 (Executor/Curator); the goal's own tier matters unless it can fall back.
+                park_seconds = gemini_client.circuit_retry_after('tier2')
+                if not gemini_client.tier_policy.fallback_tier(active_goal.get('preferred_tier', 'tier1'), gemini_client.tier_policy.resolve('goal')):
+                    park_seconds = max(park_seconds, gemini_client.circuit_retry_after(active_goal.get('preferred_tier', 'tier1')))
+                if park_seconds > 0:
+                    logger.warning(f"Orchestrator: Circuit open. Parking goal '{active_goal['goal_id']}' (retry in {park_seconds:.0f}s).")
+                    lease_keeper.hold(None)
+                    park_goal(active_goal['goal_id'], worker_id, time.time() + park_seconds)
+                    continue
+
+                if active_goal.get('status') == 'pending' and active_goal.get('plan'):
+                    active_goal['status'] = 'in-progress'
             
-            completed_step_ids = {s['step_id'] for s in active_goal['plan'] if s['status'] == 'complete'}
-            executable_steps = [s for s in active_goal['plan'] if s['status'] == 'pending' and set(s.get('dependencies', [])).issubset(completed_step_ids)]
+                completed_step_ids = {s['step_id'] for s in active_goal['plan'] if s['status'] == 'complete'}
+                executable_steps = [s for s in active_goal['plan'] if s['status'] in ('pending', 'running') and set(s.get('dependencies', [])).issubset(completed_step_ids)]
+                # Most critical first: steps gating the longest chain of pending work get dispatched, curated and admitted first
+                executable_steps, critical_seconds = prioritize(active_goal['plan'], executable_steps, tool_latency.estimate)
             
-            if not executable_steps:
-               pass
-            else:
-                # Identify Heavyweight Step
-                heavyweight_step = next(
-                    (step for step in executable_steps 
-                     if step and (step.get("tool_call") or {}).get("tool_name") == "reactive_solve"), 
-                    None
-                )
-                
-                if heavyweight_step:
-                    logger.info(f"Prioritizing heavyweight task: Step {heavyweight_step.get('step_id')}.")
-
-                    # --- CONTEXT CURATION (HYDRAULIC SYSTEM) ---
-                    completed_steps_list = [s for s in active_goal['plan'] if s['status'] == 'complete']
-                    # We use the raw prompt or tool call as the "Task" description for the curator
-                    current_task_desc = heavyweight_step.get('prompt') or str(heavyweight_step.get('tool_call'))
-
-                    context_map = ContextCurator.get_relevant_context(current_task_desc, completed_steps_list)
-                    # -------------------------------------------
-
-                    step_id, response = _execute_step(heavyweight_step, active_goal, context_map)
-                    
-                    if response:
-                        heavyweight_step['output'] = response
-                        heavyweight_step['summary'] = _generate_step_summary(response)
-                        heavyweight_step['status'] = 'complete'
-                        
-                        # --- MONITOR CHECK FOR HEAVYWEIGHT ---
-                        remaining = [s for s in active_goal['plan'] if s['status'] == 'pending' and s['step_id'] > step_id]
-                        if _run_plan_monitor(active_goal['goal'], remaining, response) == "REPLAN":
-                             active_goal['status'] = 'awaiting_replan'
-                             update_goal(active_goal)
-                             status_update_queue.put("goal_updated")
-                             continue 
-
+                if SPECULATIVE_EXECUTION:
+                    _dispatch_speculation(active_goal, executable_steps)
+
+                if not executable_steps:
+                    # --- Goal Completion: every step is done, so archive the goal (which also drops it from the goal queue) ---
+                    if active_goal['plan'] and all(s['status'] == 'complete' for s in active_goal['plan']):
+                        logger.info(f"Orchestrator: All steps of goal '{active_goal['goal_id']}' complete. Archiving.")
+                        active_goal['status'] = 'complete'
+                        speculator.discard_goal(active_goal['goal_id'])
                         update_goal(active_goal)
+                        archive_goal(active_goal['goal_id'])
                         status_update_queue.put("goal_updated")
+                        # This worker (and any idle one) picks up the next goal without waiting for the tick timeout.
+                        orchestrator_wake_event.set()
                 else:
-                    # --- Swarm Execution ---
-                    logger.info(f"Found a swarm of {len(executable_steps)} executable steps. Dispatching...")
-
-                    # Pre-calculate completed steps once
-                    completed_steps_list = [s for s in active_goal['plan'] if s['status'] == 'complete']
-
-                    with concurrent.futures.ThreadPoolExecutor(max_workers=len(executable_steps)) as executor:
-                        # For swarm, we must curate context INDIVIDUALLY for each parallel step
-                        future_to_step = {}
-
-                        for step in executable_steps:
-                            current_task_desc = step.get('prompt') or str(step.get('tool_call'))
-                            # Note: This adds N calls to Curator. Acceptable for quality.
-                            # Optimization: Could cache if multiple steps are identical? Unlikely.
-                            step_context = ContextCurator.get_relevant_context(current_task_desc, completed_steps_list)
+                    # Identify Heavyweight Step: a reactive_solve runs alone, but only once it is the
+                    # top-ranked step. The steps ranked above it are dispatched first as a swarm.
+                    heavyweight_ranks = [i for i, step in enumerate(executable_steps)
+                                         if (step.get("tool_call") or {}).get("tool_name") == "reactive_solve"]
+                    heavyweight_step = executable_steps[0] if heavyweight_ranks and heavyweight_ranks[0] == 0 else None
+                    if heavyweight_ranks and not heavyweight_step:
+                        executable_steps = executable_steps[:heavyweight_ranks[0]]
+
+                    if heavyweight_step:
+                        logger.info(f"Prioritizing heavyweight task: Step {heavyweight_step.get('step_id')}.")
+                        dispatched_steps = [heavyweight_step]
+                        _mark_steps_running(active_goal, dispatched_steps, worker_id)
+
+                        # --- CONTEXT CURATION (HYDRAULIC SYSTEM) ---
+                        completed_steps_list = [s for s in active_goal['plan'] if s['status'] == 'complete']
+                        # We use the raw prompt or tool call as the "Task" description for the curator
+                        current_task_desc = heavyweight_step.get('prompt') or str(heavyweight_step.get('tool_call'))
+
+                        with call_context(goal_id=active_goal['goal_id'], step_id=heavyweight_step.get('step_id'),
+                                          sub_priority=-critical_seconds[heavyweight_step['step_id']]):
+                            context_map = ContextCurator.get_relevant_context(current_task_desc, completed_steps_list)
+                        # -------------------------------------------
+
+                        step_id, response = _execute_step(heavyweight_step, active_goal, context_map, goal_token,
+                                                          -critical_seconds[heavyweight_step['step_id']])
+                    
+                        if response == "RATE_LIMIT_HIT":
+                            logger.warning(f"Step {step_id} hit rate limit.")
+                        elif response == "CANCELLED":
+                            if not goal_token.cancelled:
+                                _record_step_timeout(active_goal, heavyweight_step)
+                        elif response:
+                            heavyweight_step['output'] = response
+                            with call_context(goal_id=active_goal['goal_id'], step_id=step_id):
+                                heavyweight_step['summary'] = _generate_step_summary(response)
+                            heavyweight_step['status'] = 'complete'
+                        
+                            # --- MONITOR CHECK FOR HEAVYWEIGHT ---
+                            remaining = [s for s in active_goal['plan'] if s['status'] in ('pending', 'running') and s['step_id'] > step_id]
+                            with call_context(goal_id=active_goal['goal_id'], step_id=step_id):
+                                decision = _run_plan_monitor(active_goal['goal'], remaining, response)
+                            if decision == "REPLAN":
+                                 active_goal['status'] = 'awaiting_replan'
+                                 update_goal(active_goal)
+                                 status_update_queue.put("goal_updated")
+                                 continue 
+
+                            update_goal(active_goal)
+                            clear_react_checkpoint(active_goal['goal_id'], step_id)
+                            status_update_queue.put("goal_updated")
+                    else:
+                        # --- Swarm Execution ---
+                        logger.info(f"Found a swarm of {len(executable_steps)} executable steps. Dispatching, critical path first "
+                                    f"(step {executable_steps[0]['step_id']}, {critical_seconds[executable_steps[0]['step_id']]:.0f}s)...")
+                        dispatched_steps = executable_steps
+                        _mark_steps_running(active_goal, dispatched_steps, worker_id)
+
+                        # Pre-calculate completed steps once
+                        completed_steps_list = [s for s in active_goal['plan'] if s['status'] == 'complete']
+
+                        with concurrent.futures.ThreadPoolExecutor(max_workers=len(executable_steps)) as executor:
+                            # For swarm, we must curate context INDIVIDUALLY for each parallel step
+                            future_to_step = {}
+
+                            for step in executable_steps:
+                                current_task_desc = step.get('prompt') or str(step.get('tool_call'))
+                                # Note: This adds N calls to Curator. Acceptable for quality.
+                                # Optimization: Could cache if multiple steps are identical? Unlikely.
+                                if SPECULATIVE_EXECUTION and speculator.has_result(active_goal['goal_id'], step, kind='executed'):
+                                    step_context = {}  # Output already computed; no context needed.
+                                else:
+                                    with call_context(goal_id=active_goal['goal_id'], step_id=step.get('step_id'),
+                                                      sub_priority=-critical_seconds[step['step_id']]):
+                                        step_context = ContextCurator.get_relevant_context(current_task_desc, completed_steps_list)
 
-                            future = executor.submit(_execute_step, step, active_goal, step_context)
-                            future_to_step[future] = step
+                                future = executor.submit(tracing.propagate(_execute_step), step, active_goal, step_context, goal_token,
+                                                         -critical_seconds[step['step_id']])
+                                future_to_step[future] = step
                         
-                        for future in concurrent.futures.as_completed(future_to_step):
-                            step = future_to_step[future]
-                            step_id, response = future.result()
+                            for future in concurrent.futures.as_completed(future_to_step):
+                                step = future_to_step[future]
+                                step_id, response = future.result()
                             
-                            if response and response not in ["AWAITING_USER_INPUT_SIGNAL", "RATE_LIMIT_HIT"]:
-                                step['output'] = response
-                                step['summary'] = _generate_step_summary(response)
-                                step['status'] = 'complete'
-                                logger.info(f"Step {step_id} completed successfully in swarm.")
+                                if response and response not in ["AWAITING_USER_INPUT_SIGNAL", "RATE_LIMIT_HIT", "CANCELLED"]:
+                                    step['output'] = response
+                                    with call_context(goal_id=active_goal['goal_id'], step_id=step_id):
+                                        step['summary'] = _generate_step_summary(response)
+                                    step['status'] = 'complete'
+                                    logger.info(f"Step {step_id} completed successfully in swarm.")
                                 
-                                # --- MONITOR CHECK FOR SWARM ---
-                                remaining = [s for s in active_goal['plan'] if s['status'] == 'pending' and s['step_id'] > step_id]
-                                if _run_plan_monitor(active_goal['goal'], remaining, response) == "REPLAN":
-                                    active_goal['status'] = 'awaiting_replan'
-                                    break
-                            elif response == "AWAITING_USER_INPUT_SIGNAL":
-                                active_goal['status'] = 'awaiting_input'
-                            elif response == "RATE_LIMIT_HIT":
-                                logger.warning(f"Step {step_id} hit rate limit.")
-                            elif response is None:
-                                retries = step.get('retries', 0)
-                                if retries < MAX_RETRIES:
-                                    step['retries'] = retries + 1
-                                    logger.warning(f"Step {step_id} failed. Retrying...")
+                                    # --- MONITOR CHECK FOR SWARM ---
+                                    remaining = [s for s in active_goal['plan'] if s['status'] in ('pending', 'running') and s['step_id'] > step_id]
+                                    with call_context(goal_id=active_goal['goal_id'], step_id=step_id):
+                                        decision = _run_plan_monitor(active_goal['goal'], remaining, response)
+                                    if decision == "REPLAN":
+                                        active_goal['status'] = 'awaiting_replan'
+                                        goal_token.cancel('replan')  # The other steps' results would be discarded
+                                        break
+                                elif response == "AWAITING_USER_INPUT_SIGNAL":
+                                    active_goal['status'] = 'awaiting_input'
+                                elif response == "RATE_LIMIT_HIT":
+                                    logger.warning(f"Step {step_id} hit rate limit.")
+                                elif response == "CANCELLED":
+                                    if not goal_token.cancelled:
+                                        _record_step_timeout(active_goal, step)
+                                elif response is None:
+                                    retries = step.get('retries', 0)
+                                    if retries < MAX_RETRIES:
+                                        step['retries'] = retries + 1
+                                        logger.warning(f"Step {step_id} failed. Retrying...")
+                                    else:
+                                        active_goal['status'] = 'paused'
+                                        update_goal(active_goal)
+                                        status_update_queue.put("goal_updated")
                                 else:
-                                    active_goal['status'] = 'paused'
+                                    step['status'] = 'failed'
+                                    active_goal['status'] = 'failed'
+                                    goal_token.cancel('goal_failed')
+                                    _settle_running_steps(dispatched_steps)
+                                    speculator.discard_goal(active_goal['goal_id'])
                                     update_goal(active_goal)
+                                    archive_goal(active_goal['goal_id'])
                                     status_update_queue.put("goal_updated")
-                            else:
-                                step['status'] = 'failed'
-                                active_goal['status'] = 'failed'
-                                update_goal(active_goal)
-                                archive_goal(active_goal['goal_id'])
-                                status_update_queue.put("goal_updated")
-                                break
+                                    break
                             
-                if active_goal['status'] != 'failed':
-                    update_goal(active_goal)
-                    status_update_queue.put("goal_updated")
-
-        elif should_trigger_summary():
-            generate_eod_summary(memory_manager, gemini_client)
-        elif should_trigger_dmn(rate_limiter, last_active_time):
-             run_dmn_tasks(gemini_client, memory_manager)
-        else:
-            logger.info("-> No active goals. Deep Sleep.")
-            orchestrator_wake_event.wait(timeout=30)
-            if orchestrator_wake_event.is_set(): orchestrator_wake_event.clear()
\ No newline at end of file
+                    _settle_running_steps(dispatched_steps)
+                    if goal_token.reason in ('goal_cancelled', 'lease_lost'):
+                        # Cancelled: the goal is archived. Lease lost: another worker owns it now.
+                        # Either way this tick's results must not be written over it.
+                        logger.warning(f"Orchestrator: Goal '{active_goal['goal_id']}' stopped mid-tick ({goal_token.reason}). In-flight work discarded.")
+                        if goal_token.reason == 'goal_cancelled':
+                            speculator.discard_goal(active_goal['goal_id'])
+                        continue
+                    if active_goal['status'] != 'failed':
+                        update_goal(active_goal)
+                        status_update_queue.put("goal_updated")
+
+            # Idle-time jobs run on one worker only (the others just sleep until woken)
+            elif housekeeping and should_trigger_summary():
+                generate_eod_summary(memory_manager, gemini_client)
+            elif housekeeping and should_trigger_dmn(rate_limiter, last_active_time):
+                 run_dmn_tasks(gemini_client, memory_manager)
+            else:
+                if housekeeping and time.time() - last_archive_compaction > ARCHIVE_COMPACTION_INTERVAL_SECONDS:
+                    last_archive_compaction = time.time()
+                    try:
+                        stats = compact_archive()
+                        if stats and any(stats.values()):
+                            logger.info(f"-> Archive compaction: {stats}")
+                    except Exception as e:
+                        logger.error(f"Archive compaction failed: {e}")
+                if housekeeping and time.time() - last_db_maintenance > DB_MAINTENANCE_INTERVAL_SECONDS:
+                    last_db_maintenance = time.time()
+                    integrity_check = time.time() - last_integrity_check > DB_INTEGRITY_CHECK_INTERVAL_SECONDS
+                    if integrity_check: last_integrity_check = time.time()
+                    try:
+                        report = run_db_maintenance(integrity_check=integrity_check)
+                        if report:
+                            timings = ", ".join(f"{task} {seconds * 1000:.1f}ms" for task, seconds in report['durations'].items())
+                            logger.info(f"-> DB maintenance: {timings}; WAL {report['wal_bytes_before']} -> {report['wal_bytes_after']} bytes, "
+                                        f"{report['usage_rows_pruned']} usage rows pruned, {report['pages_freed']} pages freed, integrity {report.get('integrity', 'skipped')}")
+                    except Exception as e:
+                        logger.error(f"DB maintenance failed: {e}")
+                logger.info("-> No active goals. Deep Sleep.")
+                orchestrator_wake_event.wait(timeout=30)
+                if orchestrator_wake_event.is_set(): orchestrator_wake_event.clear()
+
+    # --- Graceful shutdown: the current tick (and its in-flight steps) has finished ---
+    lease_keeper.hold(None)
+    release_goal_leases(worker_id)
+    logger.info(f"Orchestrator [{worker_id}]: Stopped.")
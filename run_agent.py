@@ -1,36 +1,106 @@
+import os
+import signal
 import threading
 import multiprocessing
 import time
 import uuid
 import datetime
-from utils.logger import logger
+from utils.logger import logger, stop_logging
+from utils import metrics, log_reader
+from utils.supervisor import Supervisor
 from main import main as run_orchestrator
 from dashboard import app as dashboard_app, socketio, watch_status_queue
 from core.file_watcher import main as run_file_watcher
 from voice_interface import main as run_voice_interface
-from core.context import status_update_queue as main_process_queue # The threading queue
+from core.context import status_update_queue as main_process_queue, forward_status_events, forward_metrics, flush_status_events, shutdown_event, orchestrator_wake_event, shared_state, adopt_shared_state # The threading queue
+
+# --- Supervisor Configuration ---
+# Orchestrator workers pull goals from the shared SQLite goal queue (leases keep them off each
+# other's goals). Processes by default, each with its own GIL. They share the request
+# scheduler's interactive window and priority order through shared memory, the circuit
+# breakers through SQLite, and send their metrics and log lines to this process, which
+# serves the dashboard. Worker processes are started with forkserver rather than forked
+# from this process, which may have opened ChromaDB by the time a worker is (re)started
+# (see MemoryManager.collection). "thread" runs the workers in this process instead.
+ORCHESTRATOR_WORKERS = int(os.getenv("COGNITO_ORCHESTRATOR_WORKERS", "2"))
+ORCHESTRATOR_WORKER_TYPE = os.getenv("COGNITO_ORCHESTRATOR_WORKER_TYPE", "process")  # "thread" or "process"
+FILE_WATCHER_ENABLED = os.getenv("COGNITO_FILE_WATCHER", "1") == "1"
+VOICE_ENABLED = os.getenv("COGNITO_VOICE", "1") == "1"
+# Workers heartbeat every loop iteration and, from their LeaseKeeper, every few seconds
+# while the iteration is within main.MAX_TICK_SECONDS (the longest legal tick). A worker is
+# restarted once its beats have stopped for this long, i.e. an iteration is treated as hung
+# after MAX_TICK_SECONDS plus this grace.
+ORCHESTRATOR_HEARTBEAT_TIMEOUT_SECONDS = int(os.getenv("COGNITO_ORCHESTRATOR_HEARTBEAT_TIMEOUT", "120"))
 
 def run_dashboard():
     """Starts the Flask-SocketIO web server."""
     logger.info("Starting dashboard thread with WebSocket server...")
     socketio.run(dashboard_app, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
 
-def bridge_voice_logs(mp_queue, thread_queue):
+def run_orchestrator_worker(worker_id: str, housekeeping: bool, mp_queue=None, shared=None):
+    """
+    Entry point of an orchestrator worker. In a worker process, `shared` is the parent's
+    shared_state(), and its log lines, "goal_updated" events and metrics are forwarded to
+    the dashboard process over `mp_queue`.
+    """
+    if mp_queue is not None:
+        adopt_shared_state(shared)
+        forward_status_events(mp_queue)
+        forward_metrics(mp_queue)
+        orchestrator_wake_event.follow_shared_wakeups()
+    run_orchestrator(worker_id=worker_id, housekeeping=housekeeping)
+    if mp_queue is not None:
+        # A process exits without running atexit hooks: flush the log queue by hand
+        stop_logging()
+        flush_status_events(mp_queue)
+
+def bridge_process_logs(mp_queue, thread_queue):
     """
-    Bridges the Multiprocessing Queue (Voice) to the Threading Queue (Dashboard).
-    This allows logs from the separate Voice process to appear in the main dashboard.
+    Bridges the Multiprocessing Queue (Voice, orchestrator workers) to the Threading Queue (Dashboard).
+    This allows logs, status events and metrics from the other processes to appear in the main dashboard.
     """
     while True:
         try:
-            # Blocking get from the Voice process
+            # Blocking get from the child processes
             msg = mp_queue.get()
             if msg is None: break # Poison pill check
+            if isinstance(msg, tuple) and msg[0] == "metrics":
+                # A worker process's metric values, served by this process's /metrics
+                metrics.absorb(msg[1], msg[2])
+                continue
+            if msg != "goal_updated":
+                # Lines logged by another process never pass through this process's logging
+                log_reader.get_tail_buffer().add_lines(msg.splitlines())
             # Put into the main process queue for the Dashboard to pick up
             thread_queue.put(msg)
         except Exception as e:
             logger.error(f"Error in log bridge: {e}")
             time.sleep(1)
 
+def build_services(process_status_queue) -> dict:
+    """The services to launch, in start order (worker processes fork before the server threads start)."""
+    services = {}
+    as_process = ORCHESTRATOR_WORKER_TYPE == "process"
+    for index in range(max(ORCHESTRATOR_WORKERS, 1)):
+        services[f"Orchestrator_{index}"] = {
+            "target": run_orchestrator_worker,
+            "args": (f"orchestrator-{index}", index == 0, process_status_queue, shared_state()) if as_process else (f"orchestrator-{index}", index == 0),
+            "type": ORCHESTRATOR_WORKER_TYPE,
+            "start_method": "forkserver",
+            "heartbeat_timeout": ORCHESTRATOR_HEARTBEAT_TIMEOUT_SECONDS,
+            "drain": True,
+        }
+    if FILE_WATCHER_ENABLED:
+        services["File_Watcher"] = {"target": run_file_watcher, "type": "thread"}
+    services["Dashboard"] = {"target": run_dashboard, "type": "thread"}
+    services["Status_Queue_Watcher"] = {"target": watch_status_queue, "type": "thread"}
+    # Bridge Thread
+    services["Log_Bridge"] = {"target": bridge_process_logs, "args": (process_status_queue, main_process_queue), "type": "thread"}
+    if VOICE_ENABLED:
+        # Voice Process (Pass the MP Queue)
+        services["Voice_Interface"] = {"target": run_voice_interface, "args": (process_status_queue,), "type": "process"}
+    return services
+
 if __name__ == "__main__":
     # 1. Initialize the robust, WAL-enabled database
     from utils.database import initialize_database
@@ -38,42 +108,31 @@ if __name__ == "__main__":
 
     logger.info("--- LAUNCHING COGNITO AGENT (Multi-Process) ---")
     
-    # 2. Create the Multiprocessing Queue for the Voice Interface
-    voice_status_queue = multiprocessing.Queue()
+    # 2. Create the Multiprocessing Queue for the Voice Interface and orchestrator worker processes
+    # (from the forkserver context, so that it can be handed to forkserver-started workers)
+    process_status_queue = multiprocessing.get_context("forkserver").Queue()
+    metrics.QUEUE_DEPTH.set_function(process_status_queue.qsize, queue='process_bridge')
 
     # 3. Define Services
-    services = {
-        "Orchestrator": {"target": run_orchestrator, "type": "thread"},
-        "File_Watcher": {"target": run_file_watcher, "type": "thread"},
-        "Dashboard": {"target": run_dashboard, "type": "thread"},
-        "Status_Queue_Watcher": {"target": watch_status_queue, "type": "thread"},
-        # Bridge Thread
-        "Log_Bridge": {"target": bridge_voice_logs, "args": (voice_status_queue, main_process_queue), "type": "thread"},
-        # Voice Process (Pass the MP Queue)
-        "Voice_Interface": {"target": run_voice_interface, "args": (voice_status_queue,), "type": "process"},
-    }
+    services = build_services(process_status_queue)
+    logger.info(f"Orchestrator: {max(ORCHESTRATOR_WORKERS, 1)} worker(s), {ORCHESTRATOR_WORKER_TYPE} mode.")
     
-    processes_and_threads = []
-    
-    for name, config in services.items():
-        args = config.get("args", ())
-        
-        if config["type"] == "thread":
-            instance = threading.Thread(target=config["target"], args=args, name=name, daemon=True)
-        elif config["type"] == "process":
-            instance = multiprocessing.Process(target=config["target"], args=args, name=name, daemon=True)
-        
-        processes_and_threads.append(instance)
-        instance.start()
-        logger.info(f"Service '{name}' started as a {config['type']}.")
-
+    supervisor = Supervisor(services)
+    supervisor.start()
     logger.info("--- ALL SERVICES LAUNCHED ---")
-    
+
+    # SIGTERM (e.g. from a process manager) takes the same graceful path as Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.request_stop())
     try:
-        while True:
-            time.sleep(1)
+        supervisor.run()
     except KeyboardInterrupt:
-        logger.info("Ctrl+C received. Shutting down agent...")
-        # Optional: Send poison pills if needed, but daemon threads will die with main.
+        pass
+
+    # --- Graceful shutdown: workers finish their in-flight steps, then everything stops ---
+    logger.info("Shutdown requested. Waiting for orchestrator workers to finish their current steps...")
+    shutdown_event.set()
+    orchestrator_wake_event.set()
+    supervisor.shutdown()
 
-    logger.info("--- AGENT SHUTDOWN COMPLETE ---")
\ No newline at end of file
+    logger.info("--- AGENT SHUTDOWN COMPLETE ---")
+    stop_logging()
@@ -0,0 +1,22 @@
+import threading
+import contextlib
+
+# Per-thread tags describing *who* is making an LLM call (caller, priority class, goal/step).
+# Thread-local rather than passed as arguments so deep call chains (planner -> strategist ->
+# ask_gemini) are tagged by whoever started them, e.g. the DMN or the dashboard.
+# Note: worker threads (ThreadPoolExecutor) start with an empty context.
+_local = threading.local()
+
+@contextlib.contextmanager
+def call_context(**tags):
+    """Adds tags for the duration of the block. Inner blocks override outer ones."""
+    previous = getattr(_local, 'tags', {})
+    _local.tags = {**previous, **tags}
+    try:
+        yield
+    finally:
+        _local.tags = previous
+
+def get_call_context() -> dict:
+    """Returns the tags active on the current thread."""
+    return getattr(_local, 'tags', {})
@@ -0,0 +1,69 @@
+import time
+import threading
+
+# --- Cooperative Cancellation ---
+# The orchestrator gives each goal tick a CancellationToken and each step a child token
+# with the step's wall-clock deadline. Work checks its token between iterations and before
+# every LLM call (ask_gemini finds it in the call context), and waits (scheduler queue,
+# retry backoff) end early once it is cancelled, so dead work stops taking rate-limit slots.
+# A request already sent to the API cannot be aborted; its result is discarded.
+
+class Cancelled(BaseException):
+    """
+    Raised by CancellationToken.check(). A BaseException (like asyncio.CancelledError), so
+    the many `except Exception` fallbacks on the way up do not swallow it.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class CancellationToken:
+    """Cancelled explicitly, by its deadline passing, or together with its parent token."""
+
+    def __init__(self, deadline: float = None):
+        self.deadline = deadline  # Wall-clock time (time.time()), or None for no deadline
+        self.reason = None
+        self._event = threading.Event()
+        self._children = []
+        self._lock = threading.Lock()
+
+    def cancel(self, reason: str = 'cancelled'):
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+            children, self._children = self._children, []
+        self._event.set()
+        for child in children:
+            child.cancel(reason)
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None and time.time() >= self.deadline:
+            self.cancel('deadline')
+        return self._event.is_set()
+
+    def check(self):
+        """Raises Cancelled if the token has been cancelled or its deadline has passed."""
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+    def child(self, timeout: float = None) -> 'CancellationToken':
+        """A token cancelled with this one, with its own deadline `timeout` seconds from now (never later than ours)."""
+        deadline = time.time() + timeout if timeout is not None else None
+        if self.deadline is not None:
+            deadline = self.deadline if deadline is None else min(deadline, self.deadline)
+        token = CancellationToken(deadline)
+        with self._lock:
+            if self.reason is None:
+                self._children.append(token)
+                return token
+        token.cancel(self.reason)
+        return token
+
+    def sleep(self, seconds: float) -> bool:
+        """Sleeps up to `seconds`; returns False as soon as the token is cancelled (or its deadline passes)."""
+        if self.deadline is not None:
+            seconds = min(seconds, max(0.0, self.deadline - time.time()))
+        self._event.wait(seconds)
+        return not self.cancelled
@@ -0,0 +1,93 @@
+import time
+import random
+import threading
+from .database import get_circuit_breakers, claim_circuit_probe, release_circuit_probe, close_circuit, record_circuit_failure
+
+# --- Configuration ---
+FAILURE_THRESHOLD = 3          # Consecutive 429/503s before the circuit opens
+BASE_OPEN_SECONDS = 10.0       # First open period; doubles on every consecutive trip
+MAX_OPEN_SECONDS = 300.0
+PROBE_TIMEOUT_SECONDS = 120.0  # A half-open probe that never reports back is abandoned
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+def jittered_backoff(attempt: int, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_MAX_SECONDS) -> float:
+    """Exponential backoff with 'equal jitter': half fixed, half random, so retries spread out."""
+    delay = min(cap, base * (2 ** max(attempt, 0)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+# A tier without a row in the circuit_breakers table has never failed
+_CLOSED = {'state': CLOSED, 'consecutive_failures': 0, 'trips': 0, 'opened_until': 0.0, 'probe_started': None, 'last_error': None}
+
+class CircuitBreaker:
+    """
+    Per-tier circuit breaker for upstream Gemini errors (closed -> open -> half-open).
+
+    While open, calls fail fast without consuming rate-limit slots. After the open period,
+    a single probe call is let through; its outcome closes the circuit or re-opens it
+    with a longer (jittered, exponential) period. The state lives in the circuit_breakers
+    table, so the dashboard process and every orchestrator worker process share one
+    breaker per tier. A closed circuit costs a read per call.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def _state(self) -> dict:
+        return (get_circuit_breakers(self.name) or {}).get(self.name, _CLOSED)
+
+    def allow_request(self) -> bool:
+        """Returns True if a call may proceed. In half-open state only one probe is allowed."""
+        if self._state()['state'] == CLOSED:
+            return True
+        return bool(claim_circuit_probe(self.name, PROBE_TIMEOUT_SECONDS))
+
+    def release_probe(self):
+        """Gives back a half-open probe that got no verdict (blocked by the rate limiter, a network error, cancelled)."""
+        if self._state()['state'] == HALF_OPEN:
+            release_circuit_probe(self.name)
+
+    def record_success(self):
+        state = self._state()
+        if state['state'] != CLOSED or state['consecutive_failures']:
+            close_circuit(self.name)
+
+    def record_failure(self, error: str = None):
+        return record_circuit_failure(self.name, error, FAILURE_THRESHOLD,
+                                      lambda trips: jittered_backoff(trips - 1, BASE_OPEN_SECONDS, MAX_OPEN_SECONDS))
+
+    def retry_after(self) -> float:
+        """Seconds until a call could be attempted (0 if the circuit is not open)."""
+        return _snapshot(self._state())['retry_after_seconds']
+
+    def snapshot(self) -> dict:
+        return _snapshot(self._state())
+
+def _snapshot(state: dict) -> dict:
+    return {
+        'state': state['state'],
+        'consecutive_failures': state['consecutive_failures'],
+        'trips': state['trips'],
+        'retry_after_seconds': max(0.0, state['opened_until'] - time.time()) if state['state'] == OPEN else 0.0,
+        'last_error': state['last_error'],
+    }
+
+# --- Registry ---
+# Shared by every thread in the process (orchestrator, swarm workers, dashboard chat); the
+# breakers' state is shared with the other processes through the database.
+_breakers = {}
+_registry_lock = threading.Lock()
+
+def get_breaker(tier: str) -> CircuitBreaker:
+    with _registry_lock:
+        if tier not in _breakers:
+            _breakers[tier] = CircuitBreaker(tier)
+        return _breakers[tier]
+
+def get_all_breakers() -> dict:
+    with _registry_lock:
+        tiers = list(_breakers)
+    rows = get_circuit_breakers() or {}
+    return {tier: _snapshot(rows.get(tier, _CLOSED)) for tier in tiers + [tier for tier in rows if tier not in tiers]}
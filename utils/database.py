@@ -1,11 +1,57 @@
+import os
+import re
+import zlib
+import hashlib
 import sqlite3
-import json
 import time
 import functools
+from typing import NamedTuple
 from .logger import logger
+from . import tracing
+from . import metrics
+from . import serialization
 from datetime import datetime
 
 DB_PATH = 'data/tasks.sqlite'
+# Converting an existing database to incremental auto-vacuum takes a full VACUUM (see
+# initialize_database); it only runs when this is set for a start.
+DB_CONVERT_AUTO_VACUUM = os.getenv("COGNITO_DB_CONVERT_AUTO_VACUUM", "0") == "1"
+
+# Explicit column list for the goals/archive tables (never SELECT * / positional INSERTs,
+# so adding a column does not shift the tuple layout).
+GOAL_COLUMNS = ('goal_id', 'goal', 'plan', 'audit_critique', 'status', 'strategy_blueprint',
+                'execution_log', 'preferred_tier', 'replan_count', 'steps_total', 'steps_complete', 'created_at')
+_GOAL_SELECT = ", ".join(GOAL_COLUMNS[:9])
+ACTIVE_STATUSES = ('pending', 'in-progress', 'awaiting_input', 'paused', 'awaiting_tier_decision', 'awaiting_replan')
+
+class GoalSummary(NamedTuple):
+    """Lightweight goal row for lists (no plan / execution log parsing)."""
+    goal_id: str
+    goal: str
+    status: str
+    preferred_tier: str | None
+    steps_total: int
+    steps_complete: int
+
+# --- DB Operation Timing ---
+# Wall time per decorated function, including lock retries and backoff sleeps.
+# Kept in the process metrics (see /metrics); the helpers below summarize them.
+
+def _record_db_op(name: str, seconds: float, lock_retries: int):
+    metrics.DB_OP_SECONDS.observe(seconds, op=name)
+    if lock_retries:
+        metrics.DB_LOCK_RETRIES.inc(lock_retries, op=name)
+
+def get_db_op_stats() -> dict:
+    """Returns {function name: {'calls', 'seconds', 'lock_retries'}} since start (or the last reset)."""
+    return {
+        op: {'calls': count, 'seconds': total, 'lock_retries': metrics.DB_LOCK_RETRIES.get(op=op)}
+        for (op,), (count, total) in metrics.DB_OP_SECONDS.snapshot().items()
+    }
+
+def reset_db_op_stats():
+    metrics.DB_OP_SECONDS.reset()
+    metrics.DB_LOCK_RETRIES.reset()
 
 def retry_db_op(max_retries=5, base_delay=0.1):
     """
@@ -16,22 +62,29 @@ def retry_db_op(max_retries=5, base_delay=0.1):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             retries = 0
-            while retries < max_retries:
+            start = time.perf_counter()
+            with tracing.span(f"db.{func.__name__}"):
                 try:
-                    return func(*args, **kwargs)
-                except sqlite3.OperationalError as e:
-                    if "locked" in str(e).lower():
-                        retries += 1
-                        sleep_time = base_delay * (2 ** retries)
-                        logger.warning(f"DB LOCKED: Retrying {func.__name__} in {sleep_time:.2f}s... ({retries}/{max_retries})")
-                        time.sleep(sleep_time)
-                    else:
-                        raise e
-                except Exception as e:
-                    logger.error(f"Database error in {func.__name__}: {e}")
-                    raise e
-            logger.error(f"DB FAILED: {func.__name__} failed after {max_retries} retries due to locks.")
-            return None
+                    while retries < max_retries:
+                        try:
+                            return func(*args, **kwargs)
+                        except sqlite3.OperationalError as e:
+                            if "locked" in str(e).lower():
+                                retries += 1
+                                sleep_time = base_delay * (2 ** retries)
+                                logger.warning(f"DB LOCKED: Retrying {func.__name__} in {sleep_time:.2f}s... ({retries}/{max_retries})")
+                                time.sleep(sleep_time)
+                            else:
+                                raise e
+                        except Exception as e:
+                            logger.error(f"Database error in {func.__name__}: {e}")
+                            raise e
+                    logger.error(f"DB FAILED: {func.__name__} failed after {max_retries} retries due to locks.")
+                    return None
+                finally:
+                    _record_db_op(func.__name__, time.perf_counter() - start, retries)
+                    if retries:
+                        tracing.set_attributes(**{'db.lock_retries': retries})
         return wrapper
     return decorator
 
@@ -43,6 +96,20 @@ def initialize_database():
     # --- CRITICAL: Enable Write-Ahead Logging (WAL) ---
     # This allows readers and writers to coexist, preventing
     # the Voice process from blocking the Orchestrator.
+    # Incremental auto-vacuum lets run_db_maintenance hand free pages back in small batches.
+    # A new file picks the mode up directly (set before anything is written to it). An
+    # existing one needs a full VACUUM, which holds the write lock while every process
+    # starting up waits on it, so that conversion is opt-in (COGNITO_DB_CONVERT_AUTO_VACUUM=1).
+    if DB_CONVERT_AUTO_VACUUM or con.execute("PRAGMA page_count;").fetchone()[0] == 0:
+        con.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+    if con.execute("PRAGMA auto_vacuum;").fetchone()[0] != 2:
+        if DB_CONVERT_AUTO_VACUUM:
+            logger.info("Converting database to incremental auto-vacuum (one-time VACUUM)...")
+            con.execute("VACUUM;")
+        else:
+            logger.info("Incremental vacuum unavailable: the database is not in incremental auto-vacuum mode "
+                        "(start once with COGNITO_DB_CONVERT_AUTO_VACUUM=1 to convert it).")
+
     con.execute("PRAGMA journal_mode=WAL;")
     
     cur = con.cursor()
@@ -90,10 +157,229 @@ def initialize_database():
     # Index for faster lookups on rate limit checks
     cur.execute("CREATE INDEX IF NOT EXISTS idx_rate_tier_time ON rate_limits(tier, timestamp);")
 
+    # 5. NEW: LLM Token Usage (raw, short retention) + daily rollup (kept)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS llm_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp REAL NOT NULL,
+            tier TEXT NOT NULL,
+            caller TEXT,
+            priority TEXT,
+            goal_id TEXT,
+            step_id INTEGER,
+            prompt_tokens INTEGER DEFAULT 0,
+            candidates_tokens INTEGER DEFAULT 0,
+            cached_tokens INTEGER DEFAULT 0,
+            thinking_tokens INTEGER DEFAULT 0,
+            total_tokens INTEGER DEFAULT 0
+        )
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_usage_tier_time ON llm_usage(tier, timestamp);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_usage_goal ON llm_usage(goal_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_usage_time ON llm_usage(timestamp);")  # Retention pruning
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS llm_usage_daily (
+            day TEXT NOT NULL,
+            tier TEXT NOT NULL,
+            caller TEXT NOT NULL,
+            calls INTEGER DEFAULT 0,
+            prompt_tokens INTEGER DEFAULT 0,
+            candidates_tokens INTEGER DEFAULT 0,
+            cached_tokens INTEGER DEFAULT 0,
+            thinking_tokens INTEGER DEFAULT 0,
+            total_tokens INTEGER DEFAULT 0,
+            PRIMARY KEY (day, tier, caller)
+        )
+    ''')
+
+    # 6. NEW: Materialized step progress (kept in sync by add_goal/update_goal)
+    for table in ('goals', 'archive'):
+        _ensure_column(cur, table, 'steps_total', 'INTEGER')
+        _ensure_column(cur, table, 'steps_complete', 'INTEGER')
+        # Backfill rows written before the columns existed
+        cur.execute(f'''
+            UPDATE {table} SET
+                steps_total = COALESCE(json_array_length(plan), 0),
+                steps_complete = (SELECT COUNT(*) FROM json_each({table}.plan) WHERE json_extract(value, '$.status') = 'complete')
+            WHERE steps_total IS NULL AND json_valid(plan)
+        ''')
+
+    # 7. NEW: Chronological ordering + archive indexes + maintained row count
+    for table in ('goals', 'archive'):
+        _ensure_column(cur, table, 'created_at', 'REAL')
+    _ensure_column(cur, 'archive', 'archived_at', 'REAL')
+    _ensure_column(cur, 'archive', 'cold', 'INTEGER NOT NULL DEFAULT 0')  # 1 = stub; the full goal is in the cold file
+    _backfill_timestamps(cur)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_archive_archived ON archive(archived_at, goal_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_archive_status_archived ON archive(status, archived_at);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_archive_hot_archived ON archive(archived_at) WHERE cold = 0;")
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS row_counts (
+            table_name TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL
+        )
+    ''')
+    # Re-seeded on every start (self-healing); the triggers keep it exact afterwards
+    cur.execute("INSERT OR REPLACE INTO row_counts (table_name, row_count) SELECT 'archive', COUNT(*) FROM archive")
+    cur.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_archive_count_insert AFTER INSERT ON archive
+        BEGIN UPDATE row_counts SET row_count = row_count + 1 WHERE table_name = 'archive'; END
+    ''')
+    cur.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_archive_count_delete AFTER DELETE ON archive
+        BEGIN UPDATE row_counts SET row_count = row_count - 1 WHERE table_name = 'archive'; END
+    ''')
+
+    # 8. NEW: Full-text search over the archive (kept in sync by triggers on archive)
+    cur.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS archive_fts USING fts5(
+            goal_id UNINDEXED, goal, steps, outputs, summary,
+            tokenize = 'porter unicode61'
+        )
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_archive_fts_insert AFTER INSERT ON archive
+        BEGIN
+            INSERT INTO archive_fts (rowid, goal_id, goal, steps, outputs, summary)
+            VALUES (new.rowid, new.goal_id, new.goal, {_fts_steps_sql('new.plan')}, {_fts_outputs_sql('new.plan')}, new.execution_log);
+        END
+    ''')
+    cur.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_archive_fts_delete AFTER DELETE ON archive
+        BEGIN DELETE FROM archive_fts WHERE rowid = old.rowid; END
+    ''')
+    # One-time index build for archives created before the index existed
+    if cur.execute("SELECT NOT EXISTS (SELECT 1 FROM archive_fts) AND EXISTS (SELECT 1 FROM archive)").fetchone()[0]:
+        cur.execute(f'''
+            INSERT INTO archive_fts (rowid, goal_id, goal, steps, outputs, summary)
+            SELECT rowid, goal_id, goal, {_fts_steps_sql('archive.plan')}, {_fts_outputs_sql('archive.plan')}, execution_log FROM archive
+        ''')
+        logger.info("Built archive full-text index.")
+
+    # 9. NEW: Content-addressed, compressed step outputs for archived goals
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS output_blobs (
+            hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+    ''')
+
+    # 10. NEW: Goal queue (priority + lease per goal; rows follow the goals table)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS goal_queue (
+            goal_id TEXT PRIMARY KEY,
+            priority INTEGER NOT NULL,
+            enqueued_at REAL NOT NULL,
+            lease_owner TEXT,
+            lease_expires REAL,
+            claims INTEGER NOT NULL DEFAULT 0,
+            not_before REAL
+        )
+    ''')
+    _ensure_column(cur, 'goal_queue', 'not_before', 'REAL')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_goal_queue_order ON goal_queue(priority, enqueued_at);")
+    cur.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_goal_queue_delete AFTER DELETE ON goals
+        BEGIN DELETE FROM goal_queue WHERE goal_id = old.goal_id; END
+    ''')
+    # Goals created before the queue existed
+    missing = cur.execute("SELECT goal_id, created_at FROM goals WHERE goal_id NOT IN (SELECT goal_id FROM goal_queue)").fetchall()
+    cur.executemany("INSERT INTO goal_queue (goal_id, priority, enqueued_at) VALUES (?, ?, ?)",
+                    [(goal_id, _goal_priority(goal_id), created_at or 0.0) for goal_id, created_at in missing])
+
+    # 11. NEW: ReAct checkpoints (in-flight reactive_solve steps; rows follow the goals table)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS react_checkpoints (
+            goal_id TEXT NOT NULL,
+            step_id INTEGER NOT NULL,
+            task_spec TEXT NOT NULL,
+            iteration INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (goal_id, step_id)
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS react_turns (
+            goal_id TEXT NOT NULL,
+            step_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            PRIMARY KEY (goal_id, step_id, seq)
+        )
+    ''')
+    cur.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_react_checkpoints_delete AFTER DELETE ON goals
+        BEGIN
+            DELETE FROM react_checkpoints WHERE goal_id = old.goal_id;
+            DELETE FROM react_turns WHERE goal_id = old.goal_id;
+        END
+    ''')
+
+    # 12. NEW: Per-tool step durations (EWMA, shared by all workers; feeds critical-path ranking)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS tool_latency (
+            tool TEXT PRIMARY KEY,
+            ewma_seconds REAL NOT NULL,
+            samples INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL
+        )
+    ''')
+
+    # 13. NEW: Circuit breaker state per tier (shared by all processes; see utils/circuit_breaker.py)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS circuit_breakers (
+            tier TEXT PRIMARY KEY,
+            state TEXT NOT NULL DEFAULT 'closed',
+            consecutive_failures INTEGER NOT NULL DEFAULT 0,
+            trips INTEGER NOT NULL DEFAULT 0,
+            opened_until REAL NOT NULL DEFAULT 0,
+            probe_started REAL,
+            last_error TEXT
+        )
+    ''')
+
     con.commit()
     con.close()
     logger.info("Database initialized (WAL Mode Enabled).")
 
+def _fts_steps_sql(plan: str) -> str:
+    """SQL expression: every step's prompt, refined prompt, tool name and parameters, one per line."""
+    fields = ('$.prompt', '$.refined_prompt', '$.tool_call.tool_name', '$.tool_call.parameters')
+    joined = " || ' ' || ".join(f"COALESCE(json_extract(value, '{field}'), '')" for field in fields)
+    return (f"(SELECT group_concat(rtrim({joined}), char(10)) "
+            f"FROM json_each(CASE WHEN json_valid({plan}) THEN {plan} ELSE '[]' END))")
+
+def _fts_outputs_sql(plan: str) -> str:
+    """SQL expression: every step's output, one per line."""
+    return (f"(SELECT group_concat(COALESCE(json_extract(value, '$.output'), json_extract(value, '$.output_preview')), char(10)) "
+            f"FROM json_each(CASE WHEN json_valid({plan}) THEN {plan} ELSE '[]' END))")
+
+_GOAL_ID_TIME = re.compile(r'(\d{8}_\d{6})')
+
+def _backfill_timestamps(cur):
+    """Fills created_at/archived_at for rows from before the columns existed (from the goal_id timestamp, if any)."""
+    for table in ('goals', 'archive'):
+        rows = cur.execute(f"SELECT goal_id FROM {table} WHERE created_at IS NULL").fetchall()
+        for (goal_id,) in rows:
+            match = _GOAL_ID_TIME.search(goal_id or '')
+            created = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S').timestamp() if match else 0.0
+            cur.execute(f"UPDATE {table} SET created_at = ? WHERE goal_id = ?", (created, goal_id))
+    cur.execute("UPDATE archive SET archived_at = created_at WHERE archived_at IS NULL")
+
+def _ensure_column(cur, table: str, column: str, declaration: str):
+    """Adds a column to an existing table if it is missing (lightweight schema migration)."""
+    existing = {row[1] for row in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+    if column not in existing:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+def _step_counts(plan) -> tuple[int, int]:
+    """(steps_total, steps_complete) for a plan list."""
+    if not isinstance(plan, list):
+        return 0, 0
+    return len(plan), sum(1 for step in plan if isinstance(step, dict) and step.get('status') == 'complete')
+
 # --- RATE LIMITER FUNCTIONS (NEW) ---
 
 @retry_db_op()
@@ -151,6 +437,101 @@ def get_rate_limit_usage_db(tier: str, rpd_limit: int) -> float:
     
     return (count / rpd_limit) * 100.0
 
+@retry_db_op()
+def get_rate_limit_counts_db(tier: str) -> tuple[int, int]:
+    """Returns the (last minute, last 24h) call counts for a tier without recording a call."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    now = time.time()
+
+    cur.execute(
+        "SELECT COUNT(CASE WHEN timestamp > ? THEN 1 END), COUNT(*) FROM rate_limits WHERE tier = ? AND timestamp > ?",
+        (now - 60, tier, now - 86400)
+    )
+    rpm_count, rpd_count = cur.fetchone()
+    con.close()
+
+    return rpm_count, rpd_count
+
+# --- TOKEN USAGE FUNCTIONS ---
+
+USAGE_RETENTION_DAYS = 7  # Raw per-call rows (pruned by run_db_maintenance); the daily rollup is kept indefinitely
+
+@retry_db_op()
+def record_llm_usage(tier: str, caller: str, priority: str, goal_id: str, step_id: int,
+                     prompt_tokens: int, candidates_tokens: int, cached_tokens: int, thinking_tokens: int, total_tokens: int):
+    """Stores one call's token counts and folds them into the daily rollup in the same transaction."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    now = time.time()
+    counts = (prompt_tokens, candidates_tokens, cached_tokens, thinking_tokens, total_tokens)
+
+    cur.execute(
+        "INSERT INTO llm_usage (timestamp, tier, caller, priority, goal_id, step_id, prompt_tokens, candidates_tokens, cached_tokens, thinking_tokens, total_tokens) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (now, tier, caller, priority, goal_id, step_id, *counts)
+    )
+    cur.execute(
+        "INSERT INTO llm_usage_daily (day, tier, caller, calls, prompt_tokens, candidates_tokens, cached_tokens, thinking_tokens, total_tokens) "
+        "VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(day, tier, caller) DO UPDATE SET calls = calls + 1, "
+        "prompt_tokens = prompt_tokens + excluded.prompt_tokens, candidates_tokens = candidates_tokens + excluded.candidates_tokens, "
+        "cached_tokens = cached_tokens + excluded.cached_tokens, thinking_tokens = thinking_tokens + excluded.thinking_tokens, "
+        "total_tokens = total_tokens + excluded.total_tokens",
+        (datetime.fromtimestamp(now).strftime('%Y-%m-%d'), tier, caller or 'unknown', *counts)
+    )
+    con.commit()
+    con.close()
+
+@retry_db_op()
+def get_token_usage_db(tier: str, since: float) -> int:
+    """Total tokens billed to a tier since a unix timestamp (sliding window, like RPD)."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    cur.execute("SELECT COALESCE(SUM(total_tokens), 0) FROM llm_usage WHERE tier = ? AND timestamp > ?", (tier, since))
+    total = cur.fetchone()[0]
+    con.close()
+    return total
+
+@retry_db_op()
+def get_usage_rollup(days: int = 7) -> list:
+    """Daily rollup rows for the last `days` days, newest first."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    con.row_factory = sqlite3.Row
+    cur = con.cursor()
+    first_day = datetime.fromtimestamp(time.time() - (days - 1) * 86400).strftime('%Y-%m-%d')
+    res = cur.execute("SELECT * FROM llm_usage_daily WHERE day >= ? ORDER BY day DESC, total_tokens DESC", (first_day,))
+    rows = [dict(r) for r in res.fetchall()]
+    con.close()
+    return rows
+
+@retry_db_op()
+def get_usage_by_goal(since: float, limit: int = 20) -> list:
+    """Per-goal token totals (with per-step breakdown) from the raw table, heaviest first."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    res = cur.execute(
+        "SELECT goal_id, COUNT(*), SUM(prompt_tokens), SUM(candidates_tokens), SUM(thinking_tokens), SUM(total_tokens) "
+        "FROM llm_usage WHERE goal_id IS NOT NULL AND timestamp > ? GROUP BY goal_id ORDER BY SUM(total_tokens) DESC LIMIT ?",
+        (since, limit)
+    )
+    goals = [
+        {'goal_id': r[0], 'calls': r[1], 'prompt_tokens': r[2], 'candidates_tokens': r[3], 'thinking_tokens': r[4], 'total_tokens': r[5], 'steps': {}}
+        for r in res.fetchall()
+    ]
+    by_id = {g['goal_id']: g for g in goals}
+    if by_id:
+        placeholders = ",".join("?" * len(by_id))
+        res = cur.execute(
+            f"SELECT goal_id, step_id, SUM(total_tokens) FROM llm_usage WHERE timestamp > ? AND goal_id IN ({placeholders}) "
+            "AND step_id IS NOT NULL GROUP BY goal_id, step_id",
+            (since, *by_id)
+        )
+        for goal_id, step_id, total in res.fetchall():
+            by_id[goal_id]['steps'][step_id] = total
+    con.close()
+    return goals
+
 # --- EXISTING FUNCTIONS (Hardened with @retry_db_op) ---
 
 @retry_db_op()
@@ -170,27 +551,42 @@ def get_goal_status_by_id(goal_id: str) -> str | None:
     
     return status_tuple_archive[0] if status_tuple_archive else None
 
+@retry_db_op()
+def is_goal_cancelled(goal_id: str) -> bool:
+    """True once a goal is marked cancelled or has left the goals table (archived or deleted)."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    row = con.execute("SELECT status FROM goals WHERE goal_id = ?", (goal_id,)).fetchone()
+    con.close()
+    return row is None or row[0] == 'cancelled'
+
 @retry_db_op()
 def add_goal(goal_obj: dict):
     con = sqlite3.connect(DB_PATH, check_same_thread=False)
     cur = con.cursor()
-    cur.execute("INSERT INTO goals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (
-        goal_obj.get('goal_id'), goal_obj.get('goal'), json.dumps(goal_obj.get('plan')),
+    steps_total, steps_complete = _step_counts(goal_obj.get('plan'))
+    cur.execute(f"INSERT INTO goals ({', '.join(GOAL_COLUMNS)}) VALUES ({', '.join('?' * len(GOAL_COLUMNS))})", (
+        goal_obj.get('goal_id'), goal_obj.get('goal'), serialization.dumps(goal_obj.get('plan')),
         goal_obj.get('audit_critique'), goal_obj.get('status'),
-        json.dumps(goal_obj.get('strategy_blueprint')),
+        serialization.dumps(goal_obj.get('strategy_blueprint')),
         goal_obj.get('execution_log', None),
         goal_obj.get('preferred_tier', 'tier1'),
-        goal_obj.get('replan_count', 0)
+        goal_obj.get('replan_count', 0),
+        steps_total, steps_complete,
+        goal_obj.get('created_at') or time.time()
+    ))
+    cur.execute("INSERT OR REPLACE INTO goal_queue (goal_id, priority, enqueued_at) VALUES (?, ?, ?)", (
+        goal_obj.get('goal_id'), goal_obj.get('priority', _goal_priority(goal_obj.get('goal_id'))), time.time()
     ))
     con.commit()
     con.close()
 
 def _tuple_to_goal_dict(goal_tuple: tuple) -> dict:
+    """Converts a row selected with _GOAL_SELECT into a goal dict."""
     if not goal_tuple: return None
     return {
-        'goal_id': goal_tuple[0], 'goal': goal_tuple[1], 'plan': json.loads(goal_tuple[2]),
+        'goal_id': goal_tuple[0], 'goal': goal_tuple[1], 'plan': serialization.loads(goal_tuple[2]),
         'audit_critique': goal_tuple[3], 'status': goal_tuple[4],
-        'strategy_blueprint': json.loads(goal_tuple[5]) if goal_tuple[5] else {},
+        'strategy_blueprint': serialization.loads(goal_tuple[5]) if goal_tuple[5] else {},
         'execution_log': goal_tuple[6],
         'preferred_tier': goal_tuple[7],
         'replan_count': goal_tuple[8]
@@ -198,26 +594,292 @@ def _tuple_to_goal_dict(goal_tuple: tuple) -> dict:
 
 @retry_db_op()
 def get_active_goal() -> dict | None:
+    """The goal the queue would hand out next, ignoring leases (a peek; workers use claim_next_goal)."""
     con = sqlite3.connect(DB_PATH, check_same_thread=False)
     cur = con.cursor()
-    res = cur.execute("SELECT * FROM goals WHERE status IN ('pending', 'in-progress', 'awaiting_replan') ORDER BY goal_id ASC LIMIT 1")
+    res = cur.execute(f"""
+        SELECT {_GOAL_SELECT_QUALIFIED} FROM goals g JOIN goal_queue q ON q.goal_id = g.goal_id
+        WHERE g.status IN {RUNNABLE_STATUSES} AND (q.not_before IS NULL OR q.not_before <= ?)
+        ORDER BY q.priority, q.enqueued_at LIMIT 1
+    """, (time.time(),))
     goal_tuple = res.fetchone()
     con.close()
     return _tuple_to_goal_dict(goal_tuple)
 
+# --- NEW: Goal Queue ---
+# Every row in `goals` has a goal_queue row: a priority (lower runs first), the enqueue time
+# and an optional lease. A worker claims the best runnable goal whose lease is free or expired
+# with one UPDATE ... RETURNING, so several orchestrator threads or processes never pick the
+# same goal. A worker holds at most one lease: claiming releases the previous one, so a newly
+# queued interactive goal overtakes a long-running background goal at the next tick.
+# A parked goal (park_goal) is skipped until its `not_before` time.
+RUNNABLE_STATUSES = ('pending', 'in-progress', 'awaiting_replan')
+GOAL_LEASE_SECONDS = 300  # Renewed by the worker while it runs a goal; an expired lease is up for grabs
+GOAL_PRIORITY_DEFAULT = 2
+GOAL_SOURCE_PRIORITIES = {  # goal_id prefix -> priority
+    'web': 0, 'voice': 0, 'clarification': 0, 'cli': 0,
+    'replan': 1,
+    'file': 2,
+    'dmn': 3,
+}
+_GOAL_SELECT_QUALIFIED = ", ".join(f"g.{column}" for column in GOAL_COLUMNS[:9])
+
+def _goal_priority(goal_id: str | None) -> int:
+    """Queue priority from the goal's source (the goal_id prefix)."""
+    return GOAL_SOURCE_PRIORITIES.get((goal_id or '').split('_', 1)[0], GOAL_PRIORITY_DEFAULT)
+
+@retry_db_op()
+def claim_next_goal(owner: str, lease_seconds: float = GOAL_LEASE_SECONDS) -> dict | None:
+    """
+    Atomically leases the highest-priority runnable goal to `owner` and returns it (None if
+    there is nothing to do). Any lease `owner` held before is released in the same transaction.
+    """
+    con = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    cur = con.cursor()
+    now = time.time()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("UPDATE goal_queue SET lease_owner = NULL, lease_expires = NULL WHERE lease_owner = ?", (owner,))
+        claimed = cur.execute(f"""
+            UPDATE goal_queue SET lease_owner = ?, lease_expires = ?, claims = claims + 1
+            WHERE goal_id = (
+                SELECT q.goal_id FROM goal_queue q JOIN goals g ON g.goal_id = q.goal_id
+                WHERE g.status IN {RUNNABLE_STATUSES} AND (q.lease_owner IS NULL OR q.lease_expires < ?)
+                  AND (q.not_before IS NULL OR q.not_before <= ?)
+                ORDER BY q.priority, q.enqueued_at LIMIT 1
+            )
+            RETURNING goal_id
+        """, (owner, now + lease_seconds, now, now)).fetchone()
+        goal_tuple = None
+        if claimed:
+            goal_tuple = cur.execute(f"SELECT {_GOAL_SELECT} FROM goals WHERE goal_id = ?", (claimed[0],)).fetchone()
+        cur.execute("COMMIT")
+    except Exception:
+        if con.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+    return _tuple_to_goal_dict(goal_tuple)
+
+@retry_db_op()
+def renew_goal_lease(goal_id: str, owner: str, lease_seconds: float = GOAL_LEASE_SECONDS) -> bool:
+    """Extends `owner`'s lease on a goal. False if the lease was lost (expired and claimed by another worker)."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    cur.execute("UPDATE goal_queue SET lease_expires = ? WHERE goal_id = ? AND lease_owner = ?",
+                (time.time() + lease_seconds, goal_id, owner))
+    renewed = cur.rowcount > 0
+    con.commit()
+    con.close()
+    return renewed
+
+@retry_db_op()
+def park_goal(goal_id: str, owner: str, until: float) -> bool:
+    """Releases `owner`'s lease on a goal and keeps it from being claimed again before `until`."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    cur.execute("UPDATE goal_queue SET not_before = ?, lease_owner = NULL, lease_expires = NULL WHERE goal_id = ? AND lease_owner = ?",
+                (until, goal_id, owner))
+    parked = cur.rowcount > 0
+    con.commit()
+    con.close()
+    return parked
+
+@retry_db_op()
+def release_goal_leases(owner: str) -> int:
+    """Drops every lease held by `owner` (e.g. on shutdown), so other workers need not wait for expiry."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    cur.execute("UPDATE goal_queue SET lease_owner = NULL, lease_expires = NULL WHERE lease_owner = ?", (owner,))
+    released = cur.rowcount
+    con.commit()
+    con.close()
+    return released
+
+@retry_db_op()
+def recover_expired_leases() -> list:
+    """Clears leases whose owner stopped renewing them (a crashed or hung worker). Returns [(goal_id, owner)]."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    now = time.time()
+    recovered = cur.execute("SELECT goal_id, lease_owner FROM goal_queue WHERE lease_expires < ?", (now,)).fetchall()
+    cur.executemany("UPDATE goal_queue SET lease_owner = NULL, lease_expires = NULL WHERE goal_id = ? AND lease_expires < ?",
+                    [(goal_id, now) for goal_id, _ in recovered])
+    con.commit()
+    con.close()
+    return recovered
+
 @retry_db_op()
 def update_goal(goal_obj: dict):
     con = sqlite3.connect(DB_PATH, check_same_thread=False)
     cur = con.cursor()
-    cur.execute("UPDATE goals SET plan = ?, status = ?, execution_log = ? WHERE goal_id = ?", (
-        json.dumps(goal_obj.get('plan')),
+    steps_total, steps_complete = _step_counts(goal_obj.get('plan'))
+    cur.execute("UPDATE goals SET plan = ?, status = ?, execution_log = ?, steps_total = ?, steps_complete = ? WHERE goal_id = ?", (
+        serialization.dumps(goal_obj.get('plan')),
         goal_obj.get('status'),
         goal_obj.get('execution_log'),
+        steps_total, steps_complete,
         goal_obj.get('goal_id')
     ))
     con.commit()
     con.close()
 
+# --- NEW: ReAct Checkpoints ---
+# A reactive_solve step records its TaskSpec and conversation as it goes: one row per
+# turn (a Content serialized to JSON), appended after each iteration rather than rewriting
+# the whole history. A step interrupted by a restart picks up from its last saved turn.
+
+@retry_db_op()
+def save_react_checkpoint(goal_id: str, step_id: int, task_spec: dict, iteration: int, turns: list, first_seq: int):
+    """Records a ReAct loop's progress; `turns` (JSON strings) are stored from position `first_seq` on."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    cur.execute("""
+        INSERT INTO react_checkpoints (goal_id, step_id, task_spec, iteration, updated_at) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (goal_id, step_id) DO UPDATE SET iteration = excluded.iteration, updated_at = excluded.updated_at
+    """, (goal_id, step_id, serialization.dumps(task_spec), iteration, time.time()))
+    cur.executemany("INSERT OR REPLACE INTO react_turns (goal_id, step_id, seq, content) VALUES (?, ?, ?, ?)",
+                    [(goal_id, step_id, first_seq + i, turn) for i, turn in enumerate(turns)])
+    con.commit()
+    con.close()
+
+@retry_db_op()
+def load_react_checkpoint(goal_id: str, step_id: int) -> dict | None:
+    """{'task_spec', 'iteration', 'updated_at', 'turns'} for a step with saved progress, else None."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    row = cur.execute("SELECT task_spec, iteration, updated_at FROM react_checkpoints WHERE goal_id = ? AND step_id = ?",
+                      (goal_id, step_id)).fetchone()
+    turns = []
+    if row:
+        turns = [content for (content,) in cur.execute(
+            "SELECT content FROM react_turns WHERE goal_id = ? AND step_id = ? ORDER BY seq", (goal_id, step_id))]
+    con.close()
+    if not row:
+        return None
+    return {'task_spec': serialization.loads(row[0]), 'iteration': row[1], 'updated_at': row[2], 'turns': turns}
+
+@retry_db_op()
+def clear_react_checkpoint(goal_id: str, step_id: int):
+    """Drops a step's saved progress once its output is stored in the plan."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    cur.execute("DELETE FROM react_checkpoints WHERE goal_id = ? AND step_id = ?", (goal_id, step_id))
+    cur.execute("DELETE FROM react_turns WHERE goal_id = ? AND step_id = ?", (goal_id, step_id))
+    con.commit()
+    con.close()
+
+# --- NEW: Tool Latency ---
+# An exponentially weighted moving average of how long each tool's steps take, updated in
+# one statement so concurrent workers never lose each other's samples.
+
+@retry_db_op()
+def record_tool_latency(tool: str, seconds: float, alpha: float):
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    cur.execute("""
+        INSERT INTO tool_latency (tool, ewma_seconds, samples, updated_at) VALUES (?, ?, 1, ?)
+        ON CONFLICT (tool) DO UPDATE SET
+            ewma_seconds = ewma_seconds + ? * (excluded.ewma_seconds - ewma_seconds),
+            samples = samples + 1, updated_at = excluded.updated_at
+    """, (tool, seconds, time.time(), alpha))
+    con.commit()
+    con.close()
+
+@retry_db_op()
+def get_tool_latencies() -> dict:
+    """tool -> EWMA step duration in seconds, for every tool with at least one sample."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    rows = cur.execute("SELECT tool, ewma_seconds FROM tool_latency").fetchall()
+    con.close()
+    return dict(rows)
+
+# --- NEW: Circuit Breakers ---
+# Per-tier breaker state, shared by every process (see utils/circuit_breaker.py). Each
+# transition is one conditional statement or one IMMEDIATE transaction, so two processes
+# never both win a half-open probe or lose each other's failures.
+CIRCUIT_COLUMNS = ('tier', 'state', 'consecutive_failures', 'trips', 'opened_until', 'probe_started', 'last_error')
+
+@retry_db_op()
+def get_circuit_breakers(tier: str = None) -> dict:
+    """tier -> breaker state (a dict of CIRCUIT_COLUMNS), for `tier` or every tier with a row."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    query = f"SELECT {', '.join(CIRCUIT_COLUMNS)} FROM circuit_breakers"
+    rows = cur.execute(query + " WHERE tier = ?", (tier,)).fetchall() if tier else cur.execute(query).fetchall()
+    con.close()
+    return {row[0]: dict(zip(CIRCUIT_COLUMNS, row)) for row in rows}
+
+@retry_db_op()
+def claim_circuit_probe(tier: str, probe_timeout: float) -> bool:
+    """
+    Lets one caller through a circuit that is due for a half-open probe: an open circuit whose
+    period is over, or a half-open one whose probe was released or abandoned. True for the winner.
+    """
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    now = time.time()
+    cur.execute("""
+        UPDATE circuit_breakers SET state = 'half_open', probe_started = ?
+        WHERE tier = ? AND ((state = 'open' AND opened_until <= ?)
+                            OR (state = 'half_open' AND (probe_started IS NULL OR probe_started < ?)))
+    """, (now, tier, now, now - probe_timeout))
+    claimed = cur.rowcount > 0
+    con.commit()
+    con.close()
+    return claimed
+
+@retry_db_op()
+def release_circuit_probe(tier: str):
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    cur.execute("UPDATE circuit_breakers SET probe_started = NULL WHERE tier = ? AND state = 'half_open'", (tier,))
+    con.commit()
+    con.close()
+
+@retry_db_op()
+def close_circuit(tier: str):
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    cur.execute("""
+        UPDATE circuit_breakers SET state = 'closed', consecutive_failures = 0, trips = 0, probe_started = NULL
+        WHERE tier = ? AND (state != 'closed' OR consecutive_failures > 0)
+    """, (tier,))
+    con.commit()
+    con.close()
+
+@retry_db_op()
+def record_circuit_failure(tier: str, error: str, threshold: int, open_seconds) -> float | None:
+    """
+    Counts an upstream failure. The circuit opens once `threshold` failures are consecutive
+    (or its half-open probe failed), for `open_seconds(trips)` seconds. Returns that period,
+    or None if the circuit did not trip.
+    """
+    con = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    cur = con.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        state, failures, trips = cur.execute("""
+            INSERT INTO circuit_breakers (tier, consecutive_failures, last_error) VALUES (?, 1, ?)
+            ON CONFLICT (tier) DO UPDATE SET consecutive_failures = consecutive_failures + 1, last_error = excluded.last_error
+            RETURNING state, consecutive_failures, trips
+        """, (tier, error)).fetchone()
+        period = None
+        if state == 'half_open' or failures >= threshold:
+            period = open_seconds(trips + 1)
+            cur.execute("UPDATE circuit_breakers SET state = 'open', trips = ?, opened_until = ?, probe_started = NULL WHERE tier = ?",
+                        (trips + 1, time.time() + period, tier))
+        cur.execute("COMMIT")
+    except Exception:
+        if con.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+    return period
+
 @retry_db_op()
 def update_goal_tier(goal_id: str, new_tier: str):
     con = sqlite3.connect(DB_PATH, check_same_thread=False)
@@ -227,11 +889,15 @@ def update_goal_tier(goal_id: str, new_tier: str):
     con.close()
 
 @retry_db_op()
-def get_recent_failed_goals(limit: int = 5) -> list:
+def get_recent_failed_goals(limit: int = 5, hydrate: bool = False) -> list:
+    """Most recently archived failed goals; `hydrate=True` restores full step outputs."""
     con = sqlite3.connect(DB_PATH, check_same_thread=False)
     cur = con.cursor()
-    res = cur.execute("SELECT * FROM archive WHERE status = 'failed' ORDER BY goal_id DESC LIMIT ?", (limit,))
+    res = cur.execute(f"SELECT {_GOAL_SELECT} FROM archive WHERE status = 'failed' ORDER BY archived_at DESC LIMIT ?", (limit,))
     goals_list = [_tuple_to_goal_dict(t) for t in res.fetchall()]
+    if hydrate:
+        for goal in goals_list:
+            _hydrate_outputs(cur, goal['plan'])
     con.close()
     return goals_list
 
@@ -240,26 +906,154 @@ def get_archived_goals(page: int = 1, per_page: int = 10) -> list:
     offset = (page - 1) * per_page
     con = sqlite3.connect(DB_PATH, check_same_thread=False)
     cur = con.cursor()
-    res = cur.execute("SELECT * FROM archive ORDER BY goal_id DESC LIMIT ? OFFSET ?", (per_page, offset))
-    goals_list = [_tuple_to_goal_dict(t) for t in res.fetchall()]
+    res = cur.execute(f"SELECT {_GOAL_SELECT}, cold FROM archive ORDER BY archived_at DESC, goal_id DESC LIMIT ? OFFSET ?", (per_page, offset))
+    rows = res.fetchall()
+    goals_list = [_tuple_to_goal_dict(row[:-1]) for row in rows]
+    _fill_cold_stubs(cur, [goal for goal, row in zip(goals_list, rows) if row[-1]])
     con.close()
     return goals_list
 
+# --- NEW: Keyset Pagination for the Archive ---
+# Pages are addressed by a cursor ("<archived_at>:<goal_id>" of a boundary row) instead of an
+# OFFSET, so a deep page costs the same as the first one (index: archive(archived_at, goal_id)).
+
+def _encode_cursor(archived_at: float, goal_id: str) -> str:
+    return f"{archived_at!r}:{goal_id}"
+
+def _decode_cursor(cursor: str) -> tuple[float, str] | None:
+    try:
+        archived_at, goal_id = cursor.split(':', 1)
+        return float(archived_at), goal_id
+    except (AttributeError, ValueError):
+        return None
+
+@retry_db_op()
+def get_archive_page(older_than: str = None, newer_than: str = None, per_page: int = 10) -> tuple[list, str | None, str | None]:
+    """
+    One page of archived goals, newest first. Pass the `older` cursor of the previous result to
+    go back in time, or the `newer` one to come forward. Returns (goals, newer, older), where a
+    cursor is None when there is nothing further in that direction.
+    """
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    select = f"SELECT {_GOAL_SELECT}, archived_at, cold FROM archive"
+    newer_key = _decode_cursor(newer_than) if newer_than else None
+    older_key = _decode_cursor(older_than) if older_than else None
+    if newer_key:
+        res = cur.execute(f"{select} WHERE (archived_at, goal_id) > (?, ?) ORDER BY archived_at ASC, goal_id ASC LIMIT ?", (*newer_key, per_page + 1))
+        rows = res.fetchall()
+        has_newer, has_older = len(rows) > per_page, True
+        rows = list(reversed(rows[:per_page]))
+    else:
+        if older_key:
+            res = cur.execute(f"{select} WHERE (archived_at, goal_id) < (?, ?) ORDER BY archived_at DESC, goal_id DESC LIMIT ?", (*older_key, per_page + 1))
+        else:
+            res = cur.execute(f"{select} ORDER BY archived_at DESC, goal_id DESC LIMIT ?", (per_page + 1,))
+        rows = res.fetchall()
+        has_newer, has_older = older_key is not None, len(rows) > per_page
+        rows = rows[:per_page]
+
+    goals = [_tuple_to_goal_dict(row[:-2]) for row in rows]
+    _fill_cold_stubs(cur, [goal for goal, row in zip(goals, rows) if row[-1]])
+    con.close()
+    newer = _encode_cursor(rows[0][-2], rows[0][0]) if rows and has_newer else None
+    older = _encode_cursor(rows[-1][-2], rows[-1][0]) if rows and has_older else None
+    return goals, newer, older
+
+# --- NEW: Archive Full-Text Search ---
+# Column weights for bm25(): goal text counts most, then step prompts, the summary and outputs.
+SEARCH_WEIGHTS = (0.0, 10.0, 4.0, 1.0, 2.0)  # goal_id (unindexed), goal, steps, outputs, summary
+SEARCH_SNIPPET_TOKENS = 24
+
+class SearchHit(NamedTuple):
+    """One ranked archive search result; `snippet` has matches wrapped in the highlight markers."""
+    goal_id: str
+    goal: str
+    status: str
+    archived_at: float | None
+    score: float
+    snippet: str
+
+def _fts_query(text: str) -> str:
+    """Turns free text into an FTS5 query that matches all terms (no operator syntax from the user)."""
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " ".join(f'"{term}"' for term in terms)
+
+@retry_db_op()
+def search_archive(query: str, limit: int = 20, offset: int = 0, highlight: tuple = ('[', ']'), raw: bool = False) -> list[SearchHit]:
+    """
+    Ranked full-text search over archived goals, step prompts, outputs and execution logs.
+    `raw=True` passes the query through as FTS5 syntax (phrases, OR, NEAR, prefix*).
+    """
+    match = query if raw else _fts_query(query)
+    if not match:
+        return []
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    weights = ", ".join(str(w) for w in SEARCH_WEIGHTS)
+    res = cur.execute(f'''
+        SELECT a.goal_id, a.goal, a.status, a.archived_at, bm25(archive_fts, {weights}) AS score,
+               snippet(archive_fts, -1, ?, ?, '…', ?)
+        FROM archive_fts JOIN archive a ON a.rowid = archive_fts.rowid
+        WHERE archive_fts MATCH ?
+        ORDER BY score LIMIT ? OFFSET ?
+    ''', (highlight[0], highlight[1], SEARCH_SNIPPET_TOKENS, match, limit, offset))
+    hits = [SearchHit(*row) for row in res.fetchall()]
+    con.close()
+    return hits
+
 @retry_db_op()
 def get_active_goals() -> list:
     con = sqlite3.connect(DB_PATH, check_same_thread=False)
     cur = con.cursor()
-    res = cur.execute("SELECT * FROM goals WHERE status IN ('pending', 'in-progress', 'awaiting_input', 'paused', 'awaiting_tier_decision', 'awaiting_replan') ORDER BY goal_id DESC")
+    res = cur.execute(f"SELECT {_GOAL_SELECT} FROM goals WHERE status IN ({','.join('?' * len(ACTIVE_STATUSES))}) ORDER BY goal_id DESC", ACTIVE_STATUSES)
     goals_list = [_tuple_to_goal_dict(t) for t in res.fetchall()]
     con.close()
     return goals_list
 
+# --- NEW: Projection Queries ---
+# For lists that only show goal text, status and progress (voice, chat context, CLI status,
+# dashboard archive preview): plan and execution_log are never fetched or parsed.
+_SUMMARY_SELECT = "goal_id, goal, status, preferred_tier, COALESCE(steps_total, 0), COALESCE(steps_complete, 0)"
+
+@retry_db_op()
+def get_active_goal_summaries() -> list[GoalSummary]:
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    res = cur.execute(f"SELECT {_SUMMARY_SELECT} FROM goals WHERE status IN ({','.join('?' * len(ACTIVE_STATUSES))}) ORDER BY goal_id DESC", ACTIVE_STATUSES)
+    summaries = [GoalSummary(*row) for row in res.fetchall()]
+    con.close()
+    return summaries
+
+@retry_db_op()
+def get_archived_goal_summaries(page: int = 1, per_page: int = 10) -> list[GoalSummary]:
+    offset = (page - 1) * per_page
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    res = cur.execute(f"SELECT {_SUMMARY_SELECT} FROM archive ORDER BY archived_at DESC, goal_id DESC LIMIT ? OFFSET ?", (per_page, offset))
+    summaries = [GoalSummary(*row) for row in res.fetchall()]
+    con.close()
+    return summaries
+
+@retry_db_op()
+def get_goal_status_counts() -> dict:
+    """Returns {'goals': {status: n}, 'archive': {status: n}} for metrics."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    counts = {}
+    for table in ('goals', 'archive'):
+        res = cur.execute(f"SELECT status, COUNT(*) FROM {table} GROUP BY status")
+        counts[table] = {status or 'unknown': n for status, n in res.fetchall()}
+    con.close()
+    return counts
+
 @retry_db_op()
 def get_archived_goal_count() -> int:
     con = sqlite3.connect(DB_PATH, check_same_thread=False)
     cur = con.cursor()
-    res = cur.execute("SELECT COUNT(*) FROM archive")
-    count = res.fetchone()[0]
+    res = cur.execute("SELECT row_count FROM row_counts WHERE table_name = 'archive'")
+    row = res.fetchone()
+    count = row[0] if row else 0
     con.close()
     return count
 
@@ -267,7 +1061,7 @@ def get_archived_goal_count() -> int:
 def get_goal_by_id(goal_id: str) -> dict | None:
     con = sqlite3.connect(DB_PATH, check_same_thread=False)
     cur = con.cursor()
-    res = cur.execute("SELECT * FROM goals WHERE goal_id = ?", (goal_id,))
+    res = cur.execute(f"SELECT {_GOAL_SELECT} FROM goals WHERE goal_id = ?", (goal_id,))
     goal_tuple = res.fetchone()
     con.close()
     return _tuple_to_goal_dict(goal_tuple)
@@ -276,17 +1070,258 @@ def get_goal_by_id(goal_id: str) -> dict | None:
 def archive_goal(goal_id: str):
     con = sqlite3.connect(DB_PATH, check_same_thread=False)
     cur = con.cursor()
-    res = cur.execute("SELECT * FROM goals WHERE goal_id = ?", (goal_id,))
-    goal_to_archive = res.fetchone()
-    if goal_to_archive:
-        # Ensure the tuple has the right number of elements (9)
-        if len(goal_to_archive) < 9:
-            goal_to_archive += (None,) * (9 - len(goal_to_archive))
-        cur.execute("INSERT OR REPLACE INTO archive VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", goal_to_archive)
+    columns = ", ".join(GOAL_COLUMNS)
+    # Delete + insert rather than INSERT OR REPLACE, so the row-count triggers see both sides
+    cur.execute("DELETE FROM archive WHERE goal_id = ? AND EXISTS (SELECT 1 FROM goals WHERE goal_id = ?)", (goal_id, goal_id))
+    cur.execute(f"INSERT INTO archive ({columns}, archived_at) SELECT {columns}, ? FROM goals WHERE goal_id = ?", (time.time(), goal_id))
+    if cur.rowcount:
+        # The FTS trigger has indexed the full outputs; large ones now move to output_blobs
+        plan_json = cur.execute("SELECT plan FROM archive WHERE goal_id = ?", (goal_id,)).fetchone()[0]
+        plan = serialization.loads(plan_json) if plan_json else None
+        if _externalize_outputs(cur, plan):
+            cur.execute("UPDATE archive SET plan = ? WHERE goal_id = ?", (serialization.dumps(plan), goal_id))
         cur.execute("DELETE FROM goals WHERE goal_id = ?", (goal_id,))
         con.commit()
     con.close()
 
+# --- NEW: Archive Cold Storage ---
+# Archived step outputs above ARCHIVE_INLINE_OUTPUT_CHARS are stored once (sha256-addressed,
+# zlib-compressed) in output_blobs; the plan keeps an `output_ref` and a short `output_preview`.
+# List views never touch the blobs; get_archived_goal() hydrates a single goal on demand.
+# compact_archive() (run from the orchestrator's idle ticks) converts rows archived before
+# this existed, moves goals older than ARCHIVE_COLD_AFTER_DAYS to a separate cold SQLite
+# file and drops blobs nothing references any more. A moved goal leaves a stub in `archive`
+# (cold = 1: identity, status, progress and timestamps, no plan or log), so it keeps its
+# place in paging, the row count and the full-text index, which has no update trigger and
+# still holds the text indexed at archive time. Readers fill stubs in from the cold file.
+ARCHIVE_INLINE_OUTPUT_CHARS = 1024
+ARCHIVE_OUTPUT_PREVIEW_CHARS = 300
+ARCHIVE_COLD_AFTER_DAYS = 90
+ARCHIVE_COMPACTION_BATCH = 200
+COLD_ARCHIVE_PATH = 'data/archive_cold.sqlite'
+COLD_VACUUM_FREE_FRACTION = 0.25  # The cold file is vacuumed only once this share of its pages is free
+_COLD_STUB_COLUMNS = ('plan', 'audit_critique', 'strategy_blueprint', 'execution_log')  # What a stub leaves out
+
+def _externalize_outputs(cur, plan) -> bool:
+    """Moves large step outputs of `plan` into output_blobs (in place). Returns True if any moved."""
+    if not isinstance(plan, list):
+        return False
+    changed = False
+    for step in plan:
+        output = step.get('output') if isinstance(step, dict) else None
+        if not isinstance(output, str) or len(output) <= ARCHIVE_INLINE_OUTPUT_CHARS:
+            continue
+        data = output.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        cur.execute("INSERT OR IGNORE INTO output_blobs (hash, codec, size, data) VALUES (?, 'zlib', ?, ?)",
+                    (digest, len(data), zlib.compress(data, 6)))
+        step['output'] = None
+        step['output_ref'] = digest
+        step['output_preview'] = output[:ARCHIVE_OUTPUT_PREVIEW_CHARS]
+        changed = True
+    return changed
+
+def _hydrate_outputs(cur, plan, blob_table: str = 'output_blobs'):
+    """Restores externalized step outputs of `plan` (in place)."""
+    if not isinstance(plan, list):
+        return
+    refs = {step['output_ref'] for step in plan if isinstance(step, dict) and step.get('output_ref')}
+    if not refs:
+        return
+    placeholders = ",".join("?" * len(refs))
+    blobs = dict(cur.execute(f"SELECT hash, data FROM {blob_table} WHERE hash IN ({placeholders})", tuple(refs)).fetchall())
+    for step in plan:
+        ref = step.get('output_ref') if isinstance(step, dict) else None
+        if ref and ref in blobs:
+            step['output'] = zlib.decompress(blobs[ref]).decode('utf-8')
+            step.pop('output_preview', None)
+
+@retry_db_op()
+def get_archived_goal(goal_id: str) -> dict | None:
+    """One archived goal with its full step outputs (read from the cold file if it has been moved)."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+    row = cur.execute(f"SELECT {_GOAL_SELECT}, cold FROM archive WHERE goal_id = ?", (goal_id,)).fetchone()
+    blob_table = 'output_blobs'
+    if row and row[-1] and os.path.exists(COLD_ARCHIVE_PATH):
+        cur.execute("ATTACH DATABASE ? AS cold", (COLD_ARCHIVE_PATH,))
+        row = cur.execute(f"SELECT {_GOAL_SELECT}, 1 FROM cold.archive WHERE goal_id = ?", (goal_id,)).fetchone() or row
+        blob_table = 'cold.output_blobs'
+    goal = _tuple_to_goal_dict(row[:-1] if row else None)
+    if goal:
+        _hydrate_outputs(cur, goal['plan'], blob_table)
+    con.close()
+    return goal
+
+def _fill_cold_stubs(cur, goals: list):
+    """Restores the plan, critique, blueprint and log of stub goals (in place) from the cold file."""
+    if not goals or not os.path.exists(COLD_ARCHIVE_PATH):
+        return
+    placeholders = ",".join("?" * len(goals))
+    cur.execute("ATTACH DATABASE ? AS cold", (COLD_ARCHIVE_PATH,))
+    try:
+        res = cur.execute(f"SELECT {_GOAL_SELECT} FROM cold.archive WHERE goal_id IN ({placeholders})",
+                          [goal['goal_id'] for goal in goals])
+        full = {row[0]: _tuple_to_goal_dict(row) for row in res.fetchall()}
+    finally:
+        cur.execute("DETACH DATABASE cold")
+    for goal in goals:
+        if goal['goal_id'] in full:
+            goal.update({key: full[goal['goal_id']][key] for key in _COLD_STUB_COLUMNS})
+
+def _create_cold_schema(cur):
+    cur.execute(f'''
+        CREATE TABLE IF NOT EXISTS cold.archive (
+            goal_id TEXT PRIMARY KEY, {", ".join(GOAL_COLUMNS[1:])}, archived_at REAL
+        )
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS cold.idx_cold_archived ON archive(archived_at)")
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS cold.output_blobs (
+            hash TEXT PRIMARY KEY, codec TEXT NOT NULL, size INTEGER NOT NULL, data BLOB NOT NULL
+        )
+    ''')
+
+_REFERENCED_BLOBS_SQL = '''
+    SELECT json_extract(s.value, '$.output_ref') FROM {archive} a, json_each(a.plan) s
+    WHERE json_valid(a.plan) AND json_extract(s.value, '$.output_ref') IS NOT NULL {condition}
+'''
+
+@retry_db_op()
+def compact_archive(cold_after_days: float = ARCHIVE_COLD_AFTER_DAYS, batch: int = ARCHIVE_COMPACTION_BATCH) -> dict:
+    """
+    One bounded pass of archive housekeeping. Returns counts of
+    {'externalized', 'moved_cold', 'blobs_removed'}.
+    """
+    stats = {'externalized': 0, 'moved_cold': 0, 'blobs_removed': 0}
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    cur = con.cursor()
+
+    # 1. Rows archived before output_blobs existed still carry large inline outputs
+    rows = cur.execute('''
+        SELECT goal_id, plan FROM archive a
+        WHERE json_valid(a.plan) AND EXISTS (
+            SELECT 1 FROM json_each(a.plan) s WHERE length(json_extract(s.value, '$.output')) > ?
+        ) LIMIT ?
+    ''', (ARCHIVE_INLINE_OUTPUT_CHARS, batch)).fetchall()
+    for goal_id, plan_json in rows:
+        plan = serialization.loads(plan_json)
+        if _externalize_outputs(cur, plan):
+            cur.execute("UPDATE archive SET plan = ? WHERE goal_id = ?", (serialization.dumps(plan), goal_id))
+            stats['externalized'] += 1
+    con.commit()
+
+    # 2. Old goals move to the cold file (copy, commit, then strip to a stub: safe to re-run after a crash)
+    cutoff = time.time() - cold_after_days * 86400
+    old_ids = [row[0] for row in cur.execute(
+        "SELECT goal_id FROM archive WHERE archived_at < ? AND cold = 0 ORDER BY archived_at LIMIT ?", (cutoff, batch)
+    ).fetchall()]
+    if old_ids:
+        placeholders = ",".join("?" * len(old_ids))
+        columns = ", ".join(GOAL_COLUMNS) + ", archived_at"
+        cur.execute("ATTACH DATABASE ? AS cold", (COLD_ARCHIVE_PATH,))
+        _create_cold_schema(cur)
+        cur.execute(f"INSERT OR REPLACE INTO cold.archive ({columns}) SELECT {columns} FROM main.archive WHERE goal_id IN ({placeholders})", old_ids)
+        referenced = _REFERENCED_BLOBS_SQL.format(archive='main.archive', condition=f"AND a.goal_id IN ({placeholders})")
+        cur.execute(f"INSERT OR IGNORE INTO cold.output_blobs SELECT * FROM main.output_blobs WHERE hash IN ({referenced})", old_ids)
+        con.commit()
+        stripped = ", ".join(f"{column} = NULL" for column in _COLD_STUB_COLUMNS if column != 'plan')
+        cur.execute(f"UPDATE main.archive SET plan = '[]', {stripped}, cold = 1 WHERE goal_id IN ({placeholders})", old_ids)
+        con.commit()
+        # Rows are only ever added here, so the file rarely has free pages; rewrite it only when it does
+        free_pages = cur.execute("PRAGMA cold.freelist_count").fetchone()[0]
+        if free_pages > cur.execute("PRAGMA cold.page_count").fetchone()[0] * COLD_VACUUM_FREE_FRACTION:
+            cur.execute("VACUUM cold")
+        cur.execute("DETACH DATABASE cold")
+        stats['moved_cold'] = len(old_ids)
+
+    # 3. Blobs no hot goal references (moved to cold, or their goal was re-archived)
+    if stats['externalized'] or stats['moved_cold']:
+        referenced = _REFERENCED_BLOBS_SQL.format(archive='archive', condition="")
+        cur.execute(f"DELETE FROM output_blobs WHERE hash NOT IN ({referenced})")
+        stats['blobs_removed'] = cur.rowcount
+        con.commit()
+    con.close()
+    return stats
+
+# --- NEW: Database Maintenance ---
+# Run by the orchestrator on idle ticks. Every task is bounded so a pass never holds the
+# write lock for long: checkpoints never wait on writers (TRUNCATE only waits out readers,
+# up to the busy timeout), and the vacuum frees a fixed number of pages per pass.
+DB_WAL_TRUNCATE_BYTES = 32 * 1024 * 1024  # A WAL larger than this is reset to zero after checkpointing
+DB_VACUUM_PAGES_PER_RUN = 2000
+DB_OPTIMIZE_ANALYSIS_LIMIT = 400  # Rows sampled per index by PRAGMA optimize's ANALYZE
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+metrics.DB_FILE_BYTES.set_function(lambda: _file_size(DB_PATH), file='main')
+metrics.DB_FILE_BYTES.set_function(lambda: _file_size(DB_PATH + '-wal'), file='wal')
+
+def _timed_task(durations: dict, task: str, func):
+    start = time.perf_counter()
+    try:
+        return func()
+    finally:
+        durations[task] = time.perf_counter() - start
+        metrics.DB_MAINTENANCE_SECONDS.observe(durations[task], task=task)
+
+@retry_db_op()
+def run_db_maintenance(integrity_check: bool = False) -> dict:
+    """
+    One maintenance pass: WAL checkpoint (truncating an oversized WAL), pruning of expired
+    llm_usage rows, incremental vacuum, PRAGMA optimize and, if requested, a full integrity check. Returns a report with the
+    per-task durations in seconds.
+    """
+    report = {'durations': {}}
+    durations = report['durations']
+    con = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    cur = con.cursor()
+
+    # 1. Checkpoint: copy committed pages into the main file; reset the WAL if it has grown
+    report['wal_bytes_before'] = _file_size(DB_PATH + '-wal')
+    busy, wal_pages, checkpointed = _timed_task(durations, 'checkpoint_passive',
+                                                lambda: cur.execute("PRAGMA wal_checkpoint(PASSIVE);").fetchone())
+    if report['wal_bytes_before'] > DB_WAL_TRUNCATE_BYTES:
+        busy, wal_pages, checkpointed = _timed_task(durations, 'checkpoint_truncate',
+                                                    lambda: cur.execute("PRAGMA wal_checkpoint(TRUNCATE);").fetchone())
+    report['checkpoint_busy'] = bool(busy)
+    report['wal_pages_pending'] = max(wal_pages - checkpointed, 0)
+    report['wal_bytes_after'] = _file_size(DB_PATH + '-wal')
+
+    # 2. Drop raw usage rows past retention (the daily rollup keeps their totals)
+    report['usage_rows_pruned'] = _timed_task(durations, 'prune_usage', lambda: cur.execute(
+        "DELETE FROM llm_usage WHERE timestamp < ?", (time.time() - USAGE_RETENTION_DAYS * 86400,)).rowcount)
+
+    # 3. Incremental vacuum: give back free pages left by deletes (rate_limits and usage pruning, archiving).
+    # Only in incremental auto-vacuum mode; otherwise the free pages are reused by later writes.
+    freelist_before = cur.execute("PRAGMA freelist_count;").fetchone()[0]
+    if freelist_before and cur.execute("PRAGMA auto_vacuum;").fetchone()[0] == 2:
+        # executescript steps the pragma to completion (execute() would free a single page)
+        _timed_task(durations, 'incremental_vacuum',
+                    lambda: cur.executescript(f"PRAGMA incremental_vacuum({DB_VACUUM_PAGES_PER_RUN});"))
+    freelist_after = cur.execute("PRAGMA freelist_count;").fetchone()[0]
+    report['pages_freed'] = freelist_before - freelist_after
+    metrics.DB_FREELIST_PAGES.set(freelist_after)
+
+    # 4. Refresh query planner statistics where they are stale
+    cur.execute(f"PRAGMA analysis_limit={DB_OPTIMIZE_ANALYSIS_LIMIT};")
+    _timed_task(durations, 'optimize', lambda: cur.execute("PRAGMA optimize;").fetchall())
+
+    # 5. Integrity check (reads every page; the caller runs it rarely)
+    if integrity_check:
+        problems = [row[0] for row in _timed_task(durations, 'integrity_check',
+                                                  lambda: cur.execute("PRAGMA integrity_check;").fetchall())]
+        report['integrity'] = 'ok' if problems == ['ok'] else problems
+        metrics.DB_INTEGRITY_OK.set(1 if problems == ['ok'] else 0)
+        if problems != ['ok']:
+            logger.error(f"DB INTEGRITY CHECK FAILED: {problems[:10]}")
+    con.close()
+    return report
+
 @retry_db_op()
 def update_goal_status(goal_id: str, status: str):
     con = sqlite3.connect(DB_PATH, check_same_thread=False)
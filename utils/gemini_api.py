@@ -1,33 +1,58 @@
 import os
 import re
 import time
-from google import genai
+import concurrent.futures
 from google.genai import types
 from google.genai import errors as genai_errors
 from dotenv import load_dotenv
 from .rate_limiter import RateLimitTracker
+from .request_scheduler import RequestScheduler
+from .tier_policy import TierPolicy
+from .circuit_breaker import get_breaker, get_all_breakers, jittered_backoff
+from .call_context import call_context, get_call_context
+from .cancellation import CancellationToken
+from .gemini_backends import create_genai_client
+from .database import record_llm_usage, get_usage_rollup, get_usage_by_goal
 from .logger import logger
+from . import tracing
+from . import metrics
+
+# Approximate USD list prices per 1M tokens, for the usage report only.
+# Thinking tokens are billed as output; cached prompt tokens at the cached rate.
+TOKEN_PRICES_PER_MILLION = {
+    'tier1': {'input': 1.25, 'cached': 0.31, 'output': 10.00},
+    'tier2': {'input': 0.30, 'cached': 0.075, 'output': 2.50},
+}
 
 class GeminiClient:
     """A robust client for a modern Google GenAI SDK, with structured output support."""
     
-    def __init__(self, rate_limiter: RateLimitTracker):
-        """Initializes the Gemini client."""
+    def __init__(self, rate_limiter: RateLimitTracker, scheduler: RequestScheduler = None, backend: str = None):
+        """
+        Initializes the Gemini client.
+        `backend` ('live', 'fake', 'record', 'replay') defaults to COGNITO_GEMINI_BACKEND.
+        """
+        self.rate_limiter = rate_limiter 
+        self.scheduler = scheduler or RequestScheduler(rate_limiter)
+        self.tier_policy = TierPolicy()
+        # Hedged duplicates run on this pool; a losing request is left to finish in the background.
+        self._hedge_pool = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="gemini_hedge")
+
         try:
             load_dotenv()
-            self.client = genai.Client()
+            self.client = create_genai_client(backend)
             logger.info("Gemini API configured successfully using genai.Client.")
         except Exception as e:
             logger.fatal(f"Failed to configure Gemini API: {e}")
             self.client = None
             return
 
-        self.rate_limiter = rate_limiter 
-
         self.model_map = {
             'tier1': 'gemini-2.5-pro',
             'tier2': 'gemini-2.5-flash',
         }
+        for tier in self.model_map:
+            get_breaker(tier)
         
         self.grounding_tool = types.Tool(
             google_search=types.GoogleSearch()
@@ -39,6 +64,7 @@ class GeminiClient:
             google_maps=types.GoogleMaps()
         )
 
+    @tracing.traced('ask_gemini')
     def ask_gemini(self, 
                    prompt: str | list,
                    tier: str, 
@@ -48,13 +74,22 @@ class GeminiClient:
                    enable_code_execution: bool = False,
                    enable_maps: bool = False,
                    response_schema=None, 
-                   system_instruction: str = None
+                   system_instruction: str = None,
+                   caller: str = None,
+                   cancel_token: CancellationToken = None
                    ) -> types.GenerateContentResponse | None | str:
         """
         Sends a prompt to the specified Gemini model tier.
         - Supports search, structured output, and intelligent rate limit handling.
+        - `caller` tags the call (e.g. 'planner', 'chat') for the RequestScheduler's priority classes.
+        - `cancel_token` (default: the call context's) is checked before a slot is taken;
+          a cancelled call raises Cancelled instead of queueing.
         - Returns the full response object, a RATE_LIMIT_HIT string, or None.
         """
+        cancel_token = cancel_token or get_call_context().get('cancel_token')
+        if cancel_token is not None:
+            cancel_token.check()
+
         if not self.client:
             logger.error("Gemini client not initialized.")
             return None
@@ -63,14 +98,20 @@ class GeminiClient:
             logger.error(f"Invalid tier '{tier}'.")
             return None
 
-        # This is our *internal* (minute) rate limiter
-        if not self.rate_limiter.check_and_increment(tier):
+        # This is our *internal* rate limiter, fronted by the priority scheduler
+        priority = self.scheduler.classify(caller)
+        policy = self.tier_policy.resolve(priority)
+        with call_context(cancel_token=cancel_token):
+            admitted_tier, path = self._admit(tier, caller, policy)
+        if not admitted_tier:
+            if cancel_token is not None:
+                cancel_token.check()  # Gave up queueing because the work was cancelled
             logger.warning(f"API call to {tier} blocked by internal rate limiter (minute).")
             return "RATE_LIMIT_HIT" # Signal for a short retry
+        tier = admitted_tier
+        tracing.set_attributes(**{'llm.tier': tier, 'llm.model': self.model_map[tier], 'llm.priority': priority, 'llm.path': path})
 
         try:
-            model_name = self.model_map[tier]
-            
             # 1. Prepare the tools list
             final_tools_list = tools if tools else []
             if enable_search:
@@ -112,12 +153,29 @@ class GeminiClient:
                 )
 
             # 4. Make the API call
-            response = self.client.models.generate_content(
-                model=model_name,
-                contents=prompt,
-                config=final_config_object,
-            )
-            
+            try:
+                response, hedged = self._generate(tier, prompt, final_config_object, caller, policy)
+            except genai_errors.ServerError as e:
+                # 503 on tier1: retry once on the fallback tier instead of stalling the goal.
+                fallback_tier = self.tier_policy.fallback_tier(tier, policy)
+                if not fallback_tier or not get_breaker(fallback_tier).allow_request():
+                    raise
+                if not self.scheduler.acquire(fallback_tier, caller):
+                    get_breaker(fallback_tier).release_probe()
+                    raise
+                logger.warning(f"Google API Server Error (503) on {tier}. Falling back to {fallback_tier}: {e.message}")
+                tier, path = fallback_tier, 'fallback_503'
+                response, hedged = self._generate(tier, prompt, final_config_object, caller, policy)
+
+            self.tier_policy.record(priority, 'hedge' if hedged else path)
+            usage = getattr(response, 'usage_metadata', None)
+            tracing.set_attributes(**{
+                'llm.tier': tier, 'llm.model': self.model_map[tier], 'llm.path': 'hedge' if hedged else path,
+                'llm.prompt_tokens': usage.prompt_token_count if usage else None,
+                'llm.candidates_tokens': usage.candidates_token_count if usage else None,
+                'llm.thinking_tokens': usage.thoughts_token_count if usage else None,
+                'llm.total_tokens': usage.total_token_count if usage else None,
+            })
             return response
             
         # We now catch *both* 429 and 503 errors and just return None.
@@ -134,4 +192,169 @@ class GeminiClient:
             return "RATE_LIMIT_HIT"
             
         except Exception as e:
-             logger.error(f"Unexpected error during Gemini API call for tier {tier}: {e}", exc_info=True)
\ No newline at end of file
+             get_breaker(tier).release_probe()  # e.g. a bad config raised before the admitted call was made
+             logger.error(f"Unexpected error during Gemini API call for tier {tier}: {e}", exc_info=True)
+
+    def _record_upstream_failure(self, tier: str, error: genai_errors.APIError):
+        open_seconds = get_breaker(tier).record_failure(f"{error.code}: {error.message}")
+        if open_seconds:
+            logger.warning(f"CIRCUIT OPEN: {tier} after repeated upstream errors. Failing fast for {open_seconds:.1f}s.")
+
+    def circuit_retry_after(self, tier: str) -> float:
+        """Seconds until calls to this tier may be attempted again (0 if its circuit is not open)."""
+        return get_breaker(tier).retry_after()
+
+    def get_retry_delay(self, tier: str, attempt: int) -> float:
+        """How long a caller should sleep before retrying after RATE_LIMIT_HIT/None."""
+        return max(self.circuit_retry_after(tier), jittered_backoff(attempt))
+
+    def get_circuit_status(self) -> dict:
+        return get_all_breakers()
+
+    # --- Token Accounting ---
+    def _record_usage(self, tier: str, caller: str, response):
+        """Stores the response's token counts, tagged with the caller and goal/step from the call context."""
+        usage = getattr(response, 'usage_metadata', None)
+        if not usage:
+            return
+        try:
+            context = get_call_context()
+            total = usage.total_token_count or 0
+            record_llm_usage(
+                tier, caller or context.get('caller'), self.scheduler.classify(caller),
+                context.get('goal_id'), context.get('step_id'),
+                usage.prompt_token_count or 0, usage.candidates_token_count or 0,
+                usage.cached_content_token_count or 0, usage.thoughts_token_count or 0, total
+            )
+            self.scheduler.record_tokens(tier, total)
+            caller_label = caller or context.get('caller') or 'unknown'
+            for kind, count in (('prompt', usage.prompt_token_count), ('candidates', usage.candidates_token_count),
+                                ('cached', usage.cached_content_token_count), ('thinking', usage.thoughts_token_count)):
+                if count:
+                    metrics.LLM_TOKENS.inc(count, tier=tier, caller=caller_label, kind=kind)
+        except Exception as e:
+            logger.error(f"Failed to record token usage: {e}")
+
+    @staticmethod
+    def estimate_cost(tier: str, row: dict) -> float:
+        prices = TOKEN_PRICES_PER_MILLION.get(tier)
+        if not prices:
+            return 0.0
+        cached = row.get('cached_tokens') or 0
+        fresh_input = max((row.get('prompt_tokens') or 0) - cached, 0)
+        output = (row.get('candidates_tokens') or 0) + (row.get('thinking_tokens') or 0)
+        return (fresh_input * prices['input'] + cached * prices['cached'] + output * prices['output']) / 1_000_000
+
+    def get_usage_report(self, days: int = 7) -> dict:
+        """Daily token rollups by tier and caller (with estimated cost), plus the heaviest recent goals."""
+        rows = get_usage_rollup(days) or []
+        by_caller = {}
+        for row in rows:
+            row['estimated_cost_usd'] = round(self.estimate_cost(row['tier'], row), 6)
+            totals = by_caller.setdefault(row['caller'], {'calls': 0, 'total_tokens': 0, 'estimated_cost_usd': 0.0})
+            totals['calls'] += row['calls']
+            totals['total_tokens'] += row['total_tokens']
+            totals['estimated_cost_usd'] = round(totals['estimated_cost_usd'] + row['estimated_cost_usd'], 6)
+        return {
+            'days': days,
+            'by_caller': by_caller,
+            'daily': rows,
+            'top_goals_24h': get_usage_by_goal(time.time() - 86400) or [],
+        }
+
+    def _admit(self, tier: str, caller: str, policy: dict) -> tuple[str | None, str]:
+        """
+        Acquires a rate-limit slot. If the policy allows it, waits at most `fallback_after`
+        seconds for the requested tier before trying the fallback tier.
+        Returns (admitted tier or None, path).
+        """
+        fallback_tier = self.tier_policy.fallback_tier(tier, policy)
+
+        # An open circuit fails fast without consuming a rate-limit slot.
+        if get_breaker(tier).allow_request():
+            max_wait = policy['fallback_after'] if fallback_tier else None
+            if self.scheduler.acquire(tier, caller, max_wait=max_wait):
+                return tier, 'primary'
+            get_breaker(tier).release_probe()
+            path = 'fallback_rate_limit'
+        else:
+            logger.debug(f"Circuit for {tier} is open. Failing fast.")
+            metrics.RATE_LIMIT_BLOCKS.inc(tier=tier, priority=self.scheduler.classify(caller), reason='circuit_open')
+            path = 'fallback_circuit'
+
+        if fallback_tier and get_breaker(fallback_tier).allow_request():
+            if self.scheduler.acquire(fallback_tier, caller):
+                logger.warning(f"{tier} unavailable ({path}). Falling back to {fallback_tier}.")
+                return fallback_tier, path
+            get_breaker(fallback_tier).release_probe()
+        return None, 'primary'
+
+    def _generate(self, tier: str, prompt, config, caller: str, policy: dict) -> tuple[types.GenerateContentResponse, bool]:
+        """
+        Performs the API call, hedging it when the policy asks for it.
+        Returns (response, True if the hedged duplicate answered first).
+        """
+        # Hedged calls run on pool threads; carry the caller's tags over for the backend.
+        tags = {**get_call_context(), 'caller': caller or get_call_context().get('caller'), 'tier': tier}
+
+        caller_label = tags['caller'] or 'unknown'
+
+        def call():
+            start = time.time()
+            breaker = get_breaker(tier)
+            outcome = 'error'
+            try:
+                with call_context(**tags), tracing.span('gemini.generate_content', **{'llm.tier': tier, 'llm.model': self.model_map[tier]}):
+                    response = self.client.models.generate_content(
+                        model=self.model_map[tier],
+                        contents=prompt,
+                        config=config,
+                    )
+                outcome = 'ok'
+            except genai_errors.ServerError as e:
+                outcome = 'error_503'
+                self._record_upstream_failure(tier, e)
+                raise
+            except genai_errors.ClientError as e:
+                if e.code == 429:
+                    outcome = 'error_429'
+                    self._record_upstream_failure(tier, e)
+                raise
+            finally:
+                if outcome == 'error':
+                    # No verdict on the upstream (a 4xx, network error, cancellation, a bug):
+                    # give a half-open probe back rather than stall the tier for PROBE_TIMEOUT_SECONDS.
+                    breaker.release_probe()
+                metrics.LLM_REQUEST_SECONDS.observe(time.time() - start, tier=tier, caller=caller_label)
+                metrics.LLM_REQUESTS.inc(tier=tier, caller=caller_label, outcome=outcome)
+            breaker.record_success()
+            self.tier_policy.latency.record(tier, time.time() - start)
+            with call_context(**tags):
+                self._record_usage(tier, caller, response)
+            return response
+
+        hedge_delay = self.tier_policy.hedge_delay(tier, policy)
+        if hedge_delay is None:
+            return call(), False
+
+        call = tracing.propagate(call)
+        primary = self._hedge_pool.submit(call)
+        try:
+            return primary.result(timeout=hedge_delay), False
+        except concurrent.futures.TimeoutError:
+            pass
+
+        # The duplicate costs a real slot, so only hedge if one is free right now.
+        if not self.scheduler.acquire(tier, caller, max_wait=0):
+            return primary.result(), False
+
+        logger.info(f"Hedging slow {tier} call after {hedge_delay:.1f}s.")
+        hedge = self._hedge_pool.submit(call)
+        done, _ = concurrent.futures.wait([primary, hedge], return_when=concurrent.futures.FIRST_COMPLETED)
+        winner = primary if primary in done else hedge
+        try:
+            return winner.result(), winner is hedge
+        except Exception:
+            # The first to finish failed; fall back to the other request.
+            other = hedge if winner is primary else primary
+            return other.result(), other is hedge
\ No newline at end of file
@@ -0,0 +1,353 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+from google import genai
+from google.genai import types
+from google.genai import errors as genai_errors
+from .call_context import get_call_context
+from .logger import logger
+
+# --- Backend Selection ---
+# live:   the real Gemini API (default)
+# fake:   scripted responses from COGNITO_GEMINI_SCRIPT (or the built-in default reply)
+# record: the real API, with every call appended to COGNITO_GEMINI_REPLAY_FILE
+# replay: answers served from COGNITO_GEMINI_REPLAY_FILE, no network access
+GEMINI_BACKEND = os.getenv("COGNITO_GEMINI_BACKEND", "live")
+GEMINI_SCRIPT_FILE = os.getenv("COGNITO_GEMINI_SCRIPT")
+GEMINI_REPLAY_FILE = os.getenv("COGNITO_GEMINI_REPLAY_FILE", "data/gemini_replay.jsonl")
+FAKE_SEED = os.getenv("COGNITO_FAKE_SEED")
+
+DEFAULT_FAKE_LATENCY = {"dist": "lognormal", "median": 0.05, "sigma": 0.5}
+DEFAULT_FAKE_REPLY = "OK"
+
+def create_genai_client(backend: str = None):
+    """
+    Returns an object exposing `.models.generate_content(model, contents, config)` for
+    the configured backend. GeminiClient only ever talks to this interface.
+    """
+    backend = (backend or GEMINI_BACKEND).lower()
+    if backend == "fake":
+        logger.info(f"Using FAKE Gemini backend (script: {GEMINI_SCRIPT_FILE or 'built-in default'}).")
+        return FakeGeminiClient(script=GEMINI_SCRIPT_FILE, seed=FAKE_SEED)
+    if backend == "replay":
+        logger.info(f"Using REPLAY Gemini backend ({GEMINI_REPLAY_FILE}).")
+        return ReplayClient(GEMINI_REPLAY_FILE)
+    if backend == "record":
+        logger.info(f"Recording live Gemini calls to {GEMINI_REPLAY_FILE}.")
+        return RecordingClient(genai.Client(), GEMINI_REPLAY_FILE)
+    if backend != "live":
+        logger.warning(f"Unknown Gemini backend '{backend}'. Using the live API.")
+    return genai.Client()
+
+# --- Request Helpers ---
+
+def prompt_text(contents) -> str:
+    """Flattens str / Content / list-of-either prompts into plain text for matching."""
+    if contents is None: return ""
+    if isinstance(contents, str): return contents
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(prompt_text(c) for c in contents)
+    if isinstance(contents, dict):
+        return "\n".join(prompt_text(p) for p in contents.get("parts", []))
+    if isinstance(contents, types.Content):
+        return "\n".join(prompt_text(p) for p in (contents.parts or []))
+    if isinstance(contents, types.Part):
+        if contents.text: return contents.text
+        if contents.function_call: return f"function_call:{contents.function_call.name}"
+        if contents.function_response: return json.dumps(contents.function_response.response, default=str)
+        return ""
+    return str(contents)
+
+def schema_name(config) -> str | None:
+    schema = getattr(config, "response_schema", None) if config else None
+    if schema is None: return None
+    return getattr(schema, "__name__", None) or "json"
+
+def tool_names(config) -> list:
+    """Names of the tools offered to the model ('google_search', 'code_execution', function names...)."""
+    names = []
+    for tool in (getattr(config, "tools", None) or []) if config else []:
+        if getattr(tool, "google_search", None): names.append("google_search")
+        if getattr(tool, "code_execution", None): names.append("code_execution")
+        if getattr(tool, "google_maps", None): names.append("google_maps")
+        for declaration in getattr(tool, "function_declarations", None) or []:
+            names.append(declaration.name)
+    return names
+
+def request_key(model: str, contents, config) -> str:
+    """Stable fingerprint of a request, used to match recordings on replay."""
+    raw = json.dumps([model, prompt_text(contents), schema_name(config), tool_names(config)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text or "") / 4))
+
+def attach_parsed(response: types.GenerateContentResponse, config) -> types.GenerateContentResponse:
+    """Mirrors the SDK: populate `.parsed` from the JSON text when a response_schema was requested."""
+    schema = getattr(config, "response_schema", None) if config else None
+    if schema is None or response.parsed is not None: return response
+    try:
+        if hasattr(schema, "model_validate_json"):
+            response.parsed = schema.model_validate_json(response.text or "")
+        else:
+            response.parsed = json.loads(response.text or "")
+    except Exception:
+        response.parsed = None  # Same as the SDK when the model's JSON does not validate
+    return response
+
+def build_response(spec: dict, contents=None, model: str = None) -> types.GenerateContentResponse:
+    """
+    Builds a real GenerateContentResponse from a compact spec:
+      {"text": str} | {"json": obj} | {"function_call": {"name", "args"}} |
+      {"code_execution_result": str}, plus optional
+      "grounding": {"chunks": [{"uri", "title"}], "supports": [{"end_index", "chunk_indices"}]}
+    """
+    parts = []
+    text = spec.get("text")
+    if "json" in spec:
+        text = json.dumps(spec["json"])
+    if spec.get("function_call"):
+        fc = spec["function_call"]
+        parts.append({"function_call": {"name": fc["name"], "args": fc.get("args", {})}})
+    if spec.get("code_execution_result") is not None:
+        parts.append({"code_execution_result": {"outcome": "OUTCOME_OK", "output": spec["code_execution_result"]}})
+    if text is not None or not parts:
+        parts.append({"text": text if text is not None else DEFAULT_FAKE_REPLY})
+
+    candidate = {"content": {"role": "model", "parts": parts}, "finish_reason": "STOP"}
+    grounding = spec.get("grounding")
+    if grounding:
+        candidate["grounding_metadata"] = {
+            "grounding_chunks": [{"web": {"uri": c["uri"], "title": c.get("title", c["uri"])}} for c in grounding.get("chunks", [])],
+            "grounding_supports": [
+                {"segment": {"end_index": s.get("end_index", len(text or ""))}, "grounding_chunk_indices": s.get("chunk_indices", [0])}
+                for s in grounding.get("supports", [])
+            ],
+        }
+
+    prompt_tokens = _estimate_tokens(prompt_text(contents))
+    output_tokens = _estimate_tokens(text or json.dumps(parts))
+    return types.GenerateContentResponse.model_validate({
+        "candidates": [candidate],
+        "model_version": model,
+        "usage_metadata": {
+            "prompt_token_count": prompt_tokens,
+            "candidates_token_count": output_tokens,
+            "total_token_count": prompt_tokens + output_tokens,
+        },
+    })
+
+def make_api_error(code: int, message: str = None) -> genai_errors.APIError:
+    """The same exception types the SDK raises, so retry/circuit logic sees real errors."""
+    status = {429: "RESOURCE_EXHAUSTED", 503: "UNAVAILABLE"}.get(code, "ERROR")
+    body = {"error": {"code": code, "message": message or f"Injected {code} from fake backend", "status": status}}
+    return (genai_errors.ServerError if code >= 500 else genai_errors.ClientError)(code, body)
+
+class FakeRequest:
+    """What a scripted rule or handler sees for one generate_content call."""
+
+    def __init__(self, model: str, contents, config):
+        context = get_call_context()
+        self.model = model
+        self.contents = contents
+        self.config = config
+        self.text = prompt_text(contents)
+        self.schema = schema_name(config)
+        self.tools = tool_names(config)
+        self.caller = context.get("caller")
+        self.goal_id = context.get("goal_id")
+
+class _Models:
+    """The `client.models` namespace, forwarding to the owning backend."""
+
+    def __init__(self, owner):
+        self._owner = owner
+
+    def generate_content(self, model: str, contents, config=None):
+        return self._owner.generate_content(model, contents, config)
+
+# --- Fake Backend ---
+
+class FakeGeminiClient:
+    """
+    Offline stand-in for genai.Client.
+
+    Responses come from rules, checked in order; the first whose `match` fits answers:
+        {"match": {"caller": "planner", "schema": "StrategyBlueprint", "model": "gemini-2.5-flash",
+                   "tool": "google_search", "prompt_regex": "..."},
+         "responses": [<spec>, ...],      # served in turn; the last one repeats
+         "handler": callable,             # Python only: handler(FakeRequest) -> spec or response
+         "latency": {"dist": "fixed"|"uniform"|"lognormal", ...},
+         "errors": {"429": 0.05, "503": 0.02}}
+    A script file is JSON: {"latency": ..., "errors": ..., "rules": [...]}, where the
+    top-level latency/errors are defaults for every rule.
+    """
+
+    def __init__(self, script: str | dict = None, seed=None):
+        if isinstance(script, str):
+            with open(script, "r", encoding="utf-8") as f:
+                script = json.load(f)
+        script = script or {}
+        self.default_latency = script.get("latency", DEFAULT_FAKE_LATENCY)
+        self.default_errors = script.get("errors", {})
+        self.rules = []
+        for rule in script.get("rules", []):
+            self.add_rule(**rule)
+        self.models = _Models(self)
+        self._rng = random.Random(int(seed) if seed is not None else None)
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "errors": {}, "by_caller": {}}
+
+    def add_rule(self, match: dict = None, responses: list = None, response: dict = None,
+                 handler=None, latency: dict = None, errors: dict = None):
+        """Appends a rule. Rules added later are checked after earlier ones."""
+        self.rules.append({
+            "match": match or {},
+            "responses": responses or ([response] if response else []),
+            "handler": handler,
+            "latency": latency,
+            "errors": errors,
+            "served": 0,
+        })
+
+    @staticmethod
+    def _matches(rule: dict, request: FakeRequest) -> bool:
+        match = rule["match"]
+        if "caller" in match and match["caller"] != request.caller: return False
+        if "schema" in match and match["schema"] != request.schema: return False
+        if "model" in match and match["model"] != request.model: return False
+        if "tool" in match and match["tool"] not in request.tools: return False
+        if "prompt_regex" in match and not re.search(match["prompt_regex"], request.text, re.DOTALL): return False
+        return True
+
+    def sample_latency(self, latency: dict) -> float:
+        dist = latency.get("dist", "fixed")
+        with self._lock:
+            if dist == "uniform":
+                return self._rng.uniform(latency.get("min", 0.0), latency.get("max", 0.0))
+            if dist == "lognormal":
+                return self._rng.lognormvariate(math.log(max(latency.get("median", 0.05), 1e-6)), latency.get("sigma", 0.5))
+            return float(latency.get("seconds", 0.0))
+
+    def _injected_error(self, errors: dict) -> int | None:
+        with self._lock:
+            roll = self._rng.random()
+        threshold = 0.0
+        for code, rate in errors.items():
+            threshold += float(rate)
+            if roll < threshold:
+                return int(code)
+        return None
+
+    def generate_content(self, model: str, contents, config=None) -> types.GenerateContentResponse:
+        request = FakeRequest(model, contents, config)
+        rule = next((r for r in self.rules if self._matches(r, request)), None)
+        with self._lock:
+            self.stats["calls"] += 1
+            by_caller = self.stats["by_caller"]
+            by_caller[request.caller] = by_caller.get(request.caller, 0) + 1
+
+        time.sleep(self.sample_latency((rule or {}).get("latency") or self.default_latency))
+
+        error_code = self._injected_error((rule or {}).get("errors") or self.default_errors)
+        if error_code:
+            with self._lock:
+                self.stats["errors"][error_code] = self.stats["errors"].get(error_code, 0) + 1
+            raise make_api_error(error_code)
+
+        if rule is None:
+            # Structured calls get an (unparseable-as-schema) empty object, like a confused model.
+            spec = {"text": "{}"} if request.schema else {"text": DEFAULT_FAKE_REPLY}
+        elif rule["handler"]:
+            spec = rule["handler"](request)
+        else:
+            with self._lock:
+                responses = rule["responses"]
+                spec = responses[min(rule["served"], len(responses) - 1)] if responses else {"text": DEFAULT_FAKE_REPLY}
+                rule["served"] += 1
+
+        response = spec if isinstance(spec, types.GenerateContentResponse) else build_response(spec, contents, model)
+        return attach_parsed(response, config)
+
+# --- Record / Replay ---
+
+class RecordingClient:
+    """Wraps a real genai.Client and appends every call (or API error) to a JSONL replay file."""
+
+    def __init__(self, inner, path: str):
+        self.inner = inner
+        self.path = path
+        self.models = _Models(self)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def generate_content(self, model: str, contents, config=None):
+        record = {
+            "key": request_key(model, contents, config),
+            "model": model,
+            "caller": get_call_context().get("caller"),
+            "schema": schema_name(config),
+            "tools": tool_names(config),
+            "prompt_preview": prompt_text(contents)[:200],
+        }
+        start = time.time()
+        try:
+            response = self.inner.models.generate_content(model=model, contents=contents, config=config)
+            record["response"] = response.model_dump(mode="json", exclude_none=True, exclude={"sdk_http_response", "parsed", "automatic_function_calling_history"})
+            return response
+        except genai_errors.APIError as e:
+            record["error"] = {"code": e.code, "message": e.message}
+            raise
+        finally:
+            record["latency"] = round(time.time() - start, 4)
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+
+class ReplayClient:
+    """
+    Serves recorded responses without network access. Calls are matched by request
+    fingerprint; prompts that changed since recording fall back to the recorded calls of
+    the same caller and model, in order. `speed` scales recorded latencies (0 = none).
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        self.speed = speed
+        self.models = _Models(self)
+        self._by_key = {}
+        self._by_caller = {}
+        self._served = set()  # id() of records already handed out, by either lookup
+        self._lock = threading.Lock()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip(): continue
+                record = json.loads(line)
+                self._by_key.setdefault(record["key"], []).append(record)
+                self._by_caller.setdefault((record.get("caller"), record["model"]), []).append(record)
+        logger.info(f"Loaded {sum(len(v) for v in self._by_key.values())} recorded Gemini call(s) from {path}.")
+
+    def _take(self, records: list) -> dict | None:
+        """The next recording neither lookup has served yet; once all are used, the last one keeps answering."""
+        if not records: return None
+        record = next((r for r in records if id(r) not in self._served), records[-1])
+        self._served.add(id(record))
+        return record
+
+    def generate_content(self, model: str, contents, config=None):
+        key = request_key(model, contents, config)
+        with self._lock:
+            record = self._take(self._by_key.get(key)) or self._take(self._by_caller.get((get_call_context().get("caller"), model)))
+        if record is None:
+            raise make_api_error(404, f"No recorded response for {model} call ({prompt_text(contents)[:80]!r}).")
+
+        time.sleep(record.get("latency", 0.0) * self.speed)
+        if "error" in record:
+            raise make_api_error(record["error"]["code"], record["error"]["message"])
+        response = types.GenerateContentResponse.model_validate(record["response"])
+        return attach_parsed(response, config)
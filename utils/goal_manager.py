@@ -3,6 +3,7 @@ import datetime
 from core.context import logger, orchestrator_wake_event # <-- Import the event
 from core.planner import orchestrate_planning
 from utils.database import add_goal
+from utils.call_context import call_context
 
 def create_and_add_goal(goal_text: str, source: str):
     """
@@ -11,7 +12,9 @@ def create_and_add_goal(goal_text: str, source: str):
     """
     logger.info(f"PLAN_ORCHESTRATOR: Starting new planning cycle from '{source}' for goal: '{goal_text}'")
     
-    new_goal_obj = orchestrate_planning(goal_text)
+    # Goals created here come from a user (dashboard, voice, clarification): plan them as interactive traffic.
+    with call_context(priority='interactive'):
+        new_goal_obj = orchestrate_planning(goal_text)
     
     if new_goal_obj:
         timestamp_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
@@ -0,0 +1,126 @@
+import os
+import gzip
+import logging
+import itertools
+import threading
+from collections import deque
+from .logger import LOGS_DIR, LOG_FILE_NAME, LOG_SEGMENT_DIR, attach_handler, read_manifest
+
+# Read paths for the dashboard. Nothing here loads the whole log: the tail comes from an
+# in-memory ring buffer fed by the logging thread (seeded once from the end of the file),
+# and search streams the log backwards, newest lines first: the active file in fixed-size
+# chunks, then the compressed segments (newest first), each decompressed only when reached.
+
+LOG_PATH = os.path.join(LOGS_DIR, LOG_FILE_NAME)
+TAIL_BUFFER_LINES = 1000
+READ_CHUNK_BYTES = 64 * 1024
+
+def iter_lines_reverse(path: str = LOG_PATH, chunk_size: int = READ_CHUNK_BYTES):
+    """Yields the lines of a file from last to first, reading `chunk_size` bytes at a time."""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        position = f.seek(0, os.SEEK_END)
+        partial = b''
+        while position > 0:
+            read_size = min(chunk_size, position)
+            position -= read_size
+            f.seek(position)
+            # Lines are split on bytes before decoding, so a multi-byte character is never cut.
+            lines = (f.read(read_size) + partial).split(b'\n')
+            partial = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line.decode('utf-8', errors='replace').rstrip('\r')
+        if partial:
+            yield partial.decode('utf-8', errors='replace').rstrip('\r')
+
+def iter_segment_lines_reverse(path: str):
+    """Yields a gzipped segment's lines from last to first (a segment is at most LOG_ROTATE_BYTES)."""
+    try:
+        with gzip.open(path, 'rb') as f:
+            data = f.read()
+    except (FileNotFoundError, EOFError, gzip.BadGzipFile):
+        return
+    for line in reversed(data.split(b'\n')):
+        if line:
+            yield line.decode('utf-8', errors='replace').rstrip('\r')
+
+def iter_log_reverse(path: str = LOG_PATH, segment_dir: str = LOG_SEGMENT_DIR):
+    """Yields the whole log history newest line first: the active file, then archived segments."""
+    yield from iter_lines_reverse(path)
+    for entry in reversed(read_manifest(segment_dir)):
+        yield from iter_segment_lines_reverse(os.path.join(segment_dir, entry['file']))
+
+def read_tail(n: int, path: str = LOG_PATH, segment_dir: str = LOG_SEGMENT_DIR) -> list:
+    """The last `n` lines of the log (oldest first), without reading the rest of it."""
+    return list(reversed(list(itertools.islice(iter_log_reverse(path, segment_dir), n))))
+
+def search_lines(query: str, page: int = 1, per_page: int = 200, path: str = LOG_PATH,
+                 segment_dir: str = LOG_SEGMENT_DIR) -> tuple:
+    """
+    Case-insensitive substring search across all segments, newest matches first. Returns
+    (lines, has_more). Stops reading as soon as page `page` is full, so older segments are
+    only decompressed when needed; an empty query pages through every line.
+    """
+    needle = query.lower()
+    matches = (line for line in iter_log_reverse(path, segment_dir) if needle in line.lower())
+    start = (max(page, 1) - 1) * per_page
+    lines = list(itertools.islice(matches, start, start + per_page + 1))
+    return lines[:per_page], len(lines) > per_page
+
+class TailBuffer(logging.Handler):
+    """Keeps the most recent formatted log lines in memory (runs on the logging thread)."""
+
+    def __init__(self, maxlen: int = TAIL_BUFFER_LINES):
+        super().__init__()
+        self._lines = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def seed(self, lines: list):
+        with self._lock:
+            # Older lines go in front; when over capacity the oldest are the ones dropped.
+            self._lines = deque(list(lines) + list(self._lines), maxlen=self._lines.maxlen)
+
+    def emit(self, record):
+        try:
+            lines = self.format(record).splitlines()
+        except Exception:
+            self.handleError(record)
+            return
+        self.add_lines(lines)
+
+    def add_lines(self, lines: list):
+        """Appends already formatted lines (e.g. forwarded from another process)."""
+        with self._lock:
+            self._lines.extend(lines)
+
+    def tail(self, n: int) -> list:
+        """The last `n` lines, oldest first."""
+        with self._lock:
+            start = max(0, len(self._lines) - n)
+            return list(itertools.islice(self._lines, start, None))
+
+_tail_buffer = None
+_install_lock = threading.Lock()
+
+def get_tail_buffer() -> TailBuffer:
+    """
+    Returns the process's tail buffer, installing it on first use. It is seeded from the end
+    of the log file, so lines logged by an earlier run still show after a restart.
+    """
+    global _tail_buffer
+    with _install_lock:
+        if _tail_buffer is None:
+            buffer = TailBuffer()
+            attach_handler(buffer)
+            # Seeded after attaching: a line written in between may show twice, none are lost.
+            buffer.seed(read_tail(TAIL_BUFFER_LINES))
+            _tail_buffer = buffer
+    return _tail_buffer
+
+def tail(n: int = 50) -> list:
+    """The most recent `n` log lines, oldest first."""
+    return get_tail_buffer().tail(n)
@@ -1,26 +1,185 @@
 import logging
+import logging.handlers
 import os
+import gzip
+import json
+import queue
+import atexit
+import time
 
 # This file is now completely self-contained and has no external imports.
 
-def setup_logger():
-    """Sets up a centralized logger for the agent."""
-    logs_dir = 'logs'
-    os.makedirs(logs_dir, exist_ok=True)
-    
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-    
-    # Prevent adding duplicate handlers if this function is called multiple times
-    if logger.hasHandlers():
-        logger.handlers.clear()
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(module)s - %(message)s'
+LOGS_DIR = 'logs'
+LOG_FILE_NAME = 'agent.log'
+
+# --- NEW: Log Rotation ---
+# agent.log is the active segment. When it reaches LOG_ROTATE_BYTES or LOG_ROTATE_SECONDS of
+# age it is gzipped into logs/segments/ and listed in manifest.json (time range, line count,
+# byte offsets), so readers can stream old segments lazily instead of one ever-growing file.
+LOG_SEGMENT_DIR = os.path.join(LOGS_DIR, 'segments')
+LOG_MANIFEST_NAME = 'manifest.json'
+LOG_ROTATE_BYTES = 20 * 1024 * 1024
+LOG_ROTATE_SECONDS = 24 * 3600
+LOG_MAX_SEGMENTS = 30  # Oldest compressed segments beyond this are deleted
+LOG_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# --- NEW: Asynchronous Logging Pipeline ---
+# Worker threads only enqueue the record (QueueHandler); one listener thread formats it
+# once and does all the I/O (file, console, dashboard stream). A slow disk or terminal
+# no longer stalls the orchestrator, the swarm or the scheduler while they hold locks.
+
+class CachingFormatter(logging.Formatter):
+    """Formats each record once per formatter, however many handlers share it."""
+
+    def format(self, record):
+        cached = record.__dict__.get('_formatted')
+        if cached is not None and cached[0] is self:
+            return cached[1]
+        text = super().format(record)
+        record._formatted = (self, text)
+        return text
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records without formatting them. Only the message is merged with its args
+    (the args may be mutated by the caller after the call returns); timestamps, the format
+    string and tracebacks are rendered later by the listener thread.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def read_manifest(segment_dir: str = LOG_SEGMENT_DIR) -> list:
+    """Archived segments, oldest first (empty if nothing has been rotated yet)."""
+    try:
+        with open(os.path.join(segment_dir, LOG_MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+def _write_manifest(segment_dir: str, entries: list):
+    path = os.path.join(segment_dir, LOG_MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(entries, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+def _first_line_time(path: str) -> float | None:
+    """Timestamp of a log file's first line (used when resuming an existing agent.log)."""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            first_line = f.readline()
+        return time.mktime(time.strptime(first_line[:19], LOG_TIME_FORMAT))
+    except (OSError, ValueError):
+        return None
+
+class SegmentedFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Size- and age-based rotation into gzipped segments plus a manifest. Rotation runs on the
+    logging thread, so compressing a segment never blocks the threads that log.
+    Only the process that created the handler rotates; forked children (the voice process)
+    reopen agent.log when they see it was replaced.
+    """
+
+    def __init__(self, filename: str, segment_dir: str = LOG_SEGMENT_DIR, max_bytes: int = LOG_ROTATE_BYTES,
+                 max_age: float = LOG_ROTATE_SECONDS, max_segments: int = LOG_MAX_SEGMENTS):
+        super().__init__(filename, maxBytes=max_bytes, encoding='utf-8')
+        self.segment_dir = segment_dir
+        self.max_age = max_age
+        self.max_segments = max_segments
+        self._owner_pid = os.getpid()
+        self._segment_start = _first_line_time(self.baseFilename) if self.stream.tell() else None
+        self._segment_end = self._segment_start
+
+    def shouldRollover(self, record) -> bool:
+        if self.stream is None:
+            self.stream = self._open()
+        if os.getpid() != self._owner_pid:
+            self._reopen_if_replaced()
+            return False
+        size = self.stream.tell()
+        if size == 0:
+            return False
+        if size + len(self.format(record)) + 1 >= self.maxBytes:
+            return True
+        return self._segment_start is not None and record.created - self._segment_start >= self.max_age
+
+    def _reopen_if_replaced(self):
+        try:
+            replaced = os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except FileNotFoundError:
+            replaced = True
+        if replaced:
+            self.stream.close()
+            self.stream = self._open()
 
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(module)s - %(message)s')
+    def emit(self, record):
+        super().emit(record)
+        if self._segment_start is None:
+            self._segment_start = record.created
+        self._segment_end = record.created
 
-    # File Handler
-    file_handler = logging.FileHandler(os.path.join(logs_dir, "agent.log"), encoding='utf-8')
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            self._archive_segment()
+            os.remove(self.baseFilename)
+        self._segment_start = self._segment_end = None
+        self.stream = self._open()
+
+    def _archive_segment(self):
+        os.makedirs(self.segment_dir, exist_ok=True)
+        entries = read_manifest(self.segment_dir)
+        start = self._segment_start or os.path.getmtime(self.baseFilename)
+        end = self._segment_end or start
+        seq = entries[-1]['seq'] + 1 if entries else 0
+        stem = os.path.splitext(os.path.basename(self.baseFilename))[0]
+        name = f"{stem}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(start))}-{seq}.log.gz"
+        target = os.path.join(self.segment_dir, name)
+
+        size = lines = 0
+        with open(self.baseFilename, 'rb') as source, gzip.open(target, 'wb', compresslevel=6) as sink:
+            while chunk := source.read(1024 * 1024):
+                sink.write(chunk)
+                size += len(chunk)
+                lines += chunk.count(b'\n')
+
+        offset = entries[-1]['offset'] + entries[-1]['bytes'] if entries else 0
+        entries.append({
+            'seq': seq,
+            'file': name,
+            'start': time.strftime(LOG_TIME_FORMAT, time.localtime(start)),
+            'end': time.strftime(LOG_TIME_FORMAT, time.localtime(end)),
+            'lines': lines,
+            'offset': offset,  # Position of the segment in the uncompressed log history
+            'bytes': size,
+            'compressed_bytes': os.path.getsize(target),
+        })
+        for expired in entries[:-self.max_segments]:
+            try:
+                os.remove(os.path.join(self.segment_dir, expired['file']))
+            except FileNotFoundError:
+                pass
+        _write_manifest(self.segment_dir, entries[-self.max_segments:])
+
+formatter = CachingFormatter(LOG_FORMAT)
+_listener = None
+
+def attach_handler(handler: logging.Handler):
+    """Adds a handler that runs on the logging thread instead of the calling thread."""
+    if handler.formatter is None:
+        handler.setFormatter(formatter)
+    _listener.handlers = _listener.handlers + (handler,)
+
+def _build_handlers(logs_dir: str) -> tuple:
+    # File Handler (rotating into compressed segments)
+    file_handler = SegmentedFileHandler(os.path.join(logs_dir, LOG_FILE_NAME), segment_dir=os.path.join(logs_dir, os.path.basename(LOG_SEGMENT_DIR)))
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
 
     # Console Handler
     stream_handler = logging.StreamHandler()
@@ -30,8 +189,49 @@ def setup_logger():
     except AttributeError:
         # Some environments might not have reconfigure, this is a safe fallback
         pass
-    logger.addHandler(stream_handler)
-    
+    return (file_handler, stream_handler)
+
+def _start_listener(handlers: tuple) -> logging.handlers.QueueListener:
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    logger = logging.getLogger()
+    for handler in list(logger.handlers):
+        if isinstance(handler, DeferredQueueHandler):
+            logger.removeHandler(handler)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    return _listener
+
+def stop_logging():
+    """Drains the queue and stops the logging thread (registered with atexit)."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+def _restart_after_fork():
+    # A forked child (e.g. the voice process) inherits the queue handler but not the
+    # listener thread; give it its own queue and thread with the same handlers.
+    if _listener is not None:
+        _listener._thread = None
+        _start_listener(_listener.handlers)
+
+def setup_logger(logs_dir: str = LOGS_DIR):
+    """Sets up a centralized logger for the agent."""
+    os.makedirs(logs_dir, exist_ok=True)
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+
+    # Prevent adding duplicate handlers if this function is called multiple times
+    stop_logging()
+    if logger.hasHandlers():
+        logger.handlers.clear()
+
+    _start_listener(_build_handlers(logs_dir))
     return logger
 
-logger = setup_logger()
\ No newline at end of file
+logger = setup_logger()
+atexit.register(stop_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,240 @@
+import time
+import threading
+import contextlib
+
+# Minimal in-process Prometheus-style metrics (text exposition format 0.0.4).
+# Each update is a dict operation under a per-metric lock, cheap enough to leave on in
+# production. Values are per process; the dashboard process serves /metrics and folds in
+# the values of the orchestrator worker processes, which send it export() snapshots
+# (see absorb()).
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_registry = []
+_collectors = []
+_registry_lock = threading.Lock()
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{_escape(v)}"' for n, v in (extra or {}).items()]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float('inf'): return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._remote = {}  # source process -> its exported values
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, '') for n in self.labelnames)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+            self._remote.clear()
+
+    def _export(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def _absorb(self, source, values: dict):
+        with self._lock:
+            self._remote[source] = values
+
+    def _merged(self) -> dict:
+        """This process's values plus those absorbed from other processes (summed)."""
+        with self._lock:
+            merged = dict(self._values)
+            for values in self._remote.values():
+                for key, value in values.items():
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def _samples(self) -> list:
+        """Returns [(suffix, label values, extra labels, value)]."""
+        return [('', key, None, value) for key, value in self._merged().items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._merged().get(self._key(labels), 0)
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, func, **labels):
+        """The value is read from `func()` at scrape time (e.g. a queue's qsize)."""
+        with self._lock:
+            self._functions[self._key(labels)] = func
+
+    def _merged(self) -> dict:
+        """A gauge is not summed over processes: the value set here wins over an absorbed one."""
+        with self._lock:
+            merged = {}
+            for values in self._remote.values():
+                merged.update(values)
+            merged.update(self._values)
+        return merged
+
+    def _samples(self) -> list:
+        values = self._merged()
+        with self._lock:
+            functions = dict(self._functions)
+        for key, func in functions.items():
+            try:
+                values[key] = func()
+            except Exception:
+                continue  # e.g. multiprocessing.Queue.qsize() is unsupported on macOS
+        return [('', key, None, value) for key, value in values.items()]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _export(self) -> dict:
+        with self._lock:
+            return {key: [list(state[0]), state[1], state[2]] for key, state in self._values.items()}
+
+    def _merged(self) -> dict:
+        merged = {}
+        with self._lock:
+            for values in [self._values, *self._remote.values()]:
+                for key, (counts, total, count) in values.items():
+                    state = merged.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+                    state[0] = [a + b for a, b in zip(state[0], counts)]
+                    state[1] += total
+                    state[2] += count
+        return merged
+
+    def snapshot(self) -> dict:
+        """Returns {label values: (count, sum)}."""
+        return {key: (state[2], state[1]) for key, state in self._merged().items()}
+
+    def _samples(self) -> list:
+        samples = []
+        for key, (counts, total, count) in self._merged().items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(('_bucket', key, {'le': _format_value(float(bound))}, cumulative))
+            samples.append(('_bucket', key, {'le': '+Inf'}, count))
+            samples.append(('_sum', key, None, total))
+            samples.append(('_count', key, None, count))
+        return samples
+
+def register_collector(func):
+    """`func()` runs before every scrape, to refresh gauges that need a query (e.g. goals by status)."""
+    with _registry_lock:
+        _collectors.append(func)
+
+def export() -> dict:
+    """This process's metric values (function gauges excluded), for absorb() in another process."""
+    with _registry_lock:
+        metrics = list(_registry)
+    return {metric.name: metric._export() for metric in metrics}
+
+def absorb(source, snapshot: dict):
+    """
+    Folds another process's export() into this one's metrics, replacing that process's
+    previous snapshot (`source` identifies it, e.g. its pid). Counters and histograms are
+    summed over processes, so a worker's totals survive its exit.
+    """
+    with _registry_lock:
+        by_name = {metric.name: metric for metric in _registry}
+    for name, values in snapshot.items():
+        metric = by_name.get(name)
+        if metric is not None:
+            metric._absorb(source, values)
+
+def render() -> str:
+    """All metrics in Prometheus text format."""
+    with _registry_lock:
+        collectors = list(_collectors)
+        metrics = list(_registry)
+    for collector in collectors:
+        try:
+            collector()
+        except Exception:
+            pass
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+# --- Metric Definitions ---
+LLM_REQUEST_SECONDS = Histogram('cognito_llm_request_duration_seconds', 'Gemini API call latency.', ('tier', 'caller'))
+LLM_REQUESTS = Counter('cognito_llm_requests_total', 'Gemini API calls by outcome (ok, error_429, error_503, error).', ('tier', 'caller', 'outcome'))
+LLM_TOKENS = Counter('cognito_llm_tokens_total', 'Tokens billed, by kind (prompt, candidates, cached, thinking).', ('tier', 'caller', 'kind'))
+RATE_LIMIT_BLOCKS = Counter('cognito_rate_limit_blocks_total', 'Calls not admitted, by reason (timeout, token_budget, circuit_open, cancelled).', ('tier', 'priority', 'reason'))
+RATE_LIMIT_WAIT_SECONDS = Histogram('cognito_rate_limit_wait_seconds', 'Time a call queued in the scheduler before admission.', ('tier', 'priority'))
+CACHE_REQUESTS = Counter('cognito_cache_requests_total', 'Cache lookups by result (hit, miss).', ('cache', 'result'))
+STEP_SECONDS = Histogram('cognito_step_duration_seconds', 'Plan step execution time.', ('tool',))
+STEP_CANCELLATIONS = Counter('cognito_step_cancellations_total', 'Steps stopped before finishing, by reason (goal_cancelled, lease_lost, deadline, replan, goal_failed).', ('reason',))
+QUEUE_DEPTH = Gauge('cognito_queue_depth', 'Items waiting in internal queues.', ('queue',))
+DB_OP_SECONDS = Histogram('cognito_db_op_duration_seconds', 'SQLite operation time, including lock retries.', ('op',))
+DB_LOCK_RETRIES = Counter('cognito_db_lock_retries_total', 'SQLite "database is locked" retries.', ('op',))
+GOALS = Gauge('cognito_goals', 'Goals by table (goals, archive) and status.', ('table', 'status'))
+DB_MAINTENANCE_SECONDS = Histogram('cognito_db_maintenance_duration_seconds', 'SQLite maintenance task time (checkpoint, vacuum, optimize, integrity).', ('task',))
+DB_FILE_BYTES = Gauge('cognito_db_file_bytes', 'Size of the SQLite database files (main, wal).', ('file',))
+DB_FREELIST_PAGES = Gauge('cognito_db_freelist_pages', 'Unused pages in the SQLite database after the last maintenance run.')
+DB_INTEGRITY_OK = Gauge('cognito_db_integrity_ok', '1 if the last SQLite integrity check passed, 0 if it found problems.')
+SERVICE_UP = Gauge('cognito_service_up', '1 while a supervised service (run_agent.py) is running.', ('service',))
+SERVICE_RESTARTS = Counter('cognito_service_restarts_total', 'Restarts of supervised services after they exited or hung.', ('service',))
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
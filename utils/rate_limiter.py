@@ -1,7 +1,7 @@
 import datetime
 from datetime import timedelta
 from .logger import logger
-from .database import check_rate_limit_db, get_rate_limit_usage_db
+from .database import check_rate_limit_db, get_rate_limit_usage_db, get_rate_limit_counts_db
 
 class RateLimitTracker:
     """
@@ -61,6 +61,20 @@ class RateLimitTracker:
         rpd = self.limits[tier]['rpd']
         return get_rate_limit_usage_db(tier, rpd)
 
+    def get_remaining_capacity(self, tier: str) -> tuple[int, int]:
+        """
+        Returns how many calls are still available for a tier as (this minute, today).
+        Read-only: unlike check_and_increment, this never consumes a slot.
+        """
+        if tier not in self.limits:
+            return 0, 0
+
+        counts = get_rate_limit_counts_db(tier)
+        if counts is None:
+            return 0, 0
+        rpm_count, rpd_count = counts
+        return max(0, self.limits[tier]['rpm'] - rpm_count), max(0, self.limits[tier]['rpd'] - rpd_count)
+
 if __name__ == '__main__':
     # Simple self-test
     from utils.database import initialize_database
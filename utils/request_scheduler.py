@@ -0,0 +1,301 @@
+import os
+import math
+import time
+import heapq
+import itertools
+import threading
+import multiprocessing
+from .logger import logger
+from . import tracing
+from . import metrics
+from .call_context import get_call_context
+from .database import check_rate_limit_db, get_token_usage_db
+from .rate_limiter import RateLimitTracker
+from .supervisor import MAX_PROCESSES, process_index
+
+# --- Priority Classes (highest first) ---
+PRIORITY_CLASSES = ['interactive', 'goal', 'housekeeping', 'dmn', 'speculative']
+
+# Default class for each caller tag. An explicit `priority` in the call context wins,
+# e.g. the DMN runs the Strategist/Planner under priority='dmn'. Calls made for the
+# Speculator (call context `speculative=True`) are always 'speculative', whatever the caller.
+CALLER_PRIORITIES = {
+    'chat': 'interactive',
+    'voice': 'interactive',
+    'strategist': 'goal',
+    'planner': 'goal',
+    'executor': 'goal',
+    'curator': 'goal',
+    'monitor': 'goal',
+    'react': 'goal',
+    'tool': 'goal',
+    'step': 'goal',
+    'summarizer': 'housekeeping',
+    'eod_summary': 'housekeeping',
+    'dmn': 'dmn',
+}
+DEFAULT_PRIORITY = 'goal'
+
+# Fraction of each tier's RPM/RPD a class may fill. Whatever is above a class's share
+# is held back for the classes above it.
+CLASS_BUDGET_SHARES = {
+    'interactive': {'rpm': 1.0, 'rpd': 1.0, 'tokens': 1.0},
+    'goal': {'rpm': 1.0, 'rpd': 0.9, 'tokens': 0.9},
+    'housekeeping': {'rpm': 0.7, 'rpd': 0.8, 'tokens': 0.8},
+    'dmn': {'rpm': 0.5, 'rpd': 0.6, 'tokens': 0.6},
+    'speculative': {'rpm': 0.4, 'rpd': 0.5, 'tokens': 0.5},
+}
+
+# Optional 24h token budget per tier (None = only RPM/RPD apply). Classes get the same
+# shares as above, so e.g. the DMN stops once 60% of a tier's token budget is spent.
+TOKEN_DAILY_BUDGETS = {'tier1': None, 'tier2': None}
+# Token totals are read from the DB at most this often; calls in between are added locally.
+TOKEN_USAGE_REFRESH_SECONDS = 30
+
+# While a user is interacting (chat/voice call in the last N seconds), non-interactive
+# classes leave this many RPM slots free so the next interactive turn is not queued.
+INTERACTIVE_WINDOW_SECONDS = 120
+INTERACTIVE_RPM_RESERVE = 1
+
+# How long a call may queue for a slot before giving up with RATE_LIMIT_HIT.
+CLASS_MAX_WAIT_SECONDS = {
+    'interactive': 20.0,
+    'goal': 5.0,
+    'housekeeping': 2.0,
+    'dmn': 0.0,
+    'speculative': 0.0,
+}
+POLL_INTERVAL_SECONDS = 0.5
+
+# --- Cross-Process Queue ---
+# Orchestrator worker processes share the interactive window and the priority order with
+# the dashboard process through shared memory: every process counts its waiting calls per
+# (tier, class) in its own row (supervisor.process_index()), and a queue head defers while a
+# higher class is waiting in another process. Waiting processes restamp their row every
+# poll; a row not restamped for this long belongs to a process that died mid-wait.
+SHARED_ROW_STALE_SECONDS = 5.0
+
+class RequestScheduler:
+    """
+    Central admission control in front of GeminiClient.
+
+    Every LLM call is classified into a priority class. A call is admitted only against
+    its class's share of the tier's RPM/RPD budget, and queued calls are served
+    highest class first, so user-facing latency stays low under heavy background load.
+    The DB-backed rate_limits table remains the cross-process source of truth.
+    """
+
+    def __init__(self, rate_limiter: RateLimitTracker):
+        self.rate_limiter = rate_limiter
+        self._condition = threading.Condition()
+        self._waiters = {}  # tier -> heap of (class_rank, sub_priority, seq)
+        self._checking = set()  # tiers whose head waiter is in the DB check (lock released)
+        self._seq = itertools.count()
+        self._tiers = list(rate_limiter.limits)
+        self._row_size = len(self._tiers) * len(PRIORITY_CLASSES)
+        self._last_interactive_call = multiprocessing.RawValue('d', 0.0)
+        self._waiting = multiprocessing.RawArray('i', MAX_PROCESSES * self._row_size)
+        self._row_stamps = multiprocessing.RawArray('d', MAX_PROCESSES)
+        self._row_pids = multiprocessing.RawArray('i', MAX_PROCESSES)
+        self._token_usage = {}  # tier -> (tokens in the last 24h, refreshed_at)
+        self._token_lock = threading.Lock()
+        self.stats = {cls: {'admitted': 0, 'rejected': 0, 'wait_seconds': 0.0} for cls in PRIORITY_CLASSES}
+
+    @staticmethod
+    def classify(caller: str = None) -> str:
+        """Resolves the priority class for the current call."""
+        context = get_call_context()
+        if context.get('speculative'):
+            return 'speculative'
+        priority = context.get('priority')
+        if priority in CLASS_BUDGET_SHARES:
+            return priority
+        caller = caller or context.get('caller')
+        return CALLER_PRIORITIES.get(caller, DEFAULT_PRIORITY)
+
+    def shared_memory(self) -> dict:
+        """The state shared with worker processes, for adopt_shared_memory() in a process that did not inherit it."""
+        return {'last_interactive_call': self._last_interactive_call, 'waiting': self._waiting,
+                'row_stamps': self._row_stamps, 'row_pids': self._row_pids}
+
+    def adopt_shared_memory(self, shared: dict):
+        self._last_interactive_call = shared['last_interactive_call']
+        self._waiting = shared['waiting']
+        self._row_stamps = shared['row_stamps']
+        self._row_pids = shared['row_pids']
+
+    def _interactive_active(self) -> bool:
+        return time.time() - self._last_interactive_call.value < INTERACTIVE_WINDOW_SECONDS
+
+    def _slot(self, row: int, tier: str, rank: int) -> int:
+        return row * self._row_size + self._tiers.index(tier) * len(PRIORITY_CLASSES) + rank
+
+    def _count_waiting(self, tier: str, rank: int, delta: int):
+        """Updates this process's row (called with the condition held, so the row has one writer)."""
+        row = process_index()
+        if self._row_pids[row] != os.getpid():
+            # A restarted worker takes over its predecessor's row, counts and all
+            for slot in range(row * self._row_size, (row + 1) * self._row_size):
+                self._waiting[slot] = 0
+            self._row_pids[row] = os.getpid()
+        self._waiting[self._slot(row, tier, rank)] += delta
+        self._row_stamps[row] = time.time()
+
+    def _live_rows(self):
+        """This process's row and those of other processes with calls waiting right now."""
+        own, now = process_index(), time.time()
+        return [row for row in range(MAX_PROCESSES) if row == own or now - self._row_stamps[row] < SHARED_ROW_STALE_SECONDS]
+
+    def _outranked_elsewhere(self, tier: str, rank: int) -> bool:
+        """True while a call of a higher class waits for this tier in another process."""
+        own = process_index()
+        for row in self._live_rows():
+            if row != own and any(self._waiting[self._slot(row, tier, higher)] for higher in range(rank)):
+                return True
+        return False
+
+    def get_effective_limits(self, tier: str, priority: str) -> tuple[int, int]:
+        """Returns the (rpm, rpd) ceiling a priority class may fill for a tier."""
+        limits = self.rate_limiter.limits[tier]
+        shares = CLASS_BUDGET_SHARES[priority]
+        rpm = math.floor(limits['rpm'] * shares['rpm'])
+        rpd = math.floor(limits['rpd'] * shares['rpd'])
+
+        if priority != 'interactive' and self._interactive_active():
+            rpm -= INTERACTIVE_RPM_RESERVE
+        if priority == 'interactive':
+            rpm = max(rpm, 1)
+        return max(rpm, 0), max(rpd, 0)
+
+    # --- Token Budgets ---
+    def get_token_usage(self, tier: str) -> int:
+        """Tokens billed to a tier in the last 24h (cached; see TOKEN_USAGE_REFRESH_SECONDS)."""
+        with self._token_lock:
+            tokens, refreshed_at = self._token_usage.get(tier, (0, 0.0))
+            if time.time() - refreshed_at < TOKEN_USAGE_REFRESH_SECONDS:
+                metrics.record_cache('token_usage', hit=True)
+                return tokens
+        metrics.record_cache('token_usage', hit=False)
+        tokens = get_token_usage_db(tier, time.time() - 86400) or 0
+        with self._token_lock:
+            self._token_usage[tier] = (tokens, time.time())
+        return tokens
+
+    def record_tokens(self, tier: str, tokens: int):
+        """Adds a finished call's tokens to the cached total until the next DB refresh."""
+        with self._token_lock:
+            if tier in self._token_usage:
+                total, refreshed_at = self._token_usage[tier]
+                self._token_usage[tier] = (total + tokens, refreshed_at)
+
+    def within_token_budget(self, tier: str, priority: str) -> bool:
+        budget = TOKEN_DAILY_BUDGETS.get(tier)
+        if budget is None:
+            return True
+        return self.get_token_usage(tier) < budget * CLASS_BUDGET_SHARES[priority]['tokens']
+
+    def has_budget(self, tier: str, priority: str) -> bool:
+        """Read-only check: could a call of this class be admitted right now?"""
+        if tier not in self.rate_limiter.limits: return False
+        if not self.within_token_budget(tier, priority): return False
+        rpm_left, rpd_left = self.rate_limiter.get_remaining_capacity(tier)
+        limits = self.rate_limiter.limits[tier]
+        rpm, rpd = self.get_effective_limits(tier, priority)
+        return (limits['rpm'] - rpm_left) < rpm and (limits['rpd'] - rpd_left) < rpd
+
+    def acquire(self, tier: str, caller: str = None, max_wait: float = None) -> bool:
+        """
+        Blocks until the call is admitted (a slot is recorded in the DB) or the class's
+        max wait (or `max_wait`, if given) elapses. Higher classes waiting on the same
+        tier are always served first. A call whose cancel token (call context) is
+        cancelled leaves the queue without a slot.
+        """
+        if tier not in self.rate_limiter.limits:
+            logger.error(f"Error: Tier '{tier}' is not a valid tier.")
+            return False
+
+        priority = self.classify(caller)
+        rank = PRIORITY_CLASSES.index(priority)
+        if priority == 'interactive':
+            self._last_interactive_call.value = time.time()
+
+        # Waiting does not refill a 24h token budget, so reject immediately.
+        if not self.within_token_budget(tier, priority):
+            self.stats[priority]['rejected'] += 1
+            metrics.RATE_LIMIT_BLOCKS.inc(tier=tier, priority=priority, reason='token_budget')
+            logger.warning(f"SCHEDULER: {priority} call to {tier} rejected. Token budget share exhausted.")
+            return False
+
+        cancel_token = get_call_context().get('cancel_token')
+        queue_wait = get_call_context().get('queue_wait')  # The enclosing step's wait total (see main._execute_step)
+        entry = (rank, get_call_context().get('sub_priority', 0), next(self._seq))
+        start = time.time()
+        deadline = start + (CLASS_MAX_WAIT_SECONDS[priority] if max_wait is None else max_wait)
+
+        with tracing.span('scheduler.acquire', **{'llm.tier': tier, 'llm.priority': priority}), self._condition:
+            heap = self._waiters.setdefault(tier, [])
+            heapq.heappush(heap, entry)
+            self._count_waiting(tier, rank, 1)
+            try:
+                while True:
+                    self._row_stamps[process_index()] = time.time()
+                    if cancel_token is not None and cancel_token.cancelled:
+                        metrics.RATE_LIMIT_BLOCKS.inc(tier=tier, priority=priority, reason='cancelled')
+                        tracing.set_attributes(**{'scheduler.admitted': False})
+                        return False
+                    if heap[0] == entry and tier not in self._checking and not self._outranked_elsewhere(tier, rank):
+                        rpm, rpd = self.get_effective_limits(tier, priority)
+                        # The DB check can sit in SQLite's busy timeout, so it runs without the
+                        # condition held; queue_depths()/get_status() and other tiers carry on.
+                        # `_checking` keeps a newly queued head from checking concurrently.
+                        self._checking.add(tier)
+                        self._condition.release()
+                        try:
+                            admitted = check_rate_limit_db(tier, rpm, rpd)
+                        finally:
+                            self._condition.acquire()
+                            self._checking.discard(tier)
+                            self._condition.notify_all()
+                        if admitted:
+                            self.stats[priority]['admitted'] += 1
+                            self.stats[priority]['wait_seconds'] += time.time() - start
+                            metrics.RATE_LIMIT_WAIT_SECONDS.observe(time.time() - start, tier=tier, priority=priority)
+                            tracing.set_attributes(**{'scheduler.admitted': True})
+                            return True
+
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.stats[priority]['rejected'] += 1
+                        metrics.RATE_LIMIT_BLOCKS.inc(tier=tier, priority=priority, reason='timeout')
+                        tracing.set_attributes(**{'scheduler.admitted': False})
+                        logger.warning(f"SCHEDULER: {priority} call to {tier} not admitted after {time.time() - start:.1f}s.")
+                        return False
+                    self._condition.wait(timeout=min(remaining, POLL_INTERVAL_SECONDS))
+            finally:
+                heap.remove(entry)
+                heapq.heapify(heap)
+                self._count_waiting(tier, rank, -1)
+                self._condition.notify_all()
+                if queue_wait is not None:
+                    queue_wait[0] += time.time() - start
+
+    def queue_depths(self) -> dict:
+        """Calls currently waiting for a slot, per tier, in every process."""
+        rows = self._live_rows()
+        return {
+            tier: sum(self._waiting[self._slot(row, tier, rank)] for row in rows for rank in range(len(PRIORITY_CLASSES)))
+            for tier in self._tiers
+        }
+
+    def get_status(self) -> dict:
+        """Snapshot for the dashboard."""
+        queued = self.queue_depths()
+        return {
+            'interactive_active': self._interactive_active(),
+            'queued': queued,
+            'classes': {cls: dict(stats) for cls, stats in self.stats.items()},
+            'token_budgets': {
+                tier: {'budget': budget, 'used_24h': self.get_token_usage(tier)}
+                for tier, budget in TOKEN_DAILY_BUDGETS.items()
+            },
+        }
@@ -0,0 +1,82 @@
+import json
+import datetime
+
+# JSON encoding for the hot paths (plan blobs in SQLite, dashboard payloads, model output
+# parsing). Uses orjson when installed, otherwise the stdlib with matching behaviour:
+# compact output, UTF-8 instead of \u escapes, non-string dict keys and datetimes allowed.
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+def _default(obj):
+    """Types neither encoder handles natively."""
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, 'model_dump'):  # pydantic models
+        return obj.model_dump()
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_bytes(obj) -> bytes:
+    """Compact UTF-8 JSON bytes (what HTTP responses want)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def dumps(obj) -> str:
+    """
+    Compact JSON text. SQLite columns get text rather than bytes: a bytes value would be
+    stored as a BLOB, which the JSON1 functions (json_each, json_valid) reject.
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode('utf-8')
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':'))
+
+def dumps_pretty(obj) -> str:
+    """Two-space indented JSON text (for prompts and logs)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS | orjson.OPT_INDENT_2).decode('utf-8')
+    return json.dumps(obj, default=_default, ensure_ascii=False, indent=2)
+
+def loads(data):
+    """Parses JSON from str or bytes. Raises json.JSONDecodeError (orjson's error subclasses it)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class JsonModule:
+    """json-module-compatible object for libraries that accept one (e.g. python-socketio's `json=`)."""
+
+    JSONDecodeError = json.JSONDecodeError
+
+    @staticmethod
+    def dumps(obj, **kwargs) -> str:
+        return dumps(obj)
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return loads(s)
+
+def configure_flask(app):
+    """Routes Flask's jsonify/request.get_json through this module (bytes go straight into the response)."""
+    from flask.json.provider import DefaultJSONProvider
+
+    class _Provider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs) -> str:
+            if kwargs:
+                return super().dumps(obj, **kwargs)  # e.g. indent/sort_keys requested explicitly
+            return dumps(obj)
+
+        def loads(self, s, **kwargs):
+            return loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+    app.json = _Provider(app)
@@ -0,0 +1,218 @@
+import time
+import signal
+import threading
+import multiprocessing
+from .logger import logger
+from . import metrics
+
+# --- Service Supervisor (run_agent.py) ---
+# Starts each service (thread or process), watches liveness and heartbeats, and restarts
+# a service that died with exponential backoff. Heartbeats live in shared memory, so a
+# worker process can report progress without a round trip to the parent: a service calls
+# heartbeat() from its main loop, and one that stops beating for longer than its
+# `heartbeat_timeout` is treated as hung (a process is killed and restarted; a thread
+# cannot be killed, so it is only flagged). Service config keys, besides target/args/type:
+#   heartbeat_timeout - seconds without a heartbeat before the service counts as hung (None: liveness only)
+#   restart           - restart the service when it exits (default True)
+#   drain             - on shutdown, wait for the service to finish on its own (orchestrator workers)
+#   start_method      - multiprocessing start method of a process service (default: the platform's)
+
+RESTART_BACKOFF_BASE_SECONDS = 1.0
+RESTART_BACKOFF_MAX_SECONDS = 60.0
+STABLE_RUN_SECONDS = 120  # A service that ran this long before failing restarts with the base delay again
+CHECK_INTERVAL_SECONDS = 1.0
+SHUTDOWN_GRACE_SECONDS = 60  # How long draining services get to finish their in-flight steps
+MAX_PROCESSES = 16  # Rows of the per-process tables in shared memory; row 0 is run_agent.py's process
+
+_local = threading.local()
+_process_slot = None
+_process_index = 0
+_active = None
+
+def process_index() -> int:
+    """
+    This process's row in per-process shared-memory tables (0 in run_agent.py's process,
+    1.. in service processes). Each row has a single writing process, so those tables need
+    no lock shared between processes.
+    """
+    return _process_index
+
+def heartbeat():
+    """Records that the calling service is making progress (a no-op outside the supervisor)."""
+    slot = getattr(_local, 'slot', None) or _process_slot
+    if slot is not None:
+        slot.value = time.time()
+
+def heartbeat_handle():
+    """
+    The calling service's heartbeat as a callable, for a helper thread that beats on the
+    service's behalf (None outside the supervisor).
+    """
+    slot = getattr(_local, 'slot', None) or _process_slot
+    if slot is None:
+        return None
+
+    def beat():
+        slot.value = time.time()
+    return beat
+
+def _run_service(name: str, slot, index: int, service_type: str, target, args: tuple, errors: dict):
+    global _process_slot, _process_index
+    if service_type == "process":
+        _process_slot = slot
+        _process_index = index
+        # Ctrl+C reaches the whole process group; the parent coordinates the shutdown instead.
+        # SIGTERM is how the parent stops a process, whatever handler it had when it forked.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    else:
+        _local.slot = slot
+    slot.value = time.time()
+    try:
+        target(*args)
+    except Exception as e:
+        logger.exception(f"SUPERVISOR: Service '{name}' crashed: {e}")
+        errors[name] = f"{type(e).__name__}: {e}"
+        raise
+
+class _Service:
+    def __init__(self, name: str, config: dict, index: int):
+        self.name = name
+        self.index = index  # Its process_index() when it runs as a process
+        self.config = config
+        self.type = config["type"]
+        self.heartbeat_timeout = config.get("heartbeat_timeout")
+        self.slot = multiprocessing.Value('d', 0.0, lock=False)
+        self.instance = None
+        self.state = "pending"
+        self.started_at = None
+        self.restarts = 0
+        self.failures = 0  # Consecutive failures without a stable run in between (drives the backoff)
+        self.restart_at = None
+        self.last_exit = None
+
+class Supervisor:
+    """Runs the services of run_agent.py and keeps them alive."""
+
+    def __init__(self, services: dict):
+        if len(services) >= MAX_PROCESSES:
+            raise ValueError(f"At most {MAX_PROCESSES - 1} services can be supervised.")
+        self._services = {name: _Service(name, config, index) for index, (name, config) in enumerate(services.items(), start=1)}
+        self._errors = {}  # Exceptions of crashed thread services (processes report an exit code)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stopping = False
+
+    def start(self):
+        global _active
+        _active = self
+        for service in self._services.values():
+            self._start(service)
+        for name in self._services:
+            metrics.SERVICE_UP.set_function(lambda name=name: 1 if self._services[name].state == "running" else 0, service=name)
+
+    def _start(self, service: _Service):
+        args = (service.name, service.slot, service.index, service.type, service.config["target"], service.config.get("args", ()), self._errors)
+        if service.type == "thread":
+            instance = threading.Thread(target=_run_service, args=args, name=service.name, daemon=True)
+        else:
+            context = multiprocessing.get_context(service.config.get("start_method"))
+            instance = context.Process(target=_run_service, args=args, name=service.name, daemon=True)
+        with self._lock:
+            self._errors.pop(service.name, None)
+            service.instance = instance
+            service.state = "running"
+            service.started_at = time.time()
+            service.restart_at = None
+        instance.start()
+        logger.info(f"Service '{service.name}' started as a {service.type}.")
+
+    def _exit_reason(self, service: _Service) -> str:
+        if service.type == "process":
+            return f"exit code {service.instance.exitcode}"
+        return self._errors.get(service.name, "returned")
+
+    def check(self):
+        """One supervision pass: notices exits and missed heartbeats, starts due restarts."""
+        now = time.time()
+        for service in self._services.values():
+            if service.state in ("running", "unresponsive") and not service.instance.is_alive():
+                service.last_exit = self._exit_reason(service)
+                if self.stopping or not service.config.get("restart", True):
+                    service.state = "stopped"
+                    continue
+                service.failures = 1 if now - service.started_at >= STABLE_RUN_SECONDS else service.failures + 1
+                delay = min(RESTART_BACKOFF_BASE_SECONDS * (2 ** (service.failures - 1)), RESTART_BACKOFF_MAX_SECONDS)
+                service.state = "restarting"
+                service.restart_at = now + delay
+                logger.error(f"SUPERVISOR: Service '{service.name}' stopped ({service.last_exit}). Restarting in {delay:.0f}s.")
+            elif service.state == "running" and service.heartbeat_timeout:
+                silent = now - max(service.slot.value, service.started_at)
+                if silent > service.heartbeat_timeout:
+                    logger.error(f"SUPERVISOR: Service '{service.name}' missed heartbeats for {silent:.0f}s.")
+                    if service.type == "process":
+                        service.instance.kill()  # Restarted by the next pass
+                    else:
+                        service.state = "unresponsive"
+            elif service.state == "unresponsive" and service.slot.value > now - service.heartbeat_timeout:
+                service.state = "running"  # Came back on its own
+            elif service.state == "restarting" and now >= service.restart_at and not self.stopping:
+                service.restarts += 1
+                metrics.SERVICE_RESTARTS.inc(service=service.name)
+                self._start(service)
+
+    def run(self):
+        """Supervises until request_stop() is called (e.g. from a signal handler)."""
+        while not self._stop.wait(CHECK_INTERVAL_SECONDS):
+            self.check()
+
+    def request_stop(self):
+        self._stop.set()
+
+    def shutdown(self, grace: float = SHUTDOWN_GRACE_SECONDS):
+        """
+        Stops the services: waits up to `grace` seconds for draining services to finish on
+        their own (the caller has already told them to stop), then terminates the remaining
+        processes. Threads are daemons and end with the interpreter.
+        """
+        self.stopping = True
+        deadline = time.time() + grace
+        for service in self._services.values():
+            if service.config.get("drain") and service.instance is not None:
+                service.state = "draining"
+                service.instance.join(timeout=max(0.0, deadline - time.time()))
+                if service.instance.is_alive():
+                    logger.warning(f"SUPERVISOR: Service '{service.name}' did not finish within {grace:.0f}s.")
+                else:
+                    service.state = "stopped"
+        for service in self._services.values():
+            if service.type == "process" and service.instance is not None and service.instance.is_alive():
+                service.instance.terminate()
+                service.instance.join(timeout=5)
+                service.state = "stopped"
+
+    def status(self) -> list:
+        """Per-service state, uptime, restart count and last heartbeat, for the dashboard."""
+        now = time.time()
+        report = []
+        for service in self._services.values():
+            last_beat = service.slot.value or None
+            running = service.state in ("running", "unresponsive", "draining")
+            report.append({
+                'name': service.name,
+                'type': service.type,
+                'state': service.state,
+                'pid': getattr(service.instance, 'pid', None) if service.type == "process" else None,
+                'started_at': service.started_at,
+                'uptime_seconds': now - service.started_at if running and service.started_at else 0.0,
+                'restarts': service.restarts,
+                'last_heartbeat': last_beat,
+                'heartbeat_age_seconds': now - last_beat if last_beat else None,
+                'heartbeat_timeout': service.heartbeat_timeout,
+                'last_exit': service.last_exit,
+            })
+        return report
+
+def get_service_status() -> list:
+    """Status of the services in this process's supervisor (empty if none is running)."""
+    return _active.status() if _active is not None else []
@@ -0,0 +1,84 @@
+import threading
+from collections import deque
+
+# --- Per-class Tier Policies ---
+# fallback_after: seconds to wait for a tier1 slot before falling back to tier2
+#                 (None = never fall back; the call keeps its tier and may return RATE_LIMIT_HIT).
+#                 A tier1 503 falls back immediately when a fallback is allowed.
+# hedge:          for tier2 calls, issue a duplicate request if the first has not answered
+#                 after the observed p95 latency, and take whichever answers first.
+TIER_POLICIES = {
+    'interactive': {'fallback_after': 5.0, 'hedge': True},
+    'goal': {'fallback_after': 20.0, 'hedge': False},
+    'housekeeping': {'fallback_after': None, 'hedge': False},
+    'dmn': {'fallback_after': None, 'hedge': False},
+    'speculative': {'fallback_after': None, 'hedge': False},
+}
+FALLBACK_TIERS = {'tier1': 'tier2'}
+
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SECONDS = 1.0
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per tier, used to pick hedge delays."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, tier: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(tier, deque(maxlen=self._window)).append(seconds)
+
+    def percentile(self, tier: str, pct: float) -> float | None:
+        """Returns the latency percentile for a tier, or None until enough samples exist."""
+        with self._lock:
+            samples = sorted(self._samples.get(tier, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+class TierPolicy:
+    """
+    Decides, per priority class, whether a call may fall back to a cheaper tier or be
+    hedged, and records which path answered so the trade-off can be tuned.
+    """
+
+    def __init__(self, policies: dict = None):
+        self.policies = policies or TIER_POLICIES
+        self.latency = LatencyTracker()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, priority: str) -> dict:
+        return self.policies.get(priority, {'fallback_after': None, 'hedge': False})
+
+    def fallback_tier(self, tier: str, policy: dict) -> str | None:
+        """Returns the tier to fall back to, if this policy allows falling back from `tier`."""
+        if policy.get('fallback_after') is None:
+            return None
+        return FALLBACK_TIERS.get(tier)
+
+    def hedge_delay(self, tier: str, policy: dict) -> float | None:
+        """Seconds to wait before hedging a call, or None if it should not be hedged."""
+        if not policy.get('hedge') or tier != 'tier2':
+            return None
+        p95 = self.latency.percentile(tier, 95)
+        if p95 is None:
+            return None
+        return max(p95, HEDGE_MIN_DELAY_SECONDS)
+
+    def record(self, priority: str, path: str):
+        """Counts which path served a call: primary, fallback_rate_limit, fallback_503 or hedge."""
+        with self._lock:
+            by_path = self._stats.setdefault(priority, {})
+            by_path[path] = by_path.get(path, 0) + 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = {priority: dict(paths) for priority, paths in self._stats.items()}
+        stats['p95_seconds'] = {tier: self.latency.percentile(tier, 95) for tier in ('tier1', 'tier2')}
+        return stats
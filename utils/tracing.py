@@ -0,0 +1,144 @@
+import os
+import json
+import threading
+import functools
+import contextlib
+from .call_context import get_call_context
+
+# OpenTelemetry is optional: without it (or with COGNITO_TRACING=none) every helper
+# below is a cheap no-op, so call sites never need to check.
+try:
+    from opentelemetry import trace, context as otel_context
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter, SpanExportResult
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+# --- Configuration ---
+TRACING_EXPORTER = os.getenv("COGNITO_TRACING", "file")  # file | console | otlp | none
+TRACE_FILE = os.getenv("COGNITO_TRACE_FILE", "logs/traces.jsonl")
+TRACE_FILE_MAX_BYTES = 50 * 1024 * 1024  # Rolled over to <file>.1 when exceeded
+TRACE_SAMPLE_RATE = float(os.getenv("COGNITO_TRACE_SAMPLE_RATE", "1.0"))
+SERVICE_NAME = "cognito-agent"
+
+# Call-context tags copied onto every span, so spans can be grouped by goal/step/caller.
+CONTEXT_ATTRIBUTES = ('goal_id', 'step_id', 'caller', 'priority')
+
+if OTEL_AVAILABLE:
+    class FileSpanExporter(SpanExporter):
+        """Appends finished spans as JSON lines (one per span) for offline critical-path analysis."""
+
+        def __init__(self, path: str = TRACE_FILE):
+            self.path = path
+            self._lock = threading.Lock()
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        def export(self, spans) -> "SpanExportResult":
+            lines = []
+            for span in spans:
+                ctx = span.get_span_context()
+                lines.append(json.dumps({
+                    'name': span.name,
+                    'trace_id': format(ctx.trace_id, '032x'),
+                    'span_id': format(ctx.span_id, '016x'),
+                    'parent_id': format(span.parent.span_id, '016x') if span.parent else None,
+                    'start_ns': span.start_time,
+                    'end_ns': span.end_time,
+                    'duration_ms': (span.end_time - span.start_time) / 1e6,
+                    'status': span.status.status_code.name,
+                    'attributes': dict(span.attributes or {}),
+                }, default=str))
+            try:
+                with self._lock:
+                    if os.path.exists(self.path) and os.path.getsize(self.path) > TRACE_FILE_MAX_BYTES:
+                        os.replace(self.path, self.path + ".1")
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write("\n".join(lines) + "\n")
+                return SpanExportResult.SUCCESS
+            except OSError:
+                return SpanExportResult.FAILURE
+
+        def shutdown(self):
+            pass
+
+_tracer = None
+_setup_lock = threading.Lock()
+
+def _build_exporter(kind: str):
+    if kind == "console":
+        return ConsoleSpanExporter()
+    if kind == "otlp":
+        # Endpoint/headers come from the standard OTEL_EXPORTER_OTLP_* environment variables.
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    return FileSpanExporter(TRACE_FILE)
+
+def get_tracer():
+    """Returns the process tracer, creating the provider on first use (None if tracing is off)."""
+    global _tracer
+    if _tracer is not None or not OTEL_AVAILABLE or TRACING_EXPORTER == "none":
+        return _tracer
+    with _setup_lock:
+        if _tracer is None:
+            # A private provider (not the global one), so third-party libraries' spans stay out.
+            provider = TracerProvider(
+                resource=Resource.create({"service.name": SERVICE_NAME, "process.pid": os.getpid()}),
+                sampler=ParentBased(TraceIdRatioBased(TRACE_SAMPLE_RATE)),
+            )
+            provider.add_span_processor(BatchSpanProcessor(_build_exporter(TRACING_EXPORTER)))
+            _tracer = provider.get_tracer("cognito")
+    return _tracer
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """Starts a span as a child of the current one, tagged with the call context's goal/step/caller."""
+    tracer = get_tracer()
+    if tracer is None:
+        yield None
+        return
+    tags = get_call_context()
+    merged = {key: tags[key] for key in CONTEXT_ATTRIBUTES if tags.get(key) is not None}
+    merged['thread.name'] = threading.current_thread().name
+    merged.update({key: value for key, value in attributes.items() if value is not None})
+    with tracer.start_as_current_span(name, attributes=merged) as current:
+        yield current
+
+def traced(name: str = None):
+    """Decorator form of span(); the span is named after the function unless given."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def set_attributes(**attributes):
+    """Adds attributes to the current span (ignored when not tracing)."""
+    if _tracer is None:
+        return
+    current = trace.get_current_span()
+    for key, value in attributes.items():
+        if value is not None:
+            current.set_attribute(key, value)
+
+def propagate(func):
+    """
+    Wraps `func` so it runs under the caller's trace context when submitted to a thread pool
+    (OpenTelemetry context does not cross threads on its own).
+    """
+    if _tracer is None:
+        return func
+    captured = otel_context.get_current()
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = otel_context.attach(captured)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            otel_context.detach(token)
+    return wrapper
@@ -15,7 +15,8 @@ from google.genai import types
 # --- Local Imports ---
 # Note: In a new process, these imports initialize new instances of their modules.
 from core.context import logger as local_logger # We will override this logger's handlers
-from utils.database import get_user_profile, get_archived_goals, update_user_profile, get_active_goals
+from utils.logger import attach_handler
+from utils.database import get_user_profile, get_archived_goal_summaries, update_user_profile, get_active_goal_summaries
 from core.agent_profile import get_agent_profile
 from core.tools import TOOL_MANIFEST
 
@@ -67,7 +68,7 @@ def setup_process_logging(status_queue):
     if status_queue:
         handler = QueueHandler(status_queue)
         handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - [VOICE] - %(message)s'))
-        local_logger.addHandler(handler)
+        attach_handler(handler)
         local_logger.info("Voice Interface logging connected to Dashboard.")
 
 def find_mic_device_indices(device_name: str) -> list[int]:
@@ -95,8 +96,8 @@ def find_mic_device_indices(device_name: str) -> list[int]:
 def get_live_chat_context() -> str:
     profile = get_user_profile()
     profile_str = json.dumps(profile, indent=2) if profile else "No profile data exists yet."
-    recent_tasks = get_archived_goals(page=1, per_page=3)
-    tasks_str = "\n".join([f"- {g['goal']} (Status: {g['status']})" for g in recent_tasks]) if recent_tasks else "No recent tasks."
+    recent_tasks = get_archived_goal_summaries(page=1, per_page=3)
+    tasks_str = "\n".join([f"- {g.goal} (Status: {g.status})" for g in recent_tasks]) if recent_tasks else "No recent tasks."
     agent_profile = get_agent_profile(for_planner=False) 
 
     return f"""
@@ -258,8 +259,8 @@ async def run_live_conversation(mic_index: int):
                                             elif fc.name == 'draft_email':
                                                 tool_result = {"status": "success", "message": draft_email_tool(tool_params.get('to'), tool_params.get('subject'), tool_params.get('body'))}
                                             elif fc.name == 'get_active_goal_status':
-                                                active = get_active_goals()
-                                                status_msg = "No active tasks." if not active else ", ".join([f"{g['goal']}: {g['status']}" for g in active])
+                                                active = get_active_goal_summaries()
+                                                status_msg = "No active tasks." if not active else ", ".join([f"{g.goal}: {g.status} ({g.steps_complete}/{g.steps_total} steps)" for g in active])
                                                 tool_result = {"status": "success", "message": status_msg}
                                             elif fc.name == 'read_file':
                                                 tool_result = {"status": "success", "content": read_file_tool(tool_params.get('filename'))}